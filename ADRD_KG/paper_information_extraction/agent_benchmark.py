@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+agent_benchmark.py  ▸  Throughput / tail-latency / retry-amplification
+benchmark of the Agent layer against the local mock server, no spend.
+
+For every concurrency level the corpus pipeline (the code path of
+extract_info_from_paper.py's corpus mode) extracts the same set of papers
+from a scratch text store, through one fresh Agent, against
+mock_openai_server.py running in its own process with the requested latency
+distribution and fault injection. Reported per level:
+
+    papers/min, LLM calls/s       throughput
+    p50 / p95 / p99 / max         Agent.process latency, including retries
+    amplification                 HTTP requests the server saw ÷ Agent.process calls
+                                  (SDK retries + tenacity retries + hedges)
+    failed                        papers the pipeline gave up on
+
+Save a run with --save and compare later runs against it with --baseline: the
+exit code is 1 when throughput drops, p99 grows or amplification grows by more
+than --tolerance, so a change to agents.py can be checked before it ships.
+
+Usage
+-----
+$ python agent_benchmark.py --papers 300 --concurrency 1 4 16 64 --latency 0.3 --latency_sigma 0.5
+$ python agent_benchmark.py --p_429 0.05 --p_500 0.02 --p_drop 0.01 --p_truncate 0.05 --save bench_base.json
+$ python agent_benchmark.py --p_429 0.05 --p_500 0.02 --p_drop 0.01 --p_truncate 0.05 --baseline bench_base.json
+"""
+
+import os, json, time, asyncio, tempfile, argparse, urllib.request
+
+from loguru import logger
+
+from telemetry import load_records, percentile
+
+SAMPLE_XML = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Paper_sample_PMC8640037.xml")
+REGRESSION_CHECKS = (          # metric, direction that counts as worse
+    ("papers_per_min", "lower"),
+    ("p99_s", "higher"),
+    ("amplification", "higher"),
+)
+
+
+def server_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/mock/stats", timeout=10) as response:
+        return json.load(response)
+
+
+def build_text_store(path, papers, xml_path=SAMPLE_XML, text_chars=None):
+    """Scratch TextStore of `papers` distinct copies of the cleaned sample paper."""
+    from preprocess_xml import clean_pmc_xml
+    from text_store import TextStore
+
+    text = clean_pmc_xml(xml_path)
+    if text_chars:
+        text = text[:text_chars]
+    store = TextStore(path)
+    for i in range(papers):
+        store.put(f"BENCH{i:06d}", f"=== TITLE ===\nBenchmark paper {i}\n\n{text}")
+    store.close()
+    return TextStore(path, read_only=True)
+
+
+async def run_level(store, base_url, concurrency, work_dir, model="gpt-4o-mini", chunk_chars=None,
+                    rate_limits=None, hedge=None, max_connections=100):
+    """One pipeline run at one concurrency level; returns its metrics."""
+    from agents import Agent
+    from client_pool import ClientPool
+    from corpus_pipeline import CorpusPipeline
+    from telemetry import TelemetrySink
+
+    log_path = os.path.join(work_dir, f"telemetry_c{concurrency}.jsonl")
+    telemetry = TelemetrySink(log_path, snapshot_every=10 ** 9)
+    rate_limiter = None
+    if rate_limits:
+        # a fresh limiter per level too: its window, buckets and pause carry over otherwise
+        from rate_limiter import AdaptiveRateLimiter, rate_limits_for
+        rate_limiter = AdaptiveRateLimiter(**rate_limits_for(model, rate_limits))
+    if hedge is not None:
+        from hedging import HedgePolicy
+        hedge = HedgePolicy(**hedge)
+    # a fresh pool per level: pooled connections belong to the event loop that opened them
+    client_pool = ClientPool(max_connections=max_connections)
+    agent = Agent(model=model, base_url=base_url, api_key="mock", telemetry=telemetry,
+                  rate_limiter=rate_limiter, hedge=hedge, client_pool=client_pool)
+    pipeline = CorpusPipeline(agent, os.path.join(work_dir, f"out_c{concurrency}"), concurrency=concurrency,
+                              chunk_chars=chunk_chars, text_store=store, log_every=10 ** 9)
+
+    before = server_stats(base_url)
+    stats = await pipeline.run(store.ids())
+    after = server_stats(base_url)
+    telemetry.close()
+    await client_pool.aclose()
+
+    records = load_records(log_path)
+    latencies = [r["latency_s"] for r in records if r.get("latency_s") is not None]
+    calls = len(records)
+    http_requests = after.get("chat_requests", 0) - before.get("chat_requests", 0)
+    injected = {key: after.get(key, 0) - before.get(key, 0)
+                for key in ("throttled", "errors_500", "dropped", "truncated")}
+    return {
+        "concurrency": concurrency,
+        "papers": stats["total"],
+        "succeeded": stats["succeeded"],
+        "failed": stats["failed"],
+        "elapsed_s": stats["elapsed_s"],
+        "papers_per_min": stats["papers_per_min"],
+        "calls": calls,
+        "calls_per_s": calls / max(stats["elapsed_s"], 1e-9),
+        "p50_s": percentile(latencies, 0.50),
+        "p95_s": percentile(latencies, 0.95),
+        "p99_s": percentile(latencies, 0.99),
+        "max_s": max(latencies, default=0.0),
+        "http_requests": http_requests,
+        "amplification": http_requests / max(calls, 1),
+        "tenacity_retries": sum(r.get("retries") or 0 for r in records),
+        "connections": client_pool.counters["connections"],
+        "prompt_tokens": sum(r.get("prompt_tokens") or 0 for r in records),
+        "completion_tokens": sum(r.get("completion_tokens") or 0 for r in records),
+        **injected,
+    }
+
+
+def mock_args(args):
+    """mock_openai_server.py flags for the benchmark's latency / fault settings."""
+    flags = ["--latency", args.latency, "--latency_sigma", args.latency_sigma, "--tail_p", args.tail_p,
+             "--tail_factor", args.tail_factor, "--latency_per_1k_prompt", args.latency_per_1k_prompt,
+             "--p_429", args.p_429, "--retry_after", args.retry_after, "--p_500", args.p_500,
+             "--p_drop", args.p_drop, "--p_truncate", args.p_truncate]
+    if args.rpm:
+        flags += ["--rpm", args.rpm]
+    return [str(flag) for flag in flags]
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against a saved baseline run: list of messages (empty = pass)."""
+    previous = {row["concurrency"]: row for row in baseline["levels"]}
+    problems = []
+    for row in results["levels"]:
+        old = previous.get(row["concurrency"])
+        if old is None:
+            continue
+        for metric, worse in REGRESSION_CHECKS:
+            before, now = old[metric], row[metric]
+            if before <= 0:
+                continue
+            change = (now - before) / before
+            if (worse == "lower" and change < -tolerance) or (worse == "higher" and change > tolerance):
+                problems.append(f"c={row['concurrency']}: {metric} {before:.3f} → {now:.3f} ({change:+.0%})")
+    return problems
+
+
+def print_results(results):
+    print(f"{'Conc':<6} {'Papers/min':<11} {'Calls/s':<9} {'p50 (s)':<9} {'p95 (s)':<9} {'p99 (s)':<9} "
+          f"{'max (s)':<9} {'Ampl':<6} {'Retries':<8} {'Failed':<7}")
+    print("-" * 90)
+    for r in results["levels"]:
+        print(f"{r['concurrency']:<6} {r['papers_per_min']:<11.0f} {r['calls_per_s']:<9.1f} {r['p50_s']:<9.3f} "
+              f"{r['p95_s']:<9.3f} {r['p99_s']:<9.3f} {r['max_s']:<9.3f} {r['amplification']:<6.2f} "
+              f"{r['tenacity_retries']:<8} {r['failed']:<7}")
+    injected = {key: sum(r[key] for r in results["levels"]) for key in ("throttled", "errors_500", "dropped", "truncated")}
+    if any(injected.values()):
+        print("Injected: " + ", ".join(f"{key} ×{n}" for key, n in injected.items() if n))
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--papers",        type=int, default=200, help="Papers per concurrency level")
+    p.add_argument("--concurrency",   type=int, nargs="+", default=[1, 4, 16, 64])
+    p.add_argument("--model",         default="gpt-4o-mini")
+    p.add_argument("--chunked",       action="store_true", help="Section-chunked extraction (several calls per paper)")
+    p.add_argument("--chunk_chars",   type=int, default=None, help="Max characters per chunk (with --chunked)")
+    p.add_argument("--text_chars",    type=int, default=None, help="Truncate the sample paper to this many characters")
+    p.add_argument("--rate_limits",   default=None, help="JSON of per-model rpm/tpm/max_concurrency budgets")
+    p.add_argument("--hedge_percentile", type=float, default=None, help="Hedge calls slower than this percentile")
+    p.add_argument("--max_connections", type=int, default=100, help="Keep-alive connection pool size")
+    p.add_argument("--port",          type=int, default=8790)
+    # mock server behaviour
+    p.add_argument("--latency",       type=float, default=0.5, help="Median seconds per completion")
+    p.add_argument("--latency_sigma", type=float, default=0.3, help="Lognormal spread of the latency")
+    p.add_argument("--tail_p",        type=float, default=0.0, help="Share of straggler requests")
+    p.add_argument("--tail_factor",   type=float, default=10.0, help="Straggler slowdown")
+    p.add_argument("--latency_per_1k_prompt", type=float, default=0.0, help="Extra seconds per 1000 prompt tokens")
+    p.add_argument("--rpm",           type=int, default=None, help="Server-side requests/minute quota")
+    p.add_argument("--p_429",         type=float, default=0.0)
+    p.add_argument("--retry_after",   type=float, default=1.0)
+    p.add_argument("--p_500",         type=float, default=0.0)
+    p.add_argument("--p_drop",        type=float, default=0.0)
+    p.add_argument("--p_truncate",    type=float, default=0.0)
+    # regression harness
+    p.add_argument("--save",          default=None, help="Write the results to this JSON")
+    p.add_argument("--baseline",      default=None, help="Compare against a saved results JSON")
+    p.add_argument("--tolerance",     type=float, default=0.15, help="Allowed relative regression")
+    args = p.parse_args()
+
+    from hedging import start_mock_server
+
+    chunk_chars = None
+    if args.chunked:
+        from extract_info_from_paper import CHUNK_CHARS
+        chunk_chars = args.chunk_chars or CHUNK_CHARS
+    hedge = None
+    if args.hedge_percentile is not None:
+        hedge = {"percentile": args.hedge_percentile}
+
+    server = start_mock_server(args.port, *mock_args(args))
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    results = {"config": {k: v for k, v in vars(args).items() if k not in ("save", "baseline")}, "levels": []}
+    try:
+        with tempfile.TemporaryDirectory(prefix="agent_bench_") as work_dir:
+            store = build_text_store(os.path.join(work_dir, "store"), args.papers, text_chars=args.text_chars)
+            for concurrency in args.concurrency:
+                started = time.perf_counter()
+                row = asyncio.run(run_level(store, base_url, concurrency, work_dir, args.model, chunk_chars,
+                                            args.rate_limits, hedge, args.max_connections))
+                results["levels"].append(row)
+                logger.info(f"concurrency {concurrency}: {row['papers_per_min']:.0f} papers/min, "
+                            f"p99 {row['p99_s']:.2f}s, amplification {row['amplification']:.2f} "
+                            f"({time.perf_counter() - started:.1f}s)")
+            store.close()
+    finally:
+        server.terminate()
+
+    print_results(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results saved → {args.save}")
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        if problems:
+            print("❌ Regressions against " + args.baseline + ":")
+            for problem in problems:
+                print(f"   {problem}")
+            raise SystemExit(1)
+        print(f"✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
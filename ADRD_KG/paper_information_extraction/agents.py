@@ -1,34 +1,116 @@
 from openai import OpenAI
 import json
-from openai import AsyncOpenAI
+import time
+from collections import defaultdict
+from functools import lru_cache
+from openai import RateLimitError
 from tenacity import (
-    retry,
+    AsyncRetrying,
     stop_after_attempt,
     wait_random_exponential,
 )
 from loguru import logger
 
+from client_pool import get_client_pool
+from hedging import hedged
+
 price_map = {
     "o3-mini": {"input": 1.1, "output": 4.4},
     "gpt-4o": {"input": 2.5, "output": 10.0},
     "gpt-4o-mini": {"input": 0.15, "output": 0.6},
     "gpt-4.1": {"input": 1.2, "output": 8.0},
 }
+# Batch API jobs are billed at a fraction of the synchronous price_map rates
+batch_discount = 0.5
+
+
+def step_key(step):
+    """Usage/telemetry key for a step: ints keep the historical "Step0".."Step6" names."""
+    return f"Step{step}" if isinstance(step, int) else str(step)
+
+
+@lru_cache(maxsize=None)
+def read_api_keys(filepath):
+    """Parse an api_keys.json once per process (every Agent used to re-read it)."""
+    try:
+        with open(filepath, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"API key file '{filepath}' not found.")
+    except json.JSONDecodeError:
+        raise ValueError(f"Error decoding JSON from '{filepath}'. Ensure it is correctly formatted.")
+
+
+def new_usage_entry():
+    return {"input": 0, "output": 0, "cached_input": 0, "cached_output": 0, "cache_hits": 0,
+            "batch_input": 0, "batch_output": 0}
+
+
 class Agent():
-    def __init__(self, model = "o3-mini", async_mode=True):
+    def __init__(self, model = "o3-mini", async_mode=True, base_url=None, api_key=None, cache=None,
+                 rate_limiter=None, expected_output_tokens=1000, telemetry=None, client_pool=None,
+                 hedge=None):
         # Load API keys from JSON file
         api_key_file = "api_keys.json"  # Update this with your file path
-        api_key = self.load_api_keys(api_key_file)["YuyangD"]
+        if api_key is None:
+            api_key = self.load_api_keys(api_key_file)["YuyangD"]
         
-        # Set OpenAI API key
+        # Clients come from a process-wide pool so Agents share keep-alive connections
+        # (base_url lets us point at a local mock endpoint)
+        self.client_pool = client_pool or get_client_pool()
         self.model = model
-        self.client = AsyncOpenAI(api_key=api_key)
         self.price = price_map.get(model, {"input": 0, "output": 0})
+        self.cache = cache  # optional response_cache.ResponseCache
+
+        # Optional rate_limiter.AdaptiveRateLimiter shared by all Agents on this model. It paces
+        # requests and reacts to 429s itself, so the SDK's own retries are disabled and our
+        # backoff stays short instead of parking coroutines for minutes.
+        self.rate_limiter = rate_limiter
+        self.expected_output_tokens = expected_output_tokens
+        if rate_limiter is None:
+            self.client = self.client_pool.get(api_key, base_url)
+            self.retry_wait = wait_random_exponential(min=1, max=300, exp_base=5)
+        else:
+            self.client = self.client_pool.get(api_key, base_url, max_retries=0)
+            self.retry_wait = wait_random_exponential(min=0.5, max=10)
+
+        # Monitoring input/output token usage separately per step (cached_* = tokens served from
+        # cache, batch_* = the part of input/output billed at the Batch API discount)
+        self.usage = defaultdict(new_usage_entry)
 
-        # Monitoring input/output token usage separately
-        self.usage = {
-            f"Step{i}": {"input": 0, "output": 0} for i in range(7)
-        }
+        # Optional telemetry.TelemetrySink receiving one record per request
+        self.telemetry = telemetry
+
+        # Optional hedging.HedgePolicy: duplicate calls slower than its latency percentile
+        self.hedge = hedge
+
+    def record_usage(self, step, prompt_tokens, completion_tokens, batch=False):
+        usage = self.usage[step_key(step)]
+        usage["input"] += prompt_tokens
+        usage["output"] += completion_tokens
+        if batch:
+            usage["batch_input"] += prompt_tokens
+            usage["batch_output"] += completion_tokens
+
+    def token_cost(self, tokens):
+        """(input $, output $) for one usage entry, applying batch_discount to batch tokens."""
+        billed_input = tokens["input"] - tokens["batch_input"] * (1 - batch_discount)
+        billed_output = tokens["output"] - tokens["batch_output"] * (1 - batch_discount)
+        return billed_input / 1e6 * self.price["input"], billed_output / 1e6 * self.price["output"]
+
+    def emit(self, paper_id, step, status, cache, latency_s=None, retries=0,
+             prompt_tokens=0, completion_tokens=0, batch=False):
+        """Send one per-request record to the telemetry sink (no-op without one)."""
+        if self.telemetry is None:
+            return
+        factor = batch_discount if batch else 1.0
+        cost = (prompt_tokens * self.price["input"] + completion_tokens * self.price["output"]) / 1e6 * factor
+        self.client_pool.publish(self.telemetry)   # connection reuse / handshake gauges
+        self.telemetry.record(
+            paper_id=paper_id, step=step_key(step), model=self.model, status=status, cache=cache,
+            latency_s=None if latency_s is None else round(latency_s, 4), retries=retries,
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cost_usd=round(cost, 8),
+        )
 
     def print_usage(self):
         total_input_tokens = sum(v["input"] for v in self.usage.values())
@@ -37,6 +119,7 @@ class Agent():
 
         if total_tokens == 0:
             print("No token usage recorded.")
+            self.print_cache_savings()
             return
 
         print(f"{'Step':<10} {'Input (M)':<12} {'Output (M)':<12} {'Input Cost ($)':<15} {'Output Cost ($)':<15} {'% of Total':<10}")
@@ -54,8 +137,7 @@ class Agent():
             input_million = input_tokens / 1e6
             output_million = output_tokens / 1e6
 
-            input_cost = input_million * self.price["input"]
-            output_cost = output_million * self.price["output"]
+            input_cost, output_cost = self.token_cost(tokens)
 
             step_cost = input_cost + output_cost
             percentage = ((input_tokens + output_tokens) / total_tokens) * 100
@@ -68,33 +150,139 @@ class Agent():
         print("-" * 80)
         total_cost = total_input_cost + total_output_cost
         print(f"{'Total':<10} {total_input_tokens/1e6:<12.3f} {total_output_tokens/1e6:<12.3f} {total_input_cost:<15.4f} {total_output_cost:<15.4f} {100.00:<10.2f}")
+        if self.hedge is not None:
+            h = self.hedge.stats()
+            print(f"Hedging: {h['hedges']}/{h['requests']} requests hedged ({h['hedge_wins']} won, "
+                  f"{h['denied']} denied by budget, ~{h['extra_tokens'] / 1e6:.3f}M extra tokens)")
+        self.print_cache_savings()
+
+    def print_cache_savings(self):
+        total_hits = sum(v["cache_hits"] for v in self.usage.values())
+        if total_hits == 0:
+            return
+
+        print()
+        print(f"{'Step':<10} {'Cache hits':<12} {'Saved in (M)':<14} {'Saved out (M)':<14} {'Saved ($)':<10}")
+        print("-" * 64)
+
+        total_saved_input = total_saved_output = total_saved_cost = 0
+        for step, tokens in self.usage.items():
+            if tokens["cache_hits"] == 0:
+                continue
+            saved_input = tokens["cached_input"] / 1e6
+            saved_output = tokens["cached_output"] / 1e6
+            saved_cost = saved_input * self.price["input"] + saved_output * self.price["output"]
+
+            total_saved_input += saved_input
+            total_saved_output += saved_output
+            total_saved_cost += saved_cost
+
+            print(f"{step:<10} {tokens['cache_hits']:<12} {saved_input:<14.3f} {saved_output:<14.3f} {saved_cost:<10.4f}")
+
+        print("-" * 64)
+        print(f"{'Total':<10} {total_hits:<12} {total_saved_input:<14.3f} {total_saved_output:<14.3f} {total_saved_cost:<10.4f}")
 
 
     def load_api_keys(self, filepath: str) -> dict:
-        """Loads API keys from a JSON file."""
-        try:
-            with open(filepath, 'r') as file:
-                return json.load(file)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"API key file '{filepath}' not found.")
-        except json.JSONDecodeError:
-            raise ValueError(f"Error decoding JSON from '{filepath}'. Ensure it is correctly formatted.")
+        """Loads API keys from a JSON file (cached per process)."""
+        return read_api_keys(filepath)
     
-    @retry(wait=wait_random_exponential(min=1, max=300, exp_base=5), stop=stop_after_attempt(5))
-    async def process(self, prompt, step, response_format = None):
+    async def process(self, prompt, step, response_format = None, paper_id = None):
         if response_format == "JSON":
             response_format = { "type": "json_object" }
-        response = await self.client.chat.completions.create(
-        model=self.model,
-        messages=[
-            {"role": "user", "content": prompt}
-        ],
-        response_format=response_format
-        )
+        usage = self.usage[step_key(step)]
+        started = time.perf_counter()
+        cache_status = "off"
+        if self.cache is not None:
+            hit = self.cache.get(self.model, prompt, response_format)
+            if hit is not None:
+                usage["cache_hits"] += 1
+                usage["cached_input"] += hit["prompt_tokens"]
+                usage["cached_output"] += hit["completion_tokens"]
+                self.emit(paper_id, step, "ok", "hit", time.perf_counter() - started)
+                return hit["content"]
+            cache_status = "miss"
+
+        attempts = 0
+        try:
+            async for attempt in AsyncRetrying(wait=self.retry_wait, stop=stop_after_attempt(5)):
+                with attempt:
+                    attempts += 1
+                    if self.hedge is None:
+                        response = await self._create(prompt, response_format)
+                    else:
+                        response = await hedged(lambda: self._create(prompt, response_format), self.hedge,
+                                                est_tokens=len(prompt) // 4 + self.expected_output_tokens)
+        except BaseException:
+            self.emit(paper_id, step, "error", cache_status, time.perf_counter() - started, attempts - 1)
+            raise
+        latency = time.perf_counter() - started
+
+        prompt_tokens = completion_tokens = 0
         try:
-            self.usage[f"Step{step}"]["input"] += response.usage.prompt_tokens
-            self.usage[f"Step{step}"]["output"] += response.usage.completion_tokens
+            prompt_tokens = response.usage.prompt_tokens
+            completion_tokens = response.usage.completion_tokens
+            self.record_usage(step, prompt_tokens, completion_tokens)
         except:
             logger.warning(f"Token usage fail")
-        return response.choices[0].message.content
-    
+        self.emit(paper_id, step, "ok", cache_status, latency, attempts - 1, prompt_tokens, completion_tokens)
+        choice = response.choices[0]
+        content = choice.message.content
+        if self.cache is not None and self.cacheable(choice, response_format):
+            self.cache.put(self.model, prompt, content, prompt_tokens, completion_tokens, response_format)
+        return content
+
+    @staticmethod
+    def cacheable(choice, response_format):
+        """Only complete answers are cached: finish_reason "stop" and, for JSON mode, valid JSON."""
+        if choice.finish_reason != "stop" or choice.message.content is None:
+            return False
+        if response_format == {"type": "json_object"}:
+            try:
+                json.loads(choice.message.content)
+            except json.JSONDecodeError:
+                return False
+        return True
+
+    def request_body(self, prompt, response_format=None):
+        """Chat-completions request parameters (shared with the Batch API path)."""
+        if response_format == "JSON":
+            response_format = { "type": "json_object" }
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            response_format=response_format
+        )
+
+    async def _create(self, prompt, response_format):
+        """One chat-completions call, paced by the rate limiter when one is attached."""
+        request = self.request_body(prompt, response_format)
+        if self.rate_limiter is None:
+            return await self.client.chat.completions.create(**request)
+
+        est_tokens = len(prompt) // 4 + self.expected_output_tokens
+        await self.rate_limiter.acquire(est_tokens)
+        try:
+            response = await self.client.chat.completions.create(**request)
+        except RateLimitError as e:
+            await self.rate_limiter.release(est_tokens, rate_limited=True, retry_after=retry_after_seconds(e))
+            raise
+        except BaseException:
+            await self.rate_limiter.release(est_tokens, failed=True)
+            raise
+        used_tokens = getattr(response.usage, "total_tokens", None)
+        await self.rate_limiter.release(est_tokens, used_tokens=used_tokens)
+        return response
+
+
+def retry_after_seconds(error):
+    """Server-suggested wait from a 429 response, if it sent one."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    for key, scale in (("retry-after-ms", 1e-3), ("retry-after", 1.0)):
+        try:
+            return float(headers.get(key)) * scale
+        except (TypeError, ValueError):
+            continue
+    return None
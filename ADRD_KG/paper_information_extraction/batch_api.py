@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+"""
+batch_api.py  ▸  Offline Batch-API mode for Agent (overnight corpus runs).
+
+All pending prompts are written as one or more JSONL batch files (split under
+the API's 50k-request and 200 MB limits), uploaded, submitted to
+/v1/chat/completions as batch jobs, polled until they finish, and the outputs
+are mapped back to their papers through `custom_id`. Token usage is recorded on
+the Agent with batch=True so print_usage applies batch_discount.
+
+Submitted batch ids are kept in <work_dir>/batch_batches.json until their
+results are collected: rerunning the same command after a crash reconnects to
+the running batches instead of submitting them again.
+
+Usage
+-----
+$ python extract_info_from_paper.py --xml_dir /path/to/pmc_xml --batch --output_dir dataset_info
+
+Against the local stand-in (mock_openai_server.py implements /files and /batches):
+$ python mock_openai_server.py --port 8000 --batch_delay 5 &
+$ python extract_info_from_paper.py --xml_dir /path/to/pmc_xml --batch \
+        --base_url http://127.0.0.1:8000/v1 --api_key mock --poll_interval 1
+"""
+
+import os, json, asyncio, hashlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from loguru import logger
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from preprocess_xml import clean_pmc_xml
+from section_filter import prefilter_text
+from extract_info_from_paper import DATASET_PROMPT, DATASET_FIELDS, MAX_PROMPT_CHARS
+from output_validation import repair_json, validate_fields
+
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+MAX_REQUESTS_PER_BATCH = 50_000   # API limit per batch file
+MAX_BATCH_BYTES = 190 * 1024 ** 2  # API limit is 200 MB per input file; keep some headroom
+
+
+class BatchRunner:
+    """Submit prompts through the Batch API and collect {custom_id: content}."""
+
+    def __init__(self, agent, work_dir="batches", poll_interval=60, completion_window="24h",
+                 max_requests_per_batch=MAX_REQUESTS_PER_BATCH, max_batch_bytes=MAX_BATCH_BYTES):
+        self.agent = agent
+        self.work_dir = work_dir
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_requests_per_batch = max_requests_per_batch
+        self.max_batch_bytes = max_batch_bytes
+        os.makedirs(work_dir, exist_ok=True)
+
+    def request_line(self, custom_id, prompt, response_format):
+        body = {k: v for k, v in self.agent.request_body(prompt, response_format).items() if v is not None}
+        return json.dumps({
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": body,
+        }) + "\n"
+
+    def split(self, items):
+        """JSONL lines of items, grouped into parts under both the request and the byte limit."""
+        parts, lines, size = [], [], 0
+        for custom_id, prompt, response_format in items:
+            line = self.request_line(custom_id, prompt, response_format)
+            n_bytes = len(line.encode("utf-8"))
+            if lines and (len(lines) >= self.max_requests_per_batch or size + n_bytes > self.max_batch_bytes):
+                parts.append(lines)
+                lines, size = [], 0
+            lines.append(line)
+            size += n_bytes
+        if lines:
+            parts.append(lines)
+        return parts
+
+    # -- submitted batch ids survive crashes: <work_dir>/<name>_batches.json
+    def state_path(self, name):
+        return os.path.join(self.work_dir, f"{name}_batches.json")
+
+    def load_state(self, name):
+        try:
+            with open(self.state_path(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def save_state(self, name, state):
+        path = self.state_path(name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    async def submit(self, lines, name="batch"):
+        path = os.path.join(self.work_dir, f"{name}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        with open(path, "rb") as f:
+            uploaded = await self.agent.client.files.create(file=f, purpose="batch")
+        batch = await self.agent.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window,
+        )
+        logger.info(f"Submitted {name} ({len(lines)} requests) as {batch.id}")
+        return batch.id
+
+    async def wait(self, batch_id):
+        while True:
+            try:
+                batch = await self.agent.client.batches.retrieve(batch_id)
+            except (APIConnectionError, RateLimitError, InternalServerError) as e:
+                # the batch keeps running server-side; a failed poll must not abandon it
+                logger.warning(f"{batch_id}: status poll failed ({e}), retrying")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if batch.status in TERMINAL_STATUSES:
+                return batch
+            counts = batch.request_counts
+            if counts is not None:
+                logger.info(f"{batch_id}: {batch.status} ({counts.completed}/{counts.total})")
+            await asyncio.sleep(self.poll_interval)
+
+    async def collect(self, batch, step=0):
+        """Download the output file, record batch usage, return {custom_id: content}."""
+        results = {}
+        if batch.status != "completed":
+            logger.warning(f"{batch.id} ended with status {batch.status}")
+        if not batch.output_file_id:     # expired / cancelled batches still return what finished
+            return results
+        output = await self.agent.client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                logger.warning(f"{record.get('custom_id')}: {record.get('error') or response.get('status_code')}")
+                self.agent.emit(record.get("custom_id"), step, "error", "batch", batch=True)
+                continue
+            body = response["body"]
+            usage = body.get("usage") or {}
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+            self.agent.record_usage(step, prompt_tokens, completion_tokens, batch=True)
+            self.agent.emit(record["custom_id"], step, "ok", "batch", None, 0, prompt_tokens, completion_tokens,
+                            batch=True)
+            results[record["custom_id"]] = body["choices"][0]["message"]["content"]
+        return results
+
+    async def run(self, items, step=0, name="batch"):
+        """
+        Submit, poll and collect all items (split across batches as needed).
+
+        Submitted batch ids are saved in work_dir as soon as they exist; rerunning
+        with the same items (e.g. after a crash or Ctrl-C) reconnects to those
+        batches instead of paying for them again.
+        """
+        state = self.load_state(name)
+        batch_ids = []
+        for i, lines in enumerate(self.split(items)):
+            part = f"{name}_{i:03d}"
+            digest = hashlib.sha1("".join(lines).encode("utf-8")).hexdigest()
+            saved = state.get(part)
+            if saved is not None and saved["sha1"] == digest:
+                logger.info(f"Resuming {part} ({len(lines)} requests) as {saved['batch_id']}")
+            else:
+                saved = state[part] = {"batch_id": await self.submit(lines, part), "sha1": digest}
+                self.save_state(name, state)
+            batch_ids.append(saved["batch_id"])
+        batches = await asyncio.gather(*(self.wait(batch_id) for batch_id in batch_ids))
+        results = {}
+        for batch in batches:
+            results.update(await self.collect(batch, step))
+        os.remove(self.state_path(name))      # collected: a rerun submits afresh
+        return results
+
+
+# -------------------------------------------------------------------
+def _clean_one(xml_path, prefilter=None):
+    """Process-pool worker: (xml_path, cleaned text, None), or (xml_path, None, error) if cleaning failed."""
+    try:
+        text = clean_pmc_xml(xml_path)
+        if prefilter is not None:
+            text = prefilter_text(text, prefilter)
+    except Exception as e:
+        return xml_path, None, str(e)
+    return xml_path, text, None
+
+
+async def run_batch_corpus(agent, xml_paths, output_dir, parse_workers=None, manifest=None, prefilter=None,
+                           **runner_kwargs):
+    """Clean every paper, extract all of them in one batch job, write one JSON per paper."""
+    os.makedirs(output_dir, exist_ok=True)
+    xml_paths = list(xml_paths)
+    skipped = 0
+    if manifest is not None:
+        pending = manifest.pending(xml_paths)
+        skipped = len(xml_paths) - len(pending)
+        xml_paths = pending
+
+    papers, sources = {}, {}
+    clean_failed = empty = 0
+    with ProcessPoolExecutor(max_workers=parse_workers) as pool:
+        for xml_path, text, error in pool.map(partial(_clean_one, prefilter=prefilter), xml_paths, chunksize=16):
+            if error is not None:
+                logger.warning(f"Cleaning failed for {xml_path}: {error}")
+                clean_failed += 1
+                if manifest is not None:
+                    manifest.mark(xml_path, "failed", error=f"clean: {error}")
+            elif text.strip():
+                paper_id = os.path.splitext(os.path.basename(xml_path))[0]
+                papers[paper_id], sources[paper_id] = text.strip(), xml_path
+                if manifest is not None:
+                    manifest.mark(xml_path, "cleaned")
+            else:
+                empty += 1
+                if manifest is not None:
+                    manifest.mark(xml_path, "failed", error="empty text")
+
+    items = [(paper_id, DATASET_PROMPT.replace("<<FULLTEXT>>", text[:MAX_PROMPT_CHARS]), "JSON")
+             for paper_id, text in papers.items()]
+    results = await BatchRunner(agent, **runner_kwargs).run(items, step=0)
+
+    stats = {"total": len(xml_paths), "succeeded": 0, "failed": clean_failed, "empty": empty, "skipped": skipped}
+    for paper_id in papers:
+        obj, _ = repair_json(results.get(paper_id))
+        if obj is None:
+            stats["failed"] += 1
+            if manifest is not None:
+                manifest.mark(sources[paper_id], "failed", error="missing or invalid batch result")
+            continue
+        data, missing = validate_fields(obj, DATASET_FIELDS)
+        if missing:
+            logger.warning(f"{paper_id}: no answer for {', '.join(missing)}")
+        parsed = {field: data.get(field, []) for field in DATASET_FIELDS}
+        out_path = os.path.join(output_dir, f"{paper_id}.json")
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(parsed, f, indent=2)
+        stats["succeeded"] += 1
+        if manifest is not None:
+            manifest.mark(sources[paper_id], "validated", output_path=out_path)
+    if manifest is not None:
+        manifest.commit()
+    return stats
+
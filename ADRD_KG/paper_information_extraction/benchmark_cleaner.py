@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+benchmark_cleaner.py  ▸  Compare the streaming clean_pmc_xml against the old
+BeautifulSoup cleaner (clean_pmc_xml_soup) on speed, peak memory and output
+token count.
+
+Each cleaner runs in a fresh worker process so peak RSS is not polluted by the
+other one. A synthetic corpus of deeply nested JATS articles can be generated
+on the fly to stress memory and the nested-section duplication.
+
+Usage
+-----
+$ python benchmark_cleaner.py --xml_files Paper_sample_PMC8640037.xml
+$ python benchmark_cleaner.py --synthetic 200 --sections 40 --depth 3
+"""
+
+import os, time, random, argparse, resource, tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from preprocess_xml import clean_pmc_xml, clean_pmc_xml_soup
+from token_counter import count_tokens
+
+CLEANERS = {"streaming": clean_pmc_xml, "soup": clean_pmc_xml_soup}
+
+WORDS = ("hippocampus amyloid tau cohort ADNI FreeSurfer diffusion tensor imaging participants "
+         "cognitive decline baseline longitudinal regression analysis cortical thickness MRI").split()
+
+
+def _paragraph(rng, n_words=80):
+    return "<p>" + " ".join(rng.choice(WORDS) for _ in range(n_words)) + ".</p>"
+
+
+def _section(rng, depth, paragraphs, fanout):
+    body = "".join(_paragraph(rng) for _ in range(paragraphs))
+    if depth > 1:
+        body += "".join(_section(rng, depth - 1, paragraphs, fanout) for _ in range(fanout))
+    return f"<sec><title>Section {rng.randint(1, 10**6)}</title>{body}</sec>"
+
+
+def make_synthetic_corpus(out_dir, n_files, sections=20, depth=3, paragraphs=4, fanout=2, seed=0):
+    """Write n_files JATS-like articles with nested <sec> trees; return their paths."""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(n_files):
+        body = "".join(_section(rng, depth, paragraphs, fanout) for _ in range(sections))
+        xml = (f'<?xml version="1.0"?><article><front><article-meta><abstract>{_paragraph(rng)}</abstract>'
+               f'</article-meta></front><body>{body}</body><back><ref-list/></back></article>')
+        path = os.path.join(out_dir, f"synthetic_{i:05d}.xml")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(xml)
+        paths.append(path)
+    return paths
+
+
+def _run(name, paths):
+    """Worker: clean every path with one cleaner, return time / peak-RSS delta / tokens."""
+    cleaner = CLEANERS[name]
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    chars = tokens = 0
+    for path in paths:
+        text = cleaner(path)
+        chars += len(text)
+        tokens += count_tokens(text)
+    elapsed = time.perf_counter() - started
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss
+    return {"cleaner": name, "seconds": elapsed, "peak_mb": peak_kb / 1024, "chars": chars, "tokens": tokens}
+
+
+def benchmark(paths):
+    results = []
+    for name in CLEANERS:
+        with ProcessPoolExecutor(max_workers=1) as pool:   # fresh process → clean RSS baseline
+            results.append(pool.submit(_run, name, paths).result())
+    return results
+
+
+def print_report(label, paths, results):
+    size_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+    print(f"\n{label}: {len(paths)} files, {size_mb:.1f} MB")
+    print(f"{'Cleaner':<12} {'Seconds':<10} {'Files/s':<10} {'Peak ΔRSS (MB)':<16} {'Chars':<12} {'Tokens':<12}")
+    print("-" * 76)
+    for r in results:
+        print(f"{r['cleaner']:<12} {r['seconds']:<10.3f} {len(paths) / max(r['seconds'], 1e-9):<10.1f} "
+              f"{r['peak_mb']:<16.1f} {r['chars']:<12} {r['tokens']:<12}")
+    stream, soup = results[0], results[1]
+    print(f"speed-up x{soup['seconds'] / max(stream['seconds'], 1e-9):.2f}, "
+          f"tokens saved {1 - stream['tokens'] / max(soup['tokens'], 1):.1%}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--xml_files", nargs="*", default=[], help="Real PMC XML files to benchmark")
+    p.add_argument("--synthetic", type=int, default=0, help="Number of synthetic articles to generate")
+    p.add_argument("--sections",  type=int, default=20, help="Top-level sections per synthetic article")
+    p.add_argument("--depth",     type=int, default=3, help="Nesting depth of synthetic sections")
+    args = p.parse_args()
+
+    if args.xml_files:
+        print_report("PMC files", args.xml_files, benchmark(args.xml_files))
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = make_synthetic_corpus(tmp, args.synthetic, sections=args.sections, depth=args.depth)
+            print_report("Synthetic corpus", paths, benchmark(paths))
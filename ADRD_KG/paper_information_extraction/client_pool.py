@@ -0,0 +1,99 @@
+"""
+client_pool.py  ▸  Process-wide pool of AsyncOpenAI clients for Agent.
+
+Agents borrow a client from the pool instead of building their own, so every
+Agent on the same (api_key, base_url, max_retries) shares one httpx connection
+pool: keep-alive connections, a max-connections cap and optional HTTP/2 (needs
+the `h2` package; falls back to HTTP/1.1 with a warning when missing).
+
+Connection behaviour is measured through httpx's `trace` extension: requests
+sent, new TCP connections and TLS handshakes. The counts (plus the resulting
+connection-reuse ratio) are published as telemetry gauges.
+
+Clients are bound to the event loop they first run on, which is fine for the
+one-asyncio.run-per-process entry points; call `aclose()` before reusing the
+pool from a new loop.
+"""
+
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import httpx
+from loguru import logger
+
+DEFAULT_MAX_CONNECTIONS = 100
+DEFAULT_KEEPALIVE_EXPIRY = 30.0   # seconds an idle connection is kept open
+
+
+class ClientPool:
+    """Shared AsyncOpenAI clients plus connection reuse/handshake counters."""
+
+    def __init__(self, max_connections=DEFAULT_MAX_CONNECTIONS, max_keepalive_connections=None,
+                 keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY, http2=False):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections or max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        self.clients = {}
+        self.counters = {"requests": 0, "connections": 0, "tls_handshakes": 0}
+
+    # -- httpx hooks -------------------------------------------------
+    async def _trace(self, event, info):
+        if event.endswith("send_request_headers.started"):     # http11.* or http2.*
+            self.counters["requests"] += 1
+        elif event == "connection.connect_tcp.complete":
+            self.counters["connections"] += 1
+        elif event == "connection.start_tls.complete":
+            self.counters["tls_handshakes"] += 1
+
+    async def _on_request(self, request):
+        request.extensions["trace"] = self._trace
+
+    def _http_client(self):
+        kwargs = dict(limits=self.limits, event_hooks={"request": [self._on_request]})
+        if self.http2:
+            try:
+                return DefaultAsyncHttpxClient(http2=True, **kwargs)
+            except ImportError:
+                logger.warning("HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1")
+                self.http2 = False
+        return DefaultAsyncHttpxClient(**kwargs)
+
+    # -- public API --------------------------------------------------
+    def get(self, api_key, base_url=None, max_retries=None):
+        """Shared client for this key/endpoint; max_retries=None keeps the SDK default."""
+        key = (api_key, base_url, max_retries)
+        if key not in self.clients:
+            kwargs = {} if max_retries is None else {"max_retries": max_retries}
+            self.clients[key] = AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                            http_client=self._http_client(), **kwargs)
+        return self.clients[key]
+
+    def stats(self):
+        requests = self.counters["requests"]
+        reuse = 1 - self.counters["connections"] / requests if requests else 0.0
+        return {**self.counters, "clients": len(self.clients), "reuse_ratio": max(reuse, 0.0)}
+
+    def publish(self, telemetry):
+        """Copy the connection counters into a telemetry.TelemetrySink as gauges."""
+        s = self.stats()
+        telemetry.set_gauge("llm_http_requests", s["requests"])
+        telemetry.set_gauge("llm_http_connections_opened", s["connections"])
+        telemetry.set_gauge("llm_http_tls_handshakes", s["tls_handshakes"])
+        telemetry.set_gauge("llm_http_connection_reuse_ratio", round(s["reuse_ratio"], 4))
+
+    async def aclose(self):
+        for client in self.clients.values():
+            await client.close()
+        self.clients.clear()
+
+
+_pool = None
+
+
+def get_client_pool(**kwargs):
+    """Process-wide pool; the first caller's settings (max_connections, http2, ...) win."""
+    global _pool
+    if _pool is None:
+        _pool = ClientPool(**kwargs)
+    return _pool
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+"""
+corpus_pipeline.py  ▸  Staged, back-pressured extraction over a whole PMC corpus.
+
+    paths ─▶ [parse: clean_pmc_xml (+ optional section prefilter) on a process pool]
+          ─▶ (bounded queue)
+          ─▶ [extract: Agent.process on the event loop, ≤ concurrency in flight]
+          ─▶ (bounded queue)
+          ─▶ [validate + write JSON]
+
+Every queue is bounded, so a slow stage stalls the stage feeding it instead of
+letting cleaned texts or responses pile up in memory.
+
+With a text_store.TextStore the items are paper IDs and the parse stage reads
+the already-cleaned text from the store instead of cleaning XML.
+
+Driven from the extraction entry point:
+$ python extract_info_from_paper.py --xml_dir /path/to/pmc_xml --output_dir dataset_info
+
+Against the local mock endpoint (see mock_openai_server.py):
+$ python mock_openai_server.py --port 8000 &
+$ python extract_info_from_paper.py --xml_dir /path/to/pmc_xml \
+        --base_url http://127.0.0.1:8000/v1 --api_key mock --concurrency 64
+"""
+
+import os, json, time, asyncio
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+
+from preprocess_xml import clean_pmc_xml
+from section_filter import prefilter_text
+from extract_info_from_paper import extract_dataset_info_from_text, extract_dataset_info_chunked
+
+_DONE = object()   # end-of-stream sentinel passed between stages
+
+
+def collect_xml_files(inputs):
+    """Expand a list of directories and/or files into a sorted list of .xml paths."""
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(
+                os.path.join(item, name) for name in os.listdir(item) if name.endswith(".xml")
+            )
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            raise FileNotFoundError(f"File not found: {item}")
+    return sorted(paths)
+
+
+def _parse_one(xml_path, prefilter=None):
+    """Process-pool worker: clean one XML file (must stay module-level to pickle)."""
+    text = clean_pmc_xml(xml_path)
+    if prefilter is not None:
+        text = prefilter_text(text, prefilter)
+    return xml_path, text
+
+
+class CorpusPipeline:
+    """Parse → extract → write pipeline sharing a single Agent across all papers."""
+
+    def __init__(self, agent, output_dir, concurrency=16, parse_workers=None,
+                 queue_size=64, log_every=100, chunk_chars=None, manifest=None, prefilter=None,
+                 router=None, text_store=None):
+        self.agent = agent
+        self.output_dir = output_dir
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.log_every = log_every
+        self.chunk_chars = chunk_chars   # None → single truncated request per paper; with chunking,
+                                         # concurrency bounds papers, so up to concurrency × chunks
+                                         # LLM calls can be in flight (pair with a rate limiter)
+        self.manifest = manifest         # optional manifest.Manifest; reruns skip finished papers
+        self.prefilter = prefilter       # section_filter threshold; None sends every section
+        self.router = router             # optional model_router.ModelRouter used instead of agent
+        self.text_store = text_store     # optional text_store.TextStore; items are then paper IDs
+        self.stats = {"total": 0, "succeeded": 0, "failed": 0, "empty": 0}
+
+    def output_path(self, xml_path):
+        name = os.path.splitext(os.path.basename(xml_path))[0] + ".json"
+        return os.path.join(self.output_dir, name)
+
+    def mark(self, path, status, output_path=None, error=None):
+        if self.manifest is not None:
+            self.manifest.mark(path, status, output_path, error)
+
+    # -- stages ------------------------------------------------------
+    async def _feed(self, xml_paths, path_q):
+        for path in xml_paths:
+            await path_q.put(path)
+        for _ in range(self.parse_workers):
+            await path_q.put(_DONE)
+
+    async def _parse(self, pool, path_q, text_q):
+        loop = asyncio.get_running_loop()
+        while (path := await path_q.get()) is not _DONE:
+            try:
+                if self.text_store is not None:
+                    text = await loop.run_in_executor(None, self.text_store.get, path, "")
+                    if self.prefilter is not None:
+                        text = await loop.run_in_executor(pool, prefilter_text, text, self.prefilter)
+                    item = path, text
+                else:
+                    item = await loop.run_in_executor(pool, _parse_one, path, self.prefilter)
+            except Exception as e:
+                logger.warning(f"Cleaning failed for {path}: {e}")
+                self.stats["failed"] += 1
+                self.mark(path, "failed", error=f"clean: {e}")
+                continue
+            self.mark(path, "cleaned")
+            await text_q.put(item)
+
+    async def _extract(self, text_q, result_q):
+        while (item := await text_q.get()) is not _DONE:
+            path, text = item
+            try:
+                paper_id = os.path.splitext(os.path.basename(path))[0]
+                if self.router is not None:
+                    result = await self.router.extract(text, paper_id, self.chunk_chars)
+                elif self.chunk_chars:
+                    result = await extract_dataset_info_chunked(text, self.agent, self.chunk_chars, paper_id)
+                else:
+                    result = await extract_dataset_info_from_text(text, self.agent, paper_id)
+            except Exception as e:
+                logger.warning(f"LLM extraction failed for {path}: {e}")
+                self.stats["failed"] += 1
+                self.mark(path, "failed", error=f"extract: {e}")
+                continue
+            if result:
+                self.mark(path, "extracted")
+            await result_q.put((path, result))
+
+    async def _write(self, result_q, started):
+        done = 0
+        while (item := await result_q.get()) is not _DONE:
+            path, result = item
+            done += 1
+            if not result:
+                self.stats["empty"] += 1
+                self.mark(path, "failed", error="empty text")
+            else:
+                try:
+                    parsed = json.loads(result)
+                except json.JSONDecodeError:
+                    logger.warning(f"Invalid JSON returned for {path}")
+                    self.stats["failed"] += 1
+                    self.mark(path, "failed", error="invalid JSON")
+                else:
+                    out_path = self.output_path(path)
+                    try:
+                        with open(out_path, "w", encoding="utf-8") as f:
+                            json.dump(parsed, f, indent=2)
+                    except OSError as e:
+                        logger.warning(f"Writing {out_path} failed: {e}")
+                        self.stats["failed"] += 1
+                        self.mark(path, "failed", error=f"write: {e}")
+                    else:
+                        self.stats["succeeded"] += 1
+                        self.mark(path, "validated", output_path=out_path)
+            if done % self.log_every == 0:
+                rate = self.stats["succeeded"] / max(time.perf_counter() - started, 1e-9) * 60
+                logger.info(f"{done}/{self.stats['total']} papers processed, {self.stats['succeeded']} written "
+                            f"({rate:.1f} papers/min)")
+
+    # -- driver ------------------------------------------------------
+    async def run(self, xml_paths):
+        """Run all stages to completion and return throughput statistics."""
+        xml_paths = list(xml_paths)
+        os.makedirs(self.output_dir, exist_ok=True)
+        skipped = 0
+        if self.manifest is not None:
+            pending = self.manifest.pending(xml_paths)
+            skipped = len(xml_paths) - len(pending)
+            logger.info(f"Manifest: {skipped} papers already done, {len(pending)} to process")
+            xml_paths = pending
+        self.stats = {"total": len(xml_paths), "succeeded": 0, "failed": 0, "empty": 0, "skipped": skipped}
+
+        path_q = asyncio.Queue(maxsize=self.queue_size)
+        text_q = asyncio.Queue(maxsize=self.queue_size)
+        result_q = asyncio.Queue(maxsize=self.queue_size)
+
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.parse_workers) as pool:
+            writer = asyncio.create_task(self._write(result_q, started))
+            feeder = asyncio.create_task(self._feed(xml_paths, path_q))
+            parsers = [asyncio.create_task(self._parse(pool, path_q, text_q))
+                       for _ in range(self.parse_workers)]
+            extractors = [asyncio.create_task(self._extract(text_q, result_q))
+                          for _ in range(self.concurrency)]
+
+            async def close_stages():
+                await feeder
+                await asyncio.gather(*parsers)
+                for _ in extractors:
+                    await text_q.put(_DONE)
+                await asyncio.gather(*extractors)
+                await result_q.put(_DONE)
+                await writer
+
+            # an unexpected error in any stage ends the run instead of leaving the others blocked on a queue
+            tasks = [writer, feeder, *parsers, *extractors, asyncio.create_task(close_stages())]
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            failed = next((t for t in done if not t.cancelled() and t.exception() is not None), None)
+            if failed is not None:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                raise failed.exception()
+        if self.manifest is not None:
+            self.manifest.commit()
+
+        elapsed = time.perf_counter() - started
+        self.stats["elapsed_s"] = elapsed
+        # only papers that produced output count: skipped, empty and failed ones would inflate the rate
+        self.stats["papers_per_min"] = self.stats["succeeded"] / max(elapsed, 1e-9) * 60
+        return self.stats
+
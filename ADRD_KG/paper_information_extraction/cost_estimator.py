@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+"""
+cost_estimator.py  ▸  Offline dry run of an extraction: tokens, dollars and
+projected wall-clock time, without sending a single request.
+
+Every input is cleaned exactly as the real run would (clean_pmc_xml on a
+process pool), turned into the same prompt(s) (truncated, or one per chunk with
+--chunked) and counted with the local tokenizer (token_counter.py). Costs come
+from agents.price_map; the time projection takes the slowest of the request
+budget (rpm), the token budget (tpm) and the in-flight limit
+(concurrency × per-request latency).
+
+Driven from the extraction entry point:
+$ python extract_info_from_paper.py --xml_dir /path/to/pmc_xml --model gpt-4.1 --dry_run
+$ python extract_info_from_paper.py --xml_dir /path/to/pmc_xml --chunked --concurrency 32 \
+        --rate_limits rate_limits.json --dry_run
+"""
+
+import os, time
+from concurrent.futures import ProcessPoolExecutor
+
+from agents import price_map, batch_discount
+from preprocess_xml import clean_pmc_xml
+from rate_limiter import DEFAULT_LIMITS, load_rate_limits
+from token_counter import count_tokens
+from section_filter import prefilter_text
+from extract_info_from_paper import DATASET_PROMPT, MAX_PROMPT_CHARS, split_sections
+
+EXPECTED_OUTPUT_TOKENS = 1000   # same default as Agent.expected_output_tokens
+EST_LATENCY_S = 20.0            # assumed seconds per synchronous request
+
+
+def prompts_for(text, chunk_chars=None, prefilter=None):
+    """The prompts the real run would send for one cleaned paper."""
+    if prefilter is not None:
+        text = prefilter_text(text, prefilter)
+    text = text.strip()
+    if not text:
+        return []
+    if chunk_chars:
+        return [DATASET_PROMPT.replace("<<FULLTEXT>>", chunk) for chunk in split_sections(text, chunk_chars)]
+    return [DATASET_PROMPT.replace("<<FULLTEXT>>", text[:MAX_PROMPT_CHARS])]
+
+
+def _estimate_one(args):
+    """Process-pool worker: clean (or read) one input and count its prompt tokens."""
+    path, chunk_chars, prefilter = args
+    try:
+        if path.endswith(".xml"):
+            text = clean_pmc_xml(path)
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+    except Exception as e:
+        return path, None, str(e)
+    return path, [count_tokens(prompt) for prompt in prompts_for(text, chunk_chars, prefilter)], None
+
+
+def estimate_corpus(paths, model, concurrency=16, chunk_chars=None, rate_limits=None, workers=None,
+                    expected_output_tokens=EXPECTED_OUTPUT_TOKENS, latency_s=EST_LATENCY_S, prefilter=None):
+    """
+    Count prompt tokens for every input and project cost and duration.
+
+    Args:
+        paths (list[str]): PMC .xml files (cleaned first) or already-cleaned .txt files.
+        model (str): Key into agents.price_map.
+        concurrency (int): Max in-flight requests of the real run.
+        chunk_chars (int | None): Chunk size for --chunked runs, None for one truncated prompt.
+        rate_limits (str | dict | None): rate_limiter JSON config (path or parsed); defaults
+            to rate_limiter.DEFAULT_LIMITS.
+        workers (int | None): Processes for cleaning and tokenizing.
+        prefilter (float | None): section_filter threshold of a --prefilter run.
+
+    Returns:
+        dict: Token, request, dollar and time totals.
+    """
+    if isinstance(rate_limits, str):
+        rate_limits = load_rate_limits(rate_limits)
+    limits = {**DEFAULT_LIMITS, **(rate_limits or {}).get(model, (rate_limits or {}).get("default", {}))}
+    price = price_map.get(model, {"input": 0, "output": 0})
+
+    started = time.perf_counter()
+    stats = {"files": len(paths), "papers": 0, "empty": 0, "failed": 0, "requests": 0,
+             "prompt_tokens": 0, "max_prompt_tokens": 0}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        jobs = ((path, chunk_chars, prefilter) for path in paths)
+        for path, counts, error in pool.map(_estimate_one, jobs, chunksize=64):
+            if error is not None:
+                stats["failed"] += 1
+            elif not counts:
+                stats["empty"] += 1
+            else:
+                stats["papers"] += 1
+                stats["requests"] += len(counts)
+                stats["prompt_tokens"] += sum(counts)
+                stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], max(counts))
+    stats["scan_s"] = time.perf_counter() - started
+
+    requests = stats["requests"]
+    output_tokens = requests * expected_output_tokens
+    input_cost = stats["prompt_tokens"] / 1e6 * price["input"]
+    output_cost = output_tokens / 1e6 * price["output"]
+
+    effective_concurrency = max(min(concurrency, limits["max_concurrency"]), 1)
+    bounds = {
+        "rpm": requests / limits["rpm"] * 60,
+        "tpm": (stats["prompt_tokens"] + output_tokens) / limits["tpm"] * 60,
+        "concurrency": requests * latency_s / effective_concurrency,
+    }
+    bottleneck = max(bounds, key=bounds.get)
+
+    stats.update({
+        "model": model,
+        "limits": limits,
+        "concurrency": effective_concurrency,
+        "output_tokens": output_tokens,
+        "input_cost": input_cost,
+        "output_cost": output_cost,
+        "total_cost": input_cost + output_cost,
+        "batch_cost": (input_cost + output_cost) * batch_discount,
+        "time_bounds_s": bounds,
+        "bottleneck": bottleneck,
+        "projected_s": bounds[bottleneck],
+    })
+    return stats
+
+
+def _duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}m{rest % 60:02d}s"
+
+
+def print_estimate(e):
+    limits = e["limits"]
+    print(f"Dry run for {e['model']}: {e['files']} files scanned in {e['scan_s']:.1f}s "
+          f"({e['papers']} papers, {e['empty']} empty, {e['failed']} unreadable)")
+    print("-" * 80)
+    print(f"{'Requests':<22} {e['requests']}")
+    print(f"{'Prompt tokens (M)':<22} {e['prompt_tokens'] / 1e6:.3f}  (largest prompt {e['max_prompt_tokens']})")
+    print(f"{'Output tokens (M)':<22} {e['output_tokens'] / 1e6:.3f}  (estimated)")
+    print(f"{'Input cost ($)':<22} {e['input_cost']:.4f}")
+    print(f"{'Output cost ($)':<22} {e['output_cost']:.4f}")
+    print(f"{'Total cost ($)':<22} {e['total_cost']:.4f}  (Batch API: {e['batch_cost']:.4f})")
+    print(f"{'Cost per paper ($)':<22} {e['total_cost'] / max(e['papers'], 1):.5f}")
+    print("-" * 80)
+    print(f"Limits: {limits['rpm']} rpm, {limits['tpm']} tpm, concurrency {e['concurrency']}")
+    for name, seconds in e["time_bounds_s"].items():
+        marker = "  ◀ bottleneck" if name == e["bottleneck"] else ""
+        print(f"  {name + ' bound':<20} {_duration(seconds)}{marker}")
+    print(f"Projected wall-clock: {_duration(e['projected_s'])}")
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""
+entity_normalizer.py  ▸  Canonical IDs for dataset / tool mentions in the
+extraction outputs ("ADNI", "Alzheimer's Disease Neuroimaging Initiative",
+"ADNI-3" → dataset:adni).
+
+A mention is resolved by, in order:
+  1. its normalized key (accents, case and punctuation folded), looked up in
+     the alias dictionary and in everything resolved before;
+  2. the key without a trailing version/phase or generic words ("ADNI-3",
+     "SPM12", "FSL 6", "the OASIS cohort");
+  3. the acronym of a multi-word name ("Harvard Aging Brain Study" → HABS);
+  4. candidate blocking on a character-trigram inverted index: only aliases
+     sharing trigrams with the mention are scored (Dice on trigram sets, and
+     any numbers must agree), so matching is never pairwise over all names;
+and otherwise becomes a new canonical entity, which is indexed immediately so
+later papers can match it (incremental updates).
+
+Usage
+-----
+$ python entity_normalizer.py --input_dir dataset_info --save entities.json
+$ python entity_normalizer.py --input_dir new_outputs --load entities.json --save entities.json
+"""
+
+import os, re, json, time, argparse
+from collections import Counter, defaultdict
+from unidecode import unidecode
+
+# Extraction fields whose mentions are normalized, and the entity type they map to
+FIELD_TYPES = {
+    "Dataset_Names": "dataset",
+    "Preprocessing_Tools": "tool",
+    "Analysis_Tools": "tool",
+}
+
+DEFAULT_ALIASES = {
+    "dataset": {
+        "ADNI": ["Alzheimer's Disease Neuroimaging Initiative", "ADNI-GO", "ADNI GO"],
+        "OASIS": ["Open Access Series of Imaging Studies"],
+        "NACC": ["National Alzheimer's Coordinating Center", "NACC UDS", "Uniform Data Set"],
+        "AIBL": ["Australian Imaging, Biomarker and Lifestyle Study", "Australian Imaging Biomarkers and Lifestyle"],
+        "UK Biobank": ["UKB", "UKBB"],
+        "HABS": ["Harvard Aging Brain Study"],
+        "A4": ["A4 Study", "Anti-Amyloid Treatment in Asymptomatic Alzheimer's Disease"],
+        "BioFINDER": ["Swedish BioFINDER"],
+        "DIAN": ["Dominantly Inherited Alzheimer Network"],
+        "ROSMAP": ["ROS/MAP", "Religious Orders Study and Rush Memory and Aging Project"],
+        "WRAP": ["Wisconsin Registry for Alzheimer's Prevention"],
+        "PPMI": ["Parkinson's Progression Markers Initiative"],
+    },
+    "tool": {
+        "FreeSurfer": ["Free Surfer", "recon-all"],
+        "FSL": ["FMRIB Software Library", "FMRIB's Software Library"],
+        "SPM": ["Statistical Parametric Mapping"],
+        "ANTs": ["Advanced Normalization Tools", "ANTsR", "ANTsPy"],
+        "AFNI": ["Analysis of Functional NeuroImages"],
+        "MRtrix": ["MRtrix3"],
+        "CAT12": ["Computational Anatomy Toolbox"],
+        "TBSS": ["Tract-Based Spatial Statistics"],
+        "DSI Studio": [],
+        "MATLAB": [],
+        "R": ["R software", "R statistical software"],
+        "Python": [],
+    },
+}
+
+_STOPWORDS = {"of", "the", "and", "for", "in", "on", "at", "s"}
+# Generic words around a name that do not change which entity it is ("the ADNI cohort")
+_GENERIC_PREFIX = re.compile(r"^(?:the\s+)+")
+_GENERIC_SUFFIX = re.compile(r"(?:\s+(?:cohort|cohorts|dataset|datasets|data|database|sample|samples|"
+                             r"participants|subjects|software|toolbox|package))+$")
+# Trailing versions/phases: "ADNI-3", "ADNI GO", "SPM12", "FSL 6.0", "R version 4". Roman numerals are left alone: a
+# trailing "i"/"v"/"x" word is as often part of the name; digits() makes them agree in fuzzy matching
+_VERSION = re.compile(r"(?:[\s-]+(?:go|phase\s*\d+)|[\s-]*(?:version\s+|v)?\d+(?:\.\d+)*)+$")
+
+
+def name_key(text):
+    """Fold accents, case, apostrophes and punctuation: "Alzheimer's-Disease" → "alzheimers disease"."""
+    text = unidecode(text).lower().replace("'", "")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def acronym(key):
+    """Initials of a multi-word name; names with numbers are too specific to abbreviate."""
+    words = [w for w in key.split() if w not in _STOPWORDS]
+    if len(words) < 3 or any(not w.isalpha() for w in words) or digits(key):
+        return None
+    return "".join(w[0] for w in words)
+
+
+def digits(key):
+    """Numbers in a key, roman numeral words as their value: "study ii" and "study 2" agree."""
+    return tuple(str(_roman_value(n)) if n[0] in "ivx" else n
+                 for n in re.findall(r"\d+|\b(?=[ivx]+\b)x{0,3}(?:ix|iv|v?i{0,3})\b", key) if n)
+
+
+def _roman_value(numeral):
+    values = [{"i": 1, "v": 5, "x": 10}[c] for c in numeral]
+    return sum(-v if v < w else v for v, w in zip(values, values[1:] + [0]))
+
+
+class EntityNormalizer:
+    """Alias dictionary + trigram-blocked fuzzy matching, updated as it resolves mentions."""
+
+    def __init__(self, aliases=DEFAULT_ALIASES, threshold=0.8, min_fuzzy_len=5, max_postings=5000, top_k=20):
+        self.threshold = threshold
+        self.min_fuzzy_len = min_fuzzy_len    # shorter keys (FSL, SPM, R…) only match exactly
+        self.max_postings = max_postings      # trigrams this common carry no signal; skip them
+        self.top_k = top_k
+        self.entities = {}                    # canonical id → {"type", "name", "aliases"}
+        self.keys = {}                        # (type, key) → canonical id (aliases + resolved mentions)
+        self.alias_grams = []                 # alias number → (canonical id, trigram count, digits)
+        self.postings = defaultdict(lambda: defaultdict(list))   # type → trigram → alias numbers
+        for entity_type, entries in (aliases or {}).items():
+            for name, names in entries.items():
+                canonical = self.new_entity(entity_type, name)
+                for alias in names:
+                    self.add_alias(canonical, alias)
+
+    # -- index maintenance -------------------------------------------
+    def _index(self, canonical, key):
+        entity_type = self.entities[canonical]["type"]
+        if (entity_type, key) in self.keys:
+            return
+        self.keys[(entity_type, key)] = canonical
+        if len(key) >= self.min_fuzzy_len:
+            grams = trigrams(key)
+            number = len(self.alias_grams)
+            self.alias_grams.append((canonical, len(grams), digits(key)))
+            for gram in grams:
+                self.postings[entity_type][gram].append(number)
+
+    def new_entity(self, entity_type, name):
+        key = name_key(name)
+        canonical = f"{entity_type}:{key.replace(' ', '_')}"
+        if canonical not in self.entities:
+            self.entities[canonical] = {"type": entity_type, "name": name, "aliases": []}
+        self._index(canonical, key)
+        short = acronym(key)
+        if short and (entity_type, short) not in self.keys:
+            self.keys[(entity_type, short)] = canonical
+        return canonical
+
+    def add_alias(self, canonical, alias):
+        """Teach the normalizer that `alias` names `canonical` (also updates the n-gram index)."""
+        if alias not in self.entities[canonical]["aliases"]:
+            self.entities[canonical]["aliases"].append(alias)
+        self._index(canonical, name_key(alias))
+
+    # -- resolution --------------------------------------------------
+    def _fuzzy(self, entity_type, key):
+        if len(key) < self.min_fuzzy_len:
+            return None
+        grams = trigrams(key)
+        postings = self.postings[entity_type]
+        shared = Counter()
+        for gram in grams:
+            hits = postings.get(gram)
+            if hits and len(hits) <= self.max_postings:
+                shared.update(hits)
+        numbers = digits(key)
+        best, best_score = None, self.threshold
+        for number, count in shared.most_common(self.top_k):
+            canonical, size, alias_digits = self.alias_grams[number]
+            score = 2 * count / (len(grams) + size)
+            if score >= best_score and alias_digits == numbers:    # "Cohort 12" is not "Cohort 13"
+                best, best_score = canonical, score
+        return best
+
+    def canonical(self, entity_type, mention):
+        """Canonical id for one mention, creating a new entity if nothing matches."""
+        key = name_key(mention)
+        if not key:
+            return None
+        canonical = self.keys.get((entity_type, key))
+        if canonical is not None:
+            return canonical
+
+        unversioned = _GENERIC_SUFFIX.sub("", _GENERIC_PREFIX.sub("", key))
+        base = _VERSION.sub("", unversioned).strip()
+        # one-letter bases ("R") only when a version number was stripped: "R 4.0" is R, "R GO" is not
+        numbered = any(c.isdigit() for c in unversioned[len(base):])
+        short = acronym(key)
+        canonical = (
+            (self.keys.get((entity_type, base)) if base and base != key and (len(base) >= 2 or numbered) else None)
+            or (self.keys.get((entity_type, short)) if short else None)
+            or self._fuzzy(entity_type, key)
+        )
+        if canonical is None:
+            canonical = self.new_entity(entity_type, mention)
+        else:
+            self.keys[(entity_type, key)] = canonical      # memoize; not indexed, so no drift
+        return canonical
+
+    def name(self, canonical):
+        return self.entities[canonical]["name"]
+
+    def normalize_extraction(self, extraction, field_types=FIELD_TYPES):
+        """
+        Copy of an extraction dict with mentions in field_types replaced by their
+        canonical names (deduplicated, first occurrence order).
+        """
+        out = dict(extraction)
+        for field, entity_type in field_types.items():
+            values = extraction.get(field)
+            if not isinstance(values, list):
+                continue
+            names = []
+            for value in values:
+                canonical = self.canonical(entity_type, value) if isinstance(value, str) else None
+                name = self.name(canonical) if canonical else value
+                if name not in names:
+                    names.append(name)
+            out[field] = names
+        return out
+
+    # -- persistence -------------------------------------------------
+    def save(self, path):
+        state = {"entities": self.entities,
+                 "mentions": {f"{t}\t{k}": c for (t, k), c in self.keys.items()}}
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        normalizer = cls(aliases=None, **kwargs)
+        for canonical, entity in state["entities"].items():
+            normalizer.entities[canonical] = {"type": entity["type"], "name": entity["name"], "aliases": []}
+            normalizer._index(canonical, name_key(entity["name"]))
+            for alias in entity["aliases"]:
+                normalizer.add_alias(canonical, alias)
+        for typed_key, canonical in state.get("mentions", {}).items():
+            entity_type, key = typed_key.split("\t", 1)
+            normalizer.keys.setdefault((entity_type, key), canonical)
+        return normalizer
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--input_dir", required=True, help="Directory of <paper_id>.json extraction outputs")
+    p.add_argument("--load",      default=None, help="Resume from a saved normalizer state")
+    p.add_argument("--save",      default=None, help="Write the updated state here")
+    p.add_argument("--top",       type=int, default=15, help="Show the most-merged entities")
+    args = p.parse_args()
+
+    normalizer = EntityNormalizer.load(args.load) if args.load else EntityNormalizer()
+    mentions = []
+    for name in sorted(os.listdir(args.input_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(args.input_dir, name), "r", encoding="utf-8") as f:
+                extraction = json.load(f)
+            for field, entity_type in FIELD_TYPES.items():
+                mentions.extend((entity_type, v) for v in extraction.get(field) or [] if isinstance(v, str))
+
+    started = time.perf_counter()
+    variants = defaultdict(set)
+    for entity_type, mention in mentions:
+        canonical = normalizer.canonical(entity_type, mention)
+        if canonical:
+            variants[canonical].add(mention)
+    elapsed = time.perf_counter() - started
+    print(f"✅ {len(mentions)} mentions → {len(variants)} canonical entities in {elapsed:.2f}s "
+          f"({len(mentions) / max(elapsed, 1e-9):.0f} mentions/s)")
+    for canonical, names in sorted(variants.items(), key=lambda kv: -len(kv[1]))[:args.top]:
+        print(f"  {canonical:<32} {len(names):>4} variants  e.g. {sorted(names)[:4]}")
+    if args.save:
+        normalizer.save(args.save)
+        print(f"State saved to {args.save}")
@@ -9,10 +9,47 @@ $ python extract_info_from_text.py \
         --txt_file  /path/to/cleaned_PMC8640037.txt \
         --output_dir /path/to/dataset_info \
         --model      gpt-4.1            # optional
+
+Long papers: add --chunked to split on the === SECTION === headers emitted by
+clean_pmc_xml, extract every chunk concurrently and merge the results instead
+of truncating at 45k characters.
+
+Corpus mode (staged pipeline over many PMC XML files, see corpus_pipeline.py)
+$ python extract_info_from_text.py \
+        --xml_dir     /path/to/pmc_xml \
+        --output_dir  /path/to/dataset_info \
+        --concurrency 32
+
+Corpus mode over a cleaned-text store (tar_ingest.py / text_store.py) instead
+of XML files: --text_store /path/to/cleaned_store (optionally --paper_ids ...).
+
+Add --batch to the corpus mode to submit everything through the Batch API
+instead (cheaper, hours of latency; see batch_api.py).
+
+Add --manifest runs.sqlite to the corpus mode to make it resumable: a rerun
+only processes new, changed or failed papers (see manifest.py).
+
+Add --prefilter to any mode to send only the abstract and the sections a local
+keyword / TF-IDF scorer finds relevant (see section_filter.py for the scorer and
+its recall / token-spend evaluation).
+
+Add --route to the single-file or pipeline mode to try a cheap model first and
+escalate only papers whose answer fails schema / confidence checks (policy
+from --routing_config, see model_router.py).
+
+Add --hedge_percentile 95 to duplicate requests slower than that percentile of
+recent latencies (first answer wins; --hedge_budget caps the extra requests,
+see hedging.py).
+
+Add --dry_run to any mode to count tokens and project cost and run time
+offline before launching it (see cost_estimator.py).
 """
 
-import os, json, argparse, asyncio
+import os, re, json, argparse, asyncio
+from loguru import logger
 from agents import Agent     # your existing wrapper
+from output_validation import repair_json, validate_fields
+from token_counter import count_tokens
 
 # -------------------------------------------------------------------
 DATASET_PROMPT = """
@@ -31,42 +68,368 @@ used in the following full-text article.  Return **valid JSON** with keys:
 Text:
 <<FULLTEXT>>
 """
+DATASET_FIELDS = [
+    "Dataset_Names", "Dataset_Sources", "Data_Types", "Brain_Regions", "Cohort_Info",
+    "Preprocessing_Tools", "Analysis_Tools", "Key_Findings", "Top_Cited_Papers",
+]
+# Sent when the answer came back without some keys, typically because it was cut off:
+# the keys already answered, the missing ones and a short excerpt, not the whole paper again.
+REASK_PROMPT = """
+You are an expert biomedical reader. An earlier extraction from the article
+excerpted below already returned:
+<<ANSWER>>
+
+It was cut off before these keys. Return **valid JSON** with ONLY these keys:
+<<FIELDS>>
+
+Text (excerpt):
+<<CONTEXT>>
+"""
+MAX_REASKS = 1
+REASK_CONTEXT_CHARS = 12_000   # excerpt sent with a re-ask (≈ 3k tokens, a quarter of a full prompt)
+MAX_PROMPT_CHARS = 45_000
+# (45 k chars ≈ 11-12k tokens, adjust if your model’s context >/ < that.)
+CHUNK_CHARS = 15_000    # per-request budget in chunked mode; chunks run concurrently
+SECTION_HEADER = re.compile(r"^=== .+ ===$", re.MULTILINE)
+
 # -------------------------------------------------------------------
-async def extract_dataset_info(txt_path: str, model: str = "gpt-4.1"):
-    """Read cleaned text, send to LLM, return parsed JSON (dict)."""
-    with open(txt_path, "r", encoding="utf-8") as fh:
-        full_text = fh.read().strip()
+def reask_prompt(data, missing, text):
+    """Follow-up asking only for the missing keys, given the answer so far and an excerpt of text."""
+    return (REASK_PROMPT
+            .replace("<<ANSWER>>", json.dumps(data, ensure_ascii=False))
+            .replace("<<FIELDS>>", "\n".join(f"- {field}" for field in missing))
+            .replace("<<CONTEXT>>", text[:REASK_CONTEXT_CHARS]))
+
+
+async def extract_validated(text: str, agent: Agent, paper_id: str = None, max_reasks: int = MAX_REASKS):
+    """
+    One DATASET_PROMPT request over text, repaired locally and checked against
+    DATASET_FIELDS. Keys that are still missing are re-asked (and only those),
+    up to max_reasks times, with the answer so far and a short excerpt instead
+    of the whole paper.
+
+    Returns:
+        tuple[dict, list[str]]: The validated fields and the keys that never arrived.
+    """
+    prompt = DATASET_PROMPT.replace("<<FULLTEXT>>", text)
+    raw = await agent.process(prompt, step=0, response_format="JSON", paper_id=paper_id)
+    obj, repaired = repair_json(raw)
+    if repaired:
+        logger.info(f"{paper_id}: repaired malformed JSON locally")
+    data, missing = validate_fields(obj or {}, DATASET_FIELDS)
+
+    for _ in range(max_reasks):
+        if not missing:
+            break
+        followup = reask_prompt(data, missing, text)
+        logger.info(f"{paper_id}: re-asking {len(missing)} keys with {count_tokens(followup)} prompt tokens "
+                    f"(a full retry would send {count_tokens(prompt)})")
+        raw = await agent.process(followup, step="reask", response_format="JSON", paper_id=paper_id)
+        extra, _ = validate_fields(repair_json(raw)[0] or {}, missing)
+        data.update(extra)
+        missing = [field for field in missing if field not in extra]
+
+    if missing:
+        logger.warning(f"{paper_id}: no answer for {', '.join(missing)}")
+    return {field: data.get(field, []) for field in DATASET_FIELDS}, missing
+
+
+async def extract_dataset_info_from_text(full_text: str, agent: Agent, paper_id: str = None):
+    """Send already-cleaned text to the LLM through an existing Agent; returns validated JSON."""
+    full_text = full_text.strip()
     if not full_text:
         return None
 
-    prompt = DATASET_PROMPT.replace("<<FULLTEXT>>", full_text[:45_000]) 
-    # (45 k chars ≈ 11-12k tokens, adjust if your model’s context >/ < that.)
+    data, _ = await extract_validated(full_text[:MAX_PROMPT_CHARS], agent, paper_id)
+    return json.dumps(data)
 
-    agent = Agent(model=model)
-    return await agent.process(prompt, step=0, response_format="JSON")
+
+def split_sections(full_text: str, max_chars: int = CHUNK_CHARS):
+    """
+    Pack the === SECTION === blocks of a cleaned paper into chunks of at most
+    max_chars. Sections are never merged across a chunk boundary; a single
+    section longer than max_chars is cut into consecutive max_chars pieces.
+    """
+    starts = [m.start() for m in SECTION_HEADER.finditer(full_text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [full_text[a:b].strip() for a, b in zip(starts, starts[1:] + [len(full_text)])]
+
+    chunks, current = [], ""
+    for sec in filter(None, sections):
+        while len(sec) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sec[:max_chars])
+            sec = sec[max_chars:]
+        if current and len(current) + len(sec) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{sec}" if current else sec
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def value_key(value):
+    """Comparison key for one extracted value: case/space-folded strings, canonical JSON otherwise."""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return json.dumps(value, sort_keys=True).lower()
+
+
+def merge_extractions(results):
+    """Union the nine fields across per-chunk results, dropping duplicates (case-insensitive)."""
+    merged = {field: [] for field in DATASET_FIELDS}
+    seen = {field: set() for field in DATASET_FIELDS}
+    for result in results:
+        for field in DATASET_FIELDS:
+            values = result.get(field) or []
+            if not isinstance(values, list):
+                values = [values]
+            for value in values:
+                key = value_key(value)
+                if key and key not in seen[field]:
+                    seen[field].add(key)
+                    merged[field].append(value)
+    return merged
+
+
+async def extract_dataset_info_chunked(full_text: str, agent: Agent, chunk_chars: int = CHUNK_CHARS,
+                                       paper_id: str = None):
+    """Map-reduce variant: one concurrent request per chunk, merged into a single JSON string."""
+    chunks = split_sections(full_text.strip(), chunk_chars)
+    if not chunks:
+        return None
+
+    responses = await asyncio.gather(
+        *(extract_validated(chunk, agent, paper_id) for chunk in chunks),
+        return_exceptions=True,
+    )
+    results = []
+    for i, response in enumerate(responses):
+        if isinstance(response, BaseException):
+            logger.warning(f"Chunk {i + 1}/{len(chunks)} failed: {response}")
+            continue
+        parsed, missing = response
+        if len(missing) < len(DATASET_FIELDS):
+            results.append(parsed)
+        else:
+            logger.warning(f"Chunk {i + 1}/{len(chunks)} returned no usable JSON")
+    if not results:
+        raise RuntimeError(f"All {len(chunks)} chunks failed")
+    return json.dumps(merge_extractions(results))
+
+
+async def extract_dataset_info(txt_path: str, model: str = "gpt-4.1", agent: Agent = None,
+                               chunked: bool = False, chunk_chars: int = CHUNK_CHARS, prefilter: float = None,
+                               router=None, text_store=None):
+    """
+    Read cleaned text, send to LLM, return parsed JSON (dict).
+    prefilter: section_filter threshold; router: model_router.ModelRouter used instead of agent;
+    text_store: text_store.TextStore, txt_path is then a paper ID in it.
+    """
+    if text_store is not None:
+        full_text = text_store.get(txt_path)
+        if full_text is None:
+            raise KeyError(f"{txt_path} not in text store {text_store.path}")
+    else:
+        with open(txt_path, "r", encoding="utf-8") as fh:
+            full_text = fh.read()
+    if prefilter is not None:
+        from section_filter import prefilter_text
+        full_text = prefilter_text(full_text, prefilter)
+
+    paper_id = os.path.splitext(os.path.basename(txt_path))[0]
+    if router is not None:
+        result = await router.extract(full_text, paper_id, chunk_chars if chunked else None)
+        return json.loads(result) if result else None
+
+    if agent is None:
+        agent = Agent(model=model)
+    if chunked:
+        result = await extract_dataset_info_chunked(full_text, agent, chunk_chars, paper_id)
+    else:
+        result = await extract_dataset_info_from_text(full_text, agent, paper_id)
+    return json.loads(result) if result else None
 
 
 # -------------------------------------------------------------------
 if __name__ == "__main__":
     p = argparse.ArgumentParser()
-    p.add_argument("--txt_file",   required=True, help="Clean full-text .txt file")
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--txt_file",   help="Clean full-text .txt file")
+    src.add_argument("--xml_dir",    help="Directory of PMC .xml files (corpus mode)")
+    src.add_argument("--xml_files",  nargs="+", help="List of PMC .xml files (corpus mode)")
+    src.add_argument("--text_store", help="text_store.TextStore of cleaned papers (corpus mode)")
+    p.add_argument("--paper_ids",  nargs="+", default=None, help="Only these papers of --text_store")
     p.add_argument("--output_dir", default="dataset_info", help="Where to save JSON")
     p.add_argument("--model",      default="gpt-4.1")
+    p.add_argument("--base_url",   default=None, help="OpenAI-compatible endpoint (e.g. local mock)")
+    p.add_argument("--api_key",    default=None, help="Overrides api_keys.json")
+    p.add_argument("--chunked",    action="store_true", help="Split by section and merge instead of truncating")
+    p.add_argument("--chunk_chars", type=int, default=CHUNK_CHARS, help="Max characters per chunk (with --chunked)")
+    p.add_argument("--concurrency",   type=int, default=16, help="Max papers in extraction at once (corpus mode; × chunks calls with --chunked)")
+    p.add_argument("--parse_workers", type=int, default=None, help="Processes for XML cleaning (corpus mode)")
+    p.add_argument("--queue_size",    type=int, default=64, help="Bound of each inter-stage queue (corpus mode)")
+    p.add_argument("--cache_db",      default=None, help="SQLite response cache; reruns reuse identical prompts")
+    p.add_argument("--cache_max_mb",  type=float, default=2048, help="Evict least-recently-used entries above this size")
+    p.add_argument("--cache_max_age_days", type=float, default=90, help="Evict entries older than this")
+    p.add_argument("--batch",         action="store_true", help="Submit the corpus through the Batch API (corpus mode)")
+    p.add_argument("--poll_interval", type=float, default=60, help="Seconds between batch status polls (with --batch)")
+    p.add_argument("--rate_limits",   default=None, help="JSON of per-model rpm/tpm/max_concurrency budgets")
+    p.add_argument("--telemetry",     default=None, help="Append per-request records to this JSONL (+ .prom snapshot)")
+    p.add_argument("--max_connections", type=int, default=100, help="Keep-alive connection pool size")
+    p.add_argument("--http2",         action="store_true", help="Use HTTP/2 to the API (needs the h2 package)")
+    p.add_argument("--manifest",      default=None, help="SQLite manifest; reruns only process new/changed/failed papers")
+    p.add_argument("--prefilter",     action="store_true", help="Only send the abstract + relevant sections")
+    p.add_argument("--prefilter_threshold", type=float, default=None, help="Section score cut-off (with --prefilter)")
+    p.add_argument("--route",         action="store_true", help="Cheap model first, escalate failing papers")
+    p.add_argument("--routing_config", default=None, help="JSON routing policy (implies --route)")
+    p.add_argument("--hedge_percentile", type=float, default=None, help="Hedge calls slower than this latency percentile")
+    p.add_argument("--hedge_budget",  type=float, default=0.05, help="Max share of requests that may be hedged")
+    p.add_argument("--dry_run",       action="store_true", help="Only estimate tokens, cost and run time (no requests)")
+    p.add_argument("--est_latency_s", type=float, default=20.0, help="Assumed seconds per request (with --dry_run)")
     args = p.parse_args()
+    if (args.route or args.routing_config) and args.batch:
+        p.error("--route is not supported with --batch")
+    if args.chunked and args.batch:
+        p.error("--chunked is not supported with --batch")
+    if args.text_store and (args.batch or args.manifest or args.dry_run):
+        p.error("--text_store is not supported with --batch, --manifest or --dry_run")
+    prefilter = None
+    if args.prefilter:
+        from section_filter import DEFAULT_THRESHOLD
+        prefilter = DEFAULT_THRESHOLD if args.prefilter_threshold is None else args.prefilter_threshold
+
+    if args.dry_run:
+        from cost_estimator import estimate_corpus, print_estimate
+
+        if args.txt_file:
+            paths = [args.txt_file]
+        else:
+            from corpus_pipeline import collect_xml_files
+            paths = collect_xml_files([args.xml_dir] if args.xml_dir else args.xml_files)
+        print_estimate(estimate_corpus(
+            paths, args.model,
+            concurrency=args.concurrency,
+            chunk_chars=args.chunk_chars if args.chunked else None,
+            rate_limits=args.rate_limits,
+            workers=args.parse_workers,
+            latency_s=args.est_latency_s,
+            prefilter=prefilter,
+        ))
+        raise SystemExit(0)
 
     os.makedirs(args.output_dir, exist_ok=True)
-    out_path = os.path.join(
-        args.output_dir,
-        os.path.basename(args.txt_file).replace(".txt", ".json"),
-    )
 
-    try:
-        result = asyncio.run(extract_dataset_info(args.txt_file, args.model))
-        if result:
-            with open(out_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, indent=2)
-            print(f"[✅] Saved extraction → {out_path}")
+    cache = None
+    if args.cache_db:
+        from response_cache import ResponseCache
+        cache = ResponseCache(args.cache_db, max_bytes=int(args.cache_max_mb * 1024**2),
+                              max_age_days=args.cache_max_age_days)
+
+    telemetry = None
+    if args.telemetry:
+        from telemetry import TelemetrySink
+        telemetry = TelemetrySink(args.telemetry)
+
+    rate_limiter = None
+    if args.rate_limits:
+        from rate_limiter import get_rate_limiter
+        rate_limiter = get_rate_limiter(args.model, args.rate_limits)
+
+    from client_pool import get_client_pool
+    client_pool = get_client_pool(max_connections=args.max_connections, http2=args.http2)
+
+    hedge = None
+    if args.hedge_percentile is not None:
+        from hedging import HedgePolicy
+        hedge = {"percentile": args.hedge_percentile, "budget": args.hedge_budget}
+
+    agent = Agent(model=args.model, base_url=args.base_url, api_key=args.api_key, cache=cache,
+                  rate_limiter=rate_limiter, telemetry=telemetry, client_pool=client_pool,
+                  hedge=HedgePolicy(**hedge) if hedge else None)
+
+    router = None
+    if args.route or args.routing_config:
+        from model_router import ModelRouter, load_routing_policy
+        policy = load_routing_policy(args.routing_config)
+        router = ModelRouter.from_policy(policy, rate_limits=args.rate_limits, base_url=args.base_url,
+                                         api_key=args.api_key, cache=cache, telemetry=telemetry,
+                                         client_pool=client_pool, hedge=hedge)
+        logger.info(f"Routing through {' → '.join(policy['models'])}")
+
+    if args.txt_file is None:
+        from corpus_pipeline import CorpusPipeline, collect_xml_files
+
+        text_store = None
+        if args.text_store:
+            from text_store import TextStore
+            text_store = TextStore(args.text_store, read_only=True)
+            xml_paths = [pid for pid in args.paper_ids if pid in text_store] if args.paper_ids else text_store.ids()
         else:
-            print("[❌] No content / extraction failed.")
-    except Exception as e:
-        print("[❌] LLM extraction error:", e)
+            xml_paths = collect_xml_files([args.xml_dir] if args.xml_dir else args.xml_files)
+        manifest = None
+        if args.manifest:
+            from manifest import Manifest
+            manifest = Manifest(args.manifest)
+
+        if args.batch:
+            from batch_api import run_batch_corpus
+
+            stats = asyncio.run(run_batch_corpus(agent, xml_paths, args.output_dir,
+                                                 parse_workers=args.parse_workers,
+                                                 manifest=manifest, prefilter=prefilter,
+                                                 poll_interval=args.poll_interval))
+            print(f"[✅] {stats['succeeded']}/{stats['total']} papers via Batch API ({stats['failed']} failed, "
+                  f"{stats['empty']} empty or unparseable, {stats['skipped']} already done)")
+        else:
+            pipeline = CorpusPipeline(
+                agent,
+                args.output_dir,
+                concurrency=args.concurrency,
+                parse_workers=args.parse_workers,
+                queue_size=args.queue_size,
+                chunk_chars=args.chunk_chars if args.chunked else None,
+                manifest=manifest,
+                prefilter=prefilter,
+                router=router,
+                text_store=text_store,
+            )
+            stats = asyncio.run(pipeline.run(xml_paths))
+            print(f"[✅] {stats['succeeded']}/{stats['total']} papers in {stats['elapsed_s']:.1f}s "
+                  f"({stats['papers_per_min']:.1f} papers/min, {stats['failed']} failed, "
+                  f"{stats['empty']} empty or unparseable, {stats['skipped']} already done)")
+        if manifest is not None:
+            manifest.close()
+        if text_store is not None:
+            text_store.close()
+        (router or agent).print_usage()
+
+    else:
+        out_path = os.path.join(
+            args.output_dir,
+            os.path.basename(args.txt_file).replace(".txt", ".json"),
+        )
+
+        try:
+            result = asyncio.run(extract_dataset_info(
+                args.txt_file, args.model, agent=agent, chunked=args.chunked, chunk_chars=args.chunk_chars,
+                prefilter=prefilter, router=router))
+            if result:
+                with open(out_path, "w", encoding="utf-8") as f:
+                    json.dump(result, f, indent=2)
+                print(f"[✅] Saved extraction → {out_path}")
+            else:
+                print("[❌] No content / extraction failed.")
+        except Exception as e:
+            print("[❌] LLM extraction error:", e)
+
+    pool_stats = client_pool.stats()
+    logger.info(f"HTTP: {pool_stats['requests']} requests over {pool_stats['connections']} connections "
+                f"({pool_stats['tls_handshakes']} TLS handshakes, reuse {pool_stats['reuse_ratio']:.1%})")
+    if telemetry is not None:
+        client_pool.publish(telemetry)
+        telemetry.close()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+"""
+hedging.py  ▸  Hedged LLM requests: when a call has been outstanding longer
+than a latency percentile of recent calls, send one duplicate and keep
+whichever answers first (the loser is cancelled).
+
+    primary ──────────────x (cancelled)
+              ↑ delay = p95 of the last `window` latencies
+              └─ hedge ───────▶ answer
+
+Extra spend is capped by `budget`: at most that fraction of requests may be
+hedged (plus a small burst allowance), and optionally at most
+`max_extra_tokens` estimated tokens in total. Cancelled requests may still be
+billed by the provider, so every hedge counts against the budget whether it
+wins or not.
+
+Attach a policy with Agent(hedge=HedgePolicy(...)); one policy per model, as
+latency differs by model.
+
+Benchmark against the heavy-tailed mock server (started as a subprocess):
+$ python hedging.py --requests 1000 --concurrency 16 --latency 0.5 --latency_sigma 0.5 \
+        --tail_p 0.02 --tail_factor 20
+"""
+
+import os, sys, time, socket, asyncio, argparse, subprocess
+from collections import deque
+
+MOCK_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_openai_server.py")
+
+
+class HedgePolicy:
+    """Rolling latency percentile + hedge budget, shared by the requests of one model."""
+
+    def __init__(self, percentile=95, budget=0.05, window=1000, min_samples=50, initial_delay_s=None,
+                 min_delay_s=0.05, max_extra_tokens=None, burst=2):
+        self.percentile = percentile
+        self.budget = budget                      # hedges ≤ budget × requests (+ burst)
+        self.window = deque(maxlen=window)
+        self.min_samples = min_samples            # below this, only initial_delay_s can trigger hedges
+        self.initial_delay_s = initial_delay_s    # None → no hedging until the window has min_samples
+        self.min_delay_s = min_delay_s
+        self.max_extra_tokens = max_extra_tokens
+        self.burst = burst
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+        self.extra_tokens = 0
+        self._sorted = None
+
+    def delay(self):
+        """Seconds to wait on the primary before hedging, or None to never hedge it."""
+        if len(self.window) < self.min_samples:
+            return self.initial_delay_s
+        if self._sorted is None:
+            self._sorted = sorted(self.window)
+        rank = min(int(len(self._sorted) * self.percentile / 100), len(self._sorted) - 1)
+        return max(self._sorted[rank], self.min_delay_s)
+
+    def observe(self, latency_s):
+        self.window.append(latency_s)
+        self._sorted = None
+
+    def start(self):
+        self.requests += 1
+
+    def try_hedge(self, est_tokens):
+        """Reserve budget for one hedge; False if the budget is spent."""
+        if self.hedges + 1 > self.budget * self.requests + self.burst or (
+                self.max_extra_tokens is not None and self.extra_tokens + est_tokens > self.max_extra_tokens):
+            self.denied += 1
+            return False
+        self.hedges += 1
+        self.extra_tokens += est_tokens
+        return True
+
+    def stats(self):
+        return {"requests": self.requests, "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+                "denied": self.denied, "extra_tokens": self.extra_tokens,
+                "hedge_rate": self.hedges / max(self.requests, 1), "delay_s": self.delay()}
+
+
+async def hedged(call, policy, est_tokens=0):
+    """
+    Await call() (a coroutine factory); if it is still running after
+    policy.delay(), start call() once more and return the first successful
+    result, cancelling the other. If both fail, the primary's error is raised.
+    """
+    policy.start()
+    started = time.perf_counter()
+    primary = asyncio.ensure_future(call())
+    delay = policy.delay()
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+    except BaseException:
+        primary.cancel()
+        raise
+    if done or not policy.try_hedge(est_tokens):
+        result = await primary      # raises the primary's error as before
+        policy.observe(time.perf_counter() - started)
+        return result
+
+    backup = asyncio.ensure_future(call())
+    pending = {primary, backup}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None:
+                    if task is backup:
+                        policy.hedge_wins += 1
+                    # the primary's latency is censored when the hedge wins; record what we saw
+                    policy.observe(time.perf_counter() - started)
+                    return task.result()
+        return primary.result()     # both failed: surface the primary's error
+    finally:
+        for task in (primary, backup):
+            if not task.done():
+                task.cancel()
+        # retrieve exceptions so the loser does not log "exception was never retrieved"
+        for task in (primary, backup):
+            if task.done() and not task.cancelled():
+                task.exception()
+
+
+# -------------------------------------------------------------------
+def _percentiles(latencies):
+    latencies = sorted(latencies)
+
+    def pick(q):
+        return latencies[min(int(len(latencies) * q), len(latencies) - 1)]
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": latencies[-1],
+            "mean": sum(latencies) / len(latencies)}
+
+
+async def run_benchmark(base_url, requests, concurrency, hedge=None):
+    from agents import Agent
+
+    agent = Agent(model="gpt-4o-mini", base_url=base_url, api_key="mock", hedge=hedge)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i):
+        async with semaphore:
+            started = time.perf_counter()
+            await agent.process(f"Benchmark request {i}", step="bench", response_format="JSON")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return {**_percentiles(latencies), "elapsed_s": time.perf_counter() - started}
+
+
+def start_mock_server(port, *mock_args):
+    """Run mock_openai_server.py in its own process (in-process it would share our GIL) and wait for it."""
+    process = subprocess.Popen([sys.executable, MOCK_SERVER, "--port", str(port), *mock_args],
+                               stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Mock server did not start on port {port}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--port",          type=int, default=8765)
+    p.add_argument("--requests",      type=int, default=1000)
+    p.add_argument("--concurrency",   type=int, default=16)
+    p.add_argument("--latency",       type=float, default=0.5, help="Median mock latency (s)")
+    p.add_argument("--latency_sigma", type=float, default=0.5, help="Lognormal spread of mock latency")
+    p.add_argument("--tail_p",        type=float, default=0.02, help="Share of straggler requests")
+    p.add_argument("--tail_factor",   type=float, default=20, help="Straggler slowdown")
+    p.add_argument("--percentile",    type=float, default=95)
+    p.add_argument("--budget",        type=float, default=0.05)
+    args = p.parse_args()
+
+    server = start_mock_server(args.port, "--latency", str(args.latency), "--latency_sigma", str(args.latency_sigma),
+                               "--tail_p", str(args.tail_p), "--tail_factor", str(args.tail_factor))
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    policy = HedgePolicy(percentile=args.percentile, budget=args.budget)
+    rows = [("no hedging", asyncio.run(run_benchmark(base_url, args.requests, args.concurrency))),
+            ("hedged", asyncio.run(run_benchmark(base_url, args.requests, args.concurrency, policy)))]
+    server.terminate()
+
+    print(f"{'Mode':<12} {'p50 (s)':<9} {'p95 (s)':<9} {'p99 (s)':<9} {'max (s)':<9} {'mean (s)':<9} {'wall (s)':<9}")
+    print("-" * 70)
+    for name, r in rows:
+        print(f"{name:<12} {r['p50']:<9.3f} {r['p95']:<9.3f} {r['p99']:<9.3f} {r['max']:<9.3f} "
+              f"{r['mean']:<9.3f} {r['elapsed_s']:<9.2f}")
+    s = policy.stats()
+    base, hedged_run = rows[0][1], rows[1][1]
+    print(f"\n✅ p99 {base['p99']:.3f}s → {hedged_run['p99']:.3f}s "
+          f"({1 - hedged_run['p99'] / base['p99']:.0%} lower) with {s['hedges']} hedges "
+          f"({s['hedge_rate']:.1%} extra requests, {s['hedge_wins']} won, {s['denied']} denied by budget)")
@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+"""
+knowledge_graph.py  ▸  In-memory ADRD knowledge graph over the per-paper
+extraction JSON written by extract_info_from_paper.py.
+
+Every paper becomes a node linked to typed entity nodes:
+
+    Dataset_Names        → dataset          Data_Types      → data_type
+    Dataset_Sources      → source           Brain_Regions   → brain_region
+    Preprocessing_Tools  → tool             Analysis_Tools  → tool
+    Cohort_Info          → cohort
+
+Papers and entities are interned into integers (entities by type and
+normalized name) and both directions are indexed (paper → packed entity
+edges, entity → set of papers), so a query like "papers using ADNI with DTI
+and FreeSurfer" is a few set intersections, smallest first. With an
+entity_normalizer.EntityNormalizer attached, dataset and tool mentions are
+merged by canonical ID ("ADNI-3", "Alzheimer's Disease Neuroimaging
+Initiative" → ADNI), at build and at query time. Papers can be added,
+replaced or removed one at a time, and the whole graph saves to a compact
+gzip'd snapshot of flat integer arrays.
+
+Usage
+-----
+$ python knowledge_graph.py build --input_dir dataset_info --snapshot adrd_kg.snap
+$ python knowledge_graph.py query --snapshot adrd_kg.snap \
+        --dataset ADNI --data_type DTI --tool FreeSurfer
+"""
+
+import os, gzip, json, time, pickle, argparse
+from array import array
+from collections import Counter
+
+FIELD_TYPES = {
+    "Dataset_Names": "dataset",
+    "Dataset_Sources": "source",
+    "Data_Types": "data_type",
+    "Brain_Regions": "brain_region",
+    "Preprocessing_Tools": "tool",
+    "Analysis_Tools": "tool",
+    "Cohort_Info": "cohort",
+}
+FIELDS = list(FIELD_TYPES)
+NODE_TYPES = sorted(set(FIELD_TYPES.values()))
+NORMALIZED_TYPES = {"dataset", "tool"}     # entity_normalizer.FIELD_TYPES covers these
+SNAPSHOT_VERSION = 1
+ENTITY_BITS = 24                            # edges pack (field << ENTITY_BITS | entity id) into 32 bits
+ENTITY_MASK = (1 << ENTITY_BITS) - 1
+MAX_ENTITIES = 1 << ENTITY_BITS
+
+
+def normalize_name(name):
+    """Default entity key: case- and whitespace-insensitive."""
+    return " ".join(name.lower().split())
+
+
+def mention_text(value):
+    """Entity mention as text (Cohort_Info items are sometimes objects)."""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        for key in ("name", "Name", "cohort", "Cohort"):
+            if isinstance(value.get(key), str):
+                return value[key].strip()
+    return json.dumps(value, sort_keys=True)
+
+
+class KnowledgeGraph:
+    """Typed paper–entity graph with adjacency indexes in both directions."""
+
+    def __init__(self, normalize=normalize_name, normalizer=None):
+        self.normalize = normalize
+        self.normalizer = normalizer  # optional entity_normalizer.EntityNormalizer for its types
+        self.entity_ids = {}        # (type, key) → entity id
+        self.entity_type = []       # entity id → type
+        self.entity_name = []       # entity id → display name (first mention seen)
+        self.entity_papers = []     # entity id → set of paper numbers
+        self.paper_index = {}       # paper id → paper number
+        self.paper_ids = []         # paper number → paper id
+        self.paper_edges = {}       # paper number → array of (field << ENTITY_BITS | entity id)
+        self.sources = {}           # paper id → mtime_ns of its JSON (for incremental loads)
+
+    # -- building ----------------------------------------------------
+    def _key(self, node_type, name):
+        """(entity key, display name): the canonical id when a normalizer covers node_type."""
+        if self.normalizer is not None and node_type in NORMALIZED_TYPES:
+            canonical = self.normalizer.canonical(node_type, name)
+            if canonical is not None:
+                return canonical, self.normalizer.name(canonical)
+        return self.normalize(name), name
+
+    def _intern(self, node_type, name):
+        key, name = self._key(node_type, name)
+        entity = self.entity_ids.get((node_type, key))
+        if entity is None:
+            if len(self.entity_type) >= MAX_ENTITIES:
+                # a larger id would spill into the field bits of its packed edges
+                raise OverflowError(f"Knowledge graph is limited to {MAX_ENTITIES} entities; "
+                                    f"save and reload it to drop orphaned ones")
+            entity = self.entity_ids[(node_type, key)] = len(self.entity_type)
+            self.entity_type.append(node_type)
+            self.entity_name.append(name)
+            self.entity_papers.append(set())
+        return entity
+
+    def add_paper(self, paper_id, extraction):
+        """Insert (or replace) one paper from its extraction dict."""
+        if paper_id in self.paper_index:
+            self._unlink(self.paper_index[paper_id])
+            number = self.paper_index[paper_id]
+        else:
+            number = self.paper_index[paper_id] = len(self.paper_ids)
+            self.paper_ids.append(paper_id)
+        edges = array("I")
+        for code, (field, node_type) in enumerate(FIELD_TYPES.items()):
+            values = extraction.get(field) or []
+            if not isinstance(values, list):
+                values = [values]
+            for value in values:
+                name = mention_text(value)
+                if not name:
+                    continue
+                entity = self._intern(node_type, name)
+                packed = code << ENTITY_BITS | entity
+                if packed not in edges:
+                    edges.append(packed)
+                    self.entity_papers[entity].add(number)
+        self.paper_edges[number] = edges
+
+    def _unlink(self, number):
+        for packed in self.paper_edges.pop(number, ()):
+            self.entity_papers[packed & ENTITY_MASK].discard(number)
+
+    def remove_paper(self, paper_id):
+        number = self.paper_index.pop(paper_id, None)
+        if number is not None:
+            self._unlink(number)
+            self.paper_ids[number] = None
+        self.sources.pop(paper_id, None)
+
+    def update_from_dir(self, input_dir):
+        """Add new or modified <paper_id>.json files and drop papers whose file is gone."""
+        added = 0
+        seen = set()
+        with os.scandir(input_dir) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".json"):
+                    continue
+                paper_id = entry.name[:-5]
+                seen.add(paper_id)
+                mtime = entry.stat().st_mtime_ns
+                if self.sources.get(paper_id) == mtime:
+                    continue
+                try:
+                    with open(entry.path, "r", encoding="utf-8") as f:
+                        extraction = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    continue
+                if isinstance(extraction, dict):
+                    self.add_paper(paper_id, extraction)
+                    self.sources[paper_id] = mtime
+                    added += 1
+        removed = [p for p in self.sources if p not in seen]
+        for paper_id in removed:
+            self.remove_paper(paper_id)
+        return {"added": added, "removed": len(removed), "papers": len(self.paper_index)}
+
+    # -- queries -----------------------------------------------------
+    def lookup(self, node_type, name, match="exact"):
+        """Entity ids of one type matching name exactly (normalized) or as a substring."""
+        if match == "exact":
+            entity = self.entity_ids.get((node_type, self._key(node_type, name)[0]))
+            return [] if entity is None else [entity]
+        needle = normalize_name(name)
+        return [e for e, (t, n) in enumerate(zip(self.entity_type, self.entity_name))
+                if t == node_type and needle in normalize_name(n)]
+
+    def _papers_matching(self, node_type, name, match):
+        entities = self.lookup(node_type, name, match)
+        if len(entities) == 1:
+            return self.entity_papers[entities[0]]
+        return set().union(*(self.entity_papers[e] for e in entities))
+
+    def papers_with(self, match="exact", **criteria):
+        """
+        Paper ids linked to every given entity, e.g.
+        papers_with(dataset="ADNI", data_type="DTI", tool="FreeSurfer").
+        A criterion value may be a list, meaning all of its names are required.
+        """
+        sets = []
+        for node_type, names in criteria.items():
+            if node_type not in NODE_TYPES:
+                raise ValueError(f"Unknown node type '{node_type}' (expected one of {NODE_TYPES})")
+            for name in [names] if isinstance(names, str) else names:
+                sets.append(self._papers_matching(node_type, name, match))
+        if not sets:
+            return set(self.paper_index)
+        sets.sort(key=len)
+        result = sets[0].intersection(*sets[1:])
+        return {self.paper_ids[number] for number in result}
+
+    def entities_of(self, paper_id, node_type=None):
+        """(type, name) of every entity linked to a paper."""
+        number = self.paper_index.get(paper_id)
+        out = []
+        for packed in self.paper_edges.get(number, ()):
+            e = packed & ENTITY_MASK
+            if node_type is None or self.entity_type[e] == node_type:
+                out.append((self.entity_type[e], self.entity_name[e]))
+        return out
+
+    def co_occurring(self, paper_ids, node_type, top=10):
+        """Most frequent entities of node_type across a set of papers."""
+        counts = Counter()
+        for paper_id in paper_ids:
+            edges = self.paper_edges.get(self.paper_index.get(paper_id), ())
+            counts.update({packed & ENTITY_MASK for packed in edges
+                           if self.entity_type[packed & ENTITY_MASK] == node_type})
+        return [(self.entity_name[e], n) for e, n in counts.most_common(top)]
+
+    def stats(self):
+        by_type = Counter(t for t, papers in zip(self.entity_type, self.entity_papers) if papers)
+        return {"papers": len(self.paper_index), "entities": sum(by_type.values()),
+                "edges": sum(len(edges) for edges in self.paper_edges.values()),
+                **{f"{t}_nodes": by_type.get(t, 0) for t in NODE_TYPES}}
+
+    # -- snapshot ----------------------------------------------------
+    def save(self, path):
+        """
+        Write the graph as flat integer arrays, gzip'd: packed paper → entity
+        edges and the entity → paper index, both in CSR layout (offsets + values),
+        renumbered densely so removed papers and orphaned entities leave no holes.
+        """
+        live = [e for e, papers in enumerate(self.entity_papers) if papers]
+        remap = {e: i for i, e in enumerate(live)}
+        numbers = [n for n in range(len(self.paper_ids)) if self.paper_ids[n] is not None]
+        dense = {n: i for i, n in enumerate(numbers)}
+
+        offsets, edges = array("I", [0]), array("I")
+        for n in numbers:
+            edges.extend(packed & ~ENTITY_MASK | remap[packed & ENTITY_MASK] for packed in self.paper_edges[n])
+            offsets.append(len(edges))
+        rev_offsets, rev = array("I", [0]), array("I")
+        for e in live:
+            rev.extend(sorted(dense[n] for n in self.entity_papers[e]))
+            rev_offsets.append(len(rev))
+
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "entity_type": array("B", [NODE_TYPES.index(self.entity_type[e]) for e in live]).tobytes(),
+            "entity_name": "\0".join(self.entity_name[e] for e in live),
+            "paper_ids": "\0".join(self.paper_ids[n] for n in numbers),
+            "offsets": offsets.tobytes(), "edges": edges.tobytes(),
+            "rev_offsets": rev_offsets.tobytes(), "rev": rev.tobytes(),
+            "sources": array("q", [self.sources.get(self.paper_ids[n], 0) for n in numbers]).tobytes(),
+        }
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wb", compresslevel=5) as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, normalize=normalize_name, normalizer=None):
+        with gzip.open(path, "rb") as f:
+            snapshot = pickle.load(f)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported knowledge-graph snapshot version in '{path}'")
+
+        kg = cls(normalize, normalizer)
+        types = array("B", snapshot["entity_type"])
+        kg.entity_type = [NODE_TYPES[t] for t in types]
+        kg.entity_name = snapshot["entity_name"].split("\0") if types else []
+        kg.entity_ids = {(t, kg._key(t, n)[0]): e for e, (t, n) in enumerate(zip(kg.entity_type, kg.entity_name))}
+        rev_offsets, rev = array("I", snapshot["rev_offsets"]), array("I", snapshot["rev"])
+        kg.entity_papers = [set(rev[rev_offsets[e]:rev_offsets[e + 1]]) for e in range(len(types))]
+
+        kg.paper_ids = snapshot["paper_ids"].split("\0") if snapshot["paper_ids"] else []
+        kg.paper_index = {paper_id: n for n, paper_id in enumerate(kg.paper_ids)}
+        offsets, edges = array("I", snapshot["offsets"]), array("I", snapshot["edges"])
+        kg.paper_edges = {n: edges[offsets[n]:offsets[n + 1]] for n in range(len(kg.paper_ids))}
+        kg.sources = {p: m for p, m in zip(kg.paper_ids, array("q", snapshot["sources"])) if m}
+        return kg
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Build or incrementally update a snapshot from extraction JSON")
+    b.add_argument("--input_dir", default="dataset_info", help="Directory of <paper_id>.json outputs")
+    b.add_argument("--snapshot",  default="adrd_kg.snap")
+    b.add_argument("--entities",  default=None, help="entity_normalizer state to merge aliases (updated in place)")
+    q = sub.add_parser("query", help="Papers linked to all given entities")
+    q.add_argument("--snapshot",  default="adrd_kg.snap")
+    q.add_argument("--entities",  default=None, help="entity_normalizer state used at build time")
+    for node_type in NODE_TYPES:
+        q.add_argument(f"--{node_type}", nargs="+", default=[])
+    q.add_argument("--contains", action="store_true", help="Substring instead of exact name match")
+    q.add_argument("--top", type=int, default=20)
+    args = p.parse_args()
+
+    normalizer = None
+    if args.entities:
+        from entity_normalizer import EntityNormalizer
+        normalizer = EntityNormalizer.load(args.entities) if os.path.exists(args.entities) else EntityNormalizer()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        if os.path.exists(args.snapshot):
+            kg = KnowledgeGraph.load(args.snapshot, normalizer=normalizer)
+        else:
+            kg = KnowledgeGraph(normalizer=normalizer)
+        result = kg.update_from_dir(args.input_dir)
+        kg.save(args.snapshot)
+        if normalizer is not None:
+            normalizer.save(args.entities)
+        print(f"✅ {result['added']} papers added/updated, {result['removed']} removed "
+              f"in {time.perf_counter() - started:.1f}s → {args.snapshot}")
+        print(kg.stats())
+    else:
+        started = time.perf_counter()
+        kg = KnowledgeGraph.load(args.snapshot, normalizer=normalizer)
+        loaded = time.perf_counter()
+        criteria = {t: getattr(args, t) for t in NODE_TYPES if getattr(args, t)}
+        papers = kg.papers_with(match="contains" if args.contains else "exact", **criteria)
+        elapsed_ms = (time.perf_counter() - loaded) * 1000
+        print(f"Loaded {kg.stats()['papers']} papers in {loaded - started:.2f}s; "
+              f"{len(papers)} matches in {elapsed_ms:.1f} ms")
+        for paper_id in sorted(papers)[:args.top]:
+            print(f"  {paper_id}")
+        for node_type in ("tool", "brain_region"):
+            if papers and node_type not in criteria:
+                print(f"Top {node_type}s: {kg.co_occurring(papers, node_type, 5)}")
@@ -0,0 +1,149 @@
+"""
+manifest.py  ▸  Resumable ingestion manifest for corpus extraction runs.
+
+One SQLite row per paper, keyed by PMC ID, recording the source XML's size,
+mtime and SHA-256 content hash, the furthest stage it reached
+(cleaned → extracted → validated, or failed) and its output path.
+
+On a rerun only new, changed or unfinished papers are scheduled. Unchanged
+files are recognised from (size, mtime) alone, so startup is one table scan
+plus one stat() per file; a file is only re-hashed when its stat changed, and
+a touched-but-identical file keeps its finished status.
+"""
+
+import os, re, time, sqlite3, hashlib
+
+STAGES = ("cleaned", "extracted", "validated")
+DONE = "validated"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    pmc_id       TEXT PRIMARY KEY,
+    source_path  TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    status       TEXT NOT NULL,
+    output_path  TEXT,
+    error        TEXT,
+    updated_at   REAL NOT NULL
+);
+"""
+_PMC_ID = re.compile(r"PMC\d+")
+
+
+def pmc_id_for(path):
+    """PMC ID from the file name (e.g. Paper_sample_PMC8640037.xml → PMC8640037), else the stem."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    m = _PMC_ID.search(stem)
+    return m.group(0) if m else stem
+
+
+def file_hash(path, block_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            h.update(block)
+    return h.hexdigest()
+
+
+class Manifest:
+    """SQLite-backed record of which papers reached which stage."""
+
+    def __init__(self, path="manifest.sqlite", commit_every=100):
+        self.path = path
+        self.commit_every = commit_every
+        self._pending_writes = 0
+        self._sources = {}          # pmc_id → (path, size, mtime_ns, hash) of the current run
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def entries(self):
+        """{pmc_id: (size, mtime_ns, content_hash, status)} for every recorded paper."""
+        rows = self.conn.execute("SELECT pmc_id, size, mtime_ns, content_hash, status FROM papers")
+        return {pmc_id: (size, mtime_ns, content_hash, status) for pmc_id, size, mtime_ns, content_hash, status in rows}
+
+    def pending(self, xml_paths):
+        """
+        Return the subset of xml_paths that still needs work: not in the manifest,
+        changed content, or not yet validated. Unchanged finished papers whose
+        mtime merely moved get their stat refreshed and are skipped.
+        """
+        known = self.entries()
+        todo, refreshed = [], []
+        for path in xml_paths:
+            pmc_id = pmc_id_for(path)
+            st = os.stat(path)
+            entry = known.get(pmc_id)
+            if entry is not None and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+                content_hash = entry[2]                          # fast path: stat unchanged
+            else:
+                content_hash = file_hash(path)
+                if entry is not None and entry[2] == content_hash:
+                    refreshed.append((path, st.st_size, st.st_mtime_ns, time.time(), pmc_id))
+            self._sources[pmc_id] = (path, st.st_size, st.st_mtime_ns, content_hash)
+            if entry is None or entry[2] != content_hash or entry[3] != DONE:
+                todo.append(path)
+        if refreshed:
+            self.conn.executemany(
+                "UPDATE papers SET source_path = ?, size = ?, mtime_ns = ?, updated_at = ? WHERE pmc_id = ?",
+                refreshed,
+            )
+            self.conn.commit()
+        return todo
+
+    def mark(self, xml_path, status, output_path=None, error=None):
+        """Record that xml_path reached `status` (one of STAGES, or FAILED)."""
+        if status not in STAGES and status != FAILED:
+            raise ValueError(f"Unknown manifest status '{status}'")
+        pmc_id = pmc_id_for(xml_path)
+        source = self._sources.get(pmc_id)
+        if source is None:
+            st = os.stat(xml_path)
+            source = self._sources[pmc_id] = (xml_path, st.st_size, st.st_mtime_ns, file_hash(xml_path))
+        path, size, mtime_ns, content_hash = source
+        self.conn.execute(
+            """INSERT INTO papers (pmc_id, source_path, size, mtime_ns, content_hash, status, output_path, error, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(pmc_id) DO UPDATE SET
+                   source_path = excluded.source_path, size = excluded.size, mtime_ns = excluded.mtime_ns,
+                   content_hash = excluded.content_hash, status = excluded.status,
+                   output_path = COALESCE(excluded.output_path, papers.output_path),
+                   error = excluded.error, updated_at = excluded.updated_at""",
+            (pmc_id, path, size, mtime_ns, content_hash, status, output_path, error, time.time()),
+        )
+        self._pending_writes += 1
+        if self._pending_writes >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.conn.commit()
+        self._pending_writes = 0
+
+    def stats(self):
+        """{status: count} over the whole manifest."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM papers GROUP BY status").fetchall())
+
+    def close(self):
+        self.commit()
+        self.conn.close()
+
+
+# Test block
+if __name__ == "__main__":
+    import argparse
+
+    p = argparse.ArgumentParser()
+    p.add_argument("--manifest", default="manifest.sqlite")
+    args = p.parse_args()
+
+    m = Manifest(args.manifest)
+    for status, count in sorted(m.stats().items()):
+        print(f"{status:<10} {count}")
+    m.close()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+"""
+mock_openai_server.py  ▸  Local stand-in for the OpenAI chat-completions API.
+
+Returns a canned nine-key dataset extraction after a configurable delay, with
+`usage` token counts estimated from the prompt, so the Agent layer and the
+corpus pipeline can be exercised without network access or spend.
+
+The Files and Batches endpoints are emulated too (upload, create, retrieve,
+download): a submitted batch moves to "completed" after --batch_delay seconds
+with one canned completion per input line, so batch_api.py runs end to end.
+
+Packed prompts (prompt_packing.py, one "### PAPER <id>" line per abstract) get
+one canned extraction per paper ID; --p_pack_drop leaves IDs out at random to
+exercise the single-paper fallback.
+
+Latency is --latency, optionally heavy-tailed: multiplied by a lognormal factor
+(--latency_sigma) and, for a --tail_p share of requests, by --tail_factor
+(stragglers), to benchmark hedged requests (see hedging.py).
+
+Longer prompts take longer: --latency_per_1k_prompt adds that many seconds per
+1000 prompt tokens (prefill). `usage` counts come from token_counter
+(tiktoken's o200k_base when available), so Agent cost reports match what a real
+model would bill for the same prompts.
+
+Rate-limit errors can be injected either by enforcing a server-side quota
+(--rpm, sliding 60 s window) or at random (--p_429); both answer HTTP 429 with
+a Retry-After header, like the real API. Other failures are injected at random
+too: --p_500 (HTTP 500/503), --p_drop (connection closed without an answer)
+and --p_truncate (answer cut off mid-JSON with finish_reason "length", which
+exercises output repair and the missing-key re-ask).
+
+GET /v1/mock/stats returns the server's counters (requests, injected errors,
+tokens), so a benchmark can measure retry amplification (agent_benchmark.py).
+
+Usage
+-----
+$ python mock_openai_server.py --port 8000 --latency 1.5
+$ python mock_openai_server.py --port 8000 --rpm 600 --p_429 0.02
+$ python mock_openai_server.py --port 8000 --latency 0.2 --latency_sigma 0.5 --tail_p 0.02 --tail_factor 20
+$ python mock_openai_server.py --port 8000 --p_500 0.02 --p_drop 0.01 --p_truncate 0.05
+# then point Agent(base_url="http://127.0.0.1:8000/v1", api_key="mock") at it
+"""
+
+import re, json, time, random, argparse, threading
+from collections import Counter, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_EXTRACTION = {
+    "Dataset_Names": ["ADNI"],
+    "Dataset_Sources": ["adni.loni.usc.edu"],
+    "Data_Types": ["T1-weighted MRI", "DTI"],
+    "Brain_Regions": ["hippocampus"],
+    "Cohort_Info": ["CN, MCI and AD participants"],
+    "Preprocessing_Tools": ["FreeSurfer"],
+    "Analysis_Tools": ["FSL"],
+    "Key_Findings": ["Mock finding."],
+    "Top_Cited_Papers": [],
+}
+
+
+_PACKED_ID = re.compile(r"^### PAPER (\S+)", re.MULTILINE)
+
+
+def estimate_tokens(text):
+    """Token count of text (tiktoken when available, else ≈ 4 characters per token)."""
+    from token_counter import count_tokens
+    return max(1, count_tokens(text))
+
+
+class MockState:
+    """Server-wide configuration and counters shared by all handler threads."""
+
+    def __init__(self, latency=1.0, rpm=None, p_429=0.0, retry_after=1.0, batch_delay=2.0, p_pack_drop=0.0,
+                 latency_sigma=0.0, tail_p=0.0, tail_factor=10.0, latency_per_1k_prompt=0.0,
+                 p_500=0.0, p_drop=0.0, p_truncate=0.0):
+        self.latency = latency
+        self.latency_per_1k_prompt = latency_per_1k_prompt
+        self.p_500 = p_500
+        self.p_drop = p_drop
+        self.p_truncate = p_truncate
+        self.latency_sigma = latency_sigma
+        self.tail_p = tail_p
+        self.tail_factor = tail_factor
+        self.p_pack_drop = p_pack_drop
+        self.batch_delay = batch_delay
+        self.files = {}     # file id → (metadata, bytes)
+        self.batches = {}   # batch id → batch object
+        self.rpm = rpm
+        self.p_429 = p_429
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.recent = deque()   # accepted-request timestamps within the last minute
+        self.counters = Counter()   # chat requests, injected errors, tokens served
+
+    def count(self):
+        with self.lock:
+            self.requests += 1
+            return self.requests
+
+    def tally(self, **counts):
+        with self.lock:
+            self.counters.update(counts)
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "throttled": self.throttled}
+
+    def fault(self):
+        """Failure to inject for this request ("500", "drop", "truncate"), or None."""
+        roll = random.random()
+        for name, p in (("500", self.p_500), ("drop", self.p_drop), ("truncate", self.p_truncate)):
+            if roll < p:
+                return name
+            roll -= p
+        return None
+
+    def sample_latency(self, prompt_tokens=0):
+        latency = self.latency
+        if self.latency_sigma:
+            latency *= random.lognormvariate(0.0, self.latency_sigma)
+        if self.tail_p and random.random() < self.tail_p:
+            latency *= self.tail_factor
+        return latency + prompt_tokens / 1000 * self.latency_per_1k_prompt
+
+    def admit(self):
+        """False if this request should be answered with a 429."""
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if random.random() < self.p_429 or (self.rpm is not None and len(self.recent) >= self.rpm):
+                self.throttled += 1
+                return False
+            self.recent.append(now)
+            return True
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    state = MockState()
+
+    def log_message(self, format, *args):   # silence per-request stderr logging
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):   # client gave up (e.g. a cancelled hedge)
+            self.close_connection = True
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if path.endswith("/chat/completions"):
+            self._chat_completion()
+        elif path.endswith("/files"):
+            self._upload_file()
+        elif path.endswith("/batches"):
+            self._create_batch()
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_GET(self):
+        parts = self.path.rstrip("/").split("/")
+        if len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+            entry = self.state.files.get(parts[-2])
+            if entry is None:
+                self._send_json(404, {"error": {"message": f"No such file {parts[-2]}"}})
+                return
+            body = entry[1]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif len(parts) >= 2 and parts[-2] == "batches" and parts[-1] in self.state.batches:
+            self._send_json(200, self.state.batches[parts[-1]])
+        elif parts[-2:] == ["mock", "stats"]:
+            self._send_json(200, self.state.stats())
+        else:
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    # -- chat completions ------------------------------------------
+    def _chat_completion(self):
+        request = self._read_json()
+        n = self.state.count()
+        self.state.tally(chat_requests=1)
+        if not self.state.admit():
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached for requests (mock).",
+                "type": "requests",
+                "code": "rate_limit_exceeded",
+            }}, headers={"Retry-After": str(self.state.retry_after)})
+            return
+        body = completion_body(request, f"chatcmpl-mock-{n}", self.state.p_pack_drop)
+        fault = self.state.fault()
+        time.sleep(self.state.sample_latency(body["usage"]["prompt_tokens"]))
+        if fault == "500":
+            self.state.tally(errors_500=1)
+            status = random.choice((500, 503))
+            self._send_json(status, {"error": {"message": "The server had an error (mock).", "type": "server_error"}})
+            return
+        if fault == "drop":
+            self.state.tally(dropped=1)
+            self.close_connection = True    # no response at all; the client sees a closed connection
+            return
+        if fault == "truncate":
+            self.state.tally(truncated=1)
+            truncate_body(body)
+        self.state.tally(ok=1, prompt_tokens=body["usage"]["prompt_tokens"],
+                         completion_tokens=body["usage"]["completion_tokens"])
+        self._send_json(200, body)
+
+    # -- files / batches -------------------------------------------
+    def _upload_file(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length)
+        message = BytesParser(policy=HTTP).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + raw
+        )
+        fields = {part.get_param("name", header="content-disposition"): part for part in message.iter_parts()}
+        file_part = fields["file"]
+        content = file_part.get_payload(decode=True)
+        file_id = f"file-mock-{self.state.count()}"
+        meta = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": file_part.get_filename() or "upload.jsonl",
+            "purpose": fields["purpose"].get_content().strip() if "purpose" in fields else "batch",
+            "status": "processed",
+        }
+        self.state.files[file_id] = (meta, content)
+        self._send_json(200, meta)
+
+    def _create_batch(self):
+        request = self._read_json()
+        input_file_id = request["input_file_id"]
+        if input_file_id not in self.state.files:
+            self._send_json(404, {"error": {"message": f"No such file {input_file_id}"}})
+            return
+        lines = [json.loads(l) for l in self.state.files[input_file_id][1].decode("utf-8").splitlines() if l.strip()]
+        batch_id = f"batch-mock-{self.state.count()}"
+        batch = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": request.get("endpoint", "/v1/chat/completions"),
+            "input_file_id": input_file_id,
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+        }
+        self.state.batches[batch_id] = batch
+        timer = threading.Timer(self.state.batch_delay, self._finish_batch, args=(batch, lines))
+        timer.daemon = True
+        timer.start()
+        self._send_json(200, batch)
+
+    def _finish_batch(self, batch, lines):
+        out = []
+        for i, line in enumerate(lines):
+            out.append(json.dumps({
+                "id": f"batch_req_{i}",
+                "custom_id": line["custom_id"],
+                "response": {
+                    "status_code": 200,
+                    "request_id": f"req_{i}",
+                    "body": completion_body(line["body"], f"chatcmpl-batch-{batch['id']}-{i}"),
+                },
+                "error": None,
+            }))
+        content = ("\n".join(out) + "\n").encode("utf-8")
+        output_file_id = f"file-mock-{self.state.count()}"
+        self.state.files[output_file_id] = ({"id": output_file_id, "object": "file", "bytes": len(content),
+                                             "created_at": int(time.time()), "filename": "output.jsonl",
+                                             "purpose": "batch_output", "status": "processed"}, content)
+        batch.update({
+            "status": "completed",
+            "output_file_id": output_file_id,
+            "completed_at": int(time.time()),
+            "request_counts": {"total": len(lines), "completed": len(lines), "failed": 0},
+        })
+
+
+def completion_body(request, completion_id, p_pack_drop=0.0):
+    """Canned chat.completion object for a chat-completions request body."""
+    prompt = "".join(m.get("content") or "" for m in request.get("messages", []))
+    paper_ids = _PACKED_ID.findall(prompt)
+    if paper_ids:
+        content = json.dumps({pid: MOCK_EXTRACTION for pid in paper_ids if random.random() >= p_pack_drop})
+    else:
+        content = json.dumps(MOCK_EXTRACTION)
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+def truncate_body(body):
+    """Cut a completion off partway through its content, like a max_tokens stop."""
+    choice = body["choices"][0]
+    content = choice["message"]["content"]
+    choice["message"]["content"] = content[:random.randint(1, max(1, len(content) - 1))]
+    choice["finish_reason"] = "length"
+    completion_tokens = estimate_tokens(choice["message"]["content"])
+    body["usage"].update(completion_tokens=completion_tokens,
+                         total_tokens=body["usage"]["prompt_tokens"] + completion_tokens)
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024   # default backlog of 5 resets bursts of concurrent clients
+
+
+def serve(host="127.0.0.1", port=8000, **state):
+    """Start the mock server in a background thread and return it (call .shutdown() to stop)."""
+    MockHandler.state = MockState(**state)
+    server = MockServer((host, port), MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# -------------------------------------------------------------------
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--host",    default="127.0.0.1")
+    p.add_argument("--port",    type=int, default=8000)
+    p.add_argument("--latency", type=float, default=1.0, help="Seconds per completion")
+    p.add_argument("--rpm",     type=int, default=None, help="Server-side requests/minute quota (429 beyond it)")
+    p.add_argument("--p_429",   type=float, default=0.0, help="Probability of a random 429")
+    p.add_argument("--retry_after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    p.add_argument("--batch_delay", type=float, default=2.0, help="Seconds before a submitted batch completes")
+    p.add_argument("--latency_sigma", type=float, default=0.0, help="Lognormal spread of the latency (0 = fixed)")
+    p.add_argument("--tail_p",  type=float, default=0.0, help="Share of straggler requests")
+    p.add_argument("--tail_factor", type=float, default=10.0, help="Latency multiplier for stragglers")
+    p.add_argument("--p_pack_drop", type=float, default=0.0, help="Probability of leaving a paper out of a packed answer")
+    p.add_argument("--latency_per_1k_prompt", type=float, default=0.0, help="Extra seconds per 1000 prompt tokens")
+    p.add_argument("--p_500",   type=float, default=0.0, help="Probability of an HTTP 500/503")
+    p.add_argument("--p_drop",  type=float, default=0.0, help="Probability of closing the connection without answering")
+    p.add_argument("--p_truncate", type=float, default=0.0, help="Probability of a cut-off answer (finish_reason=length)")
+    args = p.parse_args()
+
+    MockHandler.state = MockState(latency=args.latency, rpm=args.rpm, p_429=args.p_429,
+                                  retry_after=args.retry_after, batch_delay=args.batch_delay,
+                                  p_pack_drop=args.p_pack_drop, latency_sigma=args.latency_sigma,
+                                  tail_p=args.tail_p, tail_factor=args.tail_factor,
+                                  latency_per_1k_prompt=args.latency_per_1k_prompt, p_500=args.p_500,
+                                  p_drop=args.p_drop, p_truncate=args.p_truncate)
+    server = MockServer((args.host, args.port), MockHandler)
+    print(f"✅ Mock OpenAI endpoint on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+model_router.py  ▸  Cascading model routing: extract with the cheapest model
+first and escalate a paper to the next (more expensive) model only when its
+answer fails the checks.
+
+A tier's answer is accepted when:
+  • every schema key arrived (after local repair and the missing-key re-ask);
+  • the required fields (Dataset_Names, Data_Types by default) are non-empty;
+  • at least min_filled_fields of the nine fields are non-empty;
+  • enough of the extracted names (datasets, tools) occur in the paper text
+    itself (min_grounding), which catches invented datasets;
+  • no list entry is longer than max_value_chars (copied paragraphs).
+The last tier's answer is always kept. Each tier has its own Agent, so usage,
+cost and latency are reported per model.
+
+Policy config (JSON; any key may be omitted, see DEFAULT_POLICY):
+    {"models": ["gpt-4o-mini", "gpt-4.1"],
+     "required_fields": ["Dataset_Names", "Data_Types"],
+     "min_filled_fields": 4, "min_grounding": 0.5}
+
+Driven from the extraction entry point:
+$ python extract_info_from_paper.py --xml_dir /path/to/pmc_xml --route --routing_config routing.json
+"""
+
+import json, time
+from collections import Counter
+
+from loguru import logger
+
+from agents import Agent
+from entity_normalizer import name_key
+from extract_info_from_paper import (
+    DATASET_FIELDS, MAX_PROMPT_CHARS, extract_validated, extract_dataset_info_chunked,
+)
+
+DEFAULT_POLICY = {
+    "models": ["gpt-4o-mini", "gpt-4.1"],        # cheapest first; the last answer is always kept
+    "required_fields": ["Dataset_Names", "Data_Types"],
+    "min_filled_fields": 4,
+    "grounded_fields": ["Dataset_Names", "Preprocessing_Tools", "Analysis_Tools"],
+    "min_grounding": 0.5,                        # share of grounded_fields values found in the text
+    "max_value_chars": 500,
+}
+
+
+def load_routing_policy(config_path=None):
+    """DEFAULT_POLICY overridden by the keys of a JSON config file (if given)."""
+    if config_path is None:
+        return dict(DEFAULT_POLICY)
+    try:
+        with open(config_path, "r") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Routing config '{config_path}' not found.")
+    except json.JSONDecodeError:
+        raise ValueError(f"Error decoding JSON from '{config_path}'. Ensure it is correctly formatted.")
+    unknown = set(config) - set(DEFAULT_POLICY)
+    if unknown:
+        raise ValueError(f"Unknown routing policy keys: {', '.join(sorted(unknown))}")
+    policy = {**DEFAULT_POLICY, **config}
+    if not policy["models"]:
+        raise ValueError("Routing policy needs at least one model")
+    return policy
+
+
+def assess(data, missing, text_key, policy):
+    """
+    Reasons to reject one extraction (empty list = accept).
+
+    Args:
+        data (dict): Validated fields.
+        missing (list[str]): Schema keys that never arrived.
+        text_key (str): name_key() of the text the model saw, for grounding.
+        policy (dict): Routing policy.
+    """
+    reasons = []
+    if missing:
+        reasons.append("missing_keys")
+    for field in policy["required_fields"]:
+        if not data.get(field):
+            reasons.append(f"empty:{field}")
+    if sum(1 for field in DATASET_FIELDS if data.get(field)) < policy["min_filled_fields"]:
+        reasons.append("too_few_fields")
+
+    names = [value for field in policy["grounded_fields"] for value in data.get(field) or []
+             if isinstance(value, str) and name_key(value)]
+    if names:
+        padded = f" {text_key} "          # whole words only: "R" is not grounded by "brain"
+        grounded = sum(1 for value in names if f" {name_key(value)} " in padded)
+        if grounded / len(names) < policy["min_grounding"]:
+            reasons.append("ungrounded")
+
+    if any(len(value) > policy["max_value_chars"]
+           for values in data.values() if isinstance(values, list)
+           for value in values if isinstance(value, str)):
+        reasons.append("long_values")
+    return reasons
+
+
+class ModelRouter:
+    """Try each tier's Agent in order; keep the first answer that passes assess()."""
+
+    def __init__(self, agents, policy=None):
+        self.agents = list(agents)
+        self.policy = policy or dict(DEFAULT_POLICY)
+        self.stats = {agent.model: {"attempts": 0, "accepted": 0, "escalated": 0, "errors": 0, "latencies": []}
+                      for agent in self.agents}
+        self.reasons = Counter()     # rejection reason → count, across all tiers
+
+    @classmethod
+    def from_policy(cls, policy, rate_limits=None, hedge=None, **agent_kwargs):
+        """
+        One Agent per policy model (sharing cache, telemetry and client pool via agent_kwargs).
+        hedge: HedgePolicy keyword arguments; each model gets its own policy.
+        """
+        agents = []
+        for model in policy["models"]:
+            if hedge is not None:
+                from hedging import HedgePolicy
+                agent_kwargs["hedge"] = HedgePolicy(**hedge)
+            rate_limiter = None
+            if rate_limits:
+                from rate_limiter import get_rate_limiter
+                rate_limiter = get_rate_limiter(model, rate_limits)
+            agents.append(Agent(model=model, rate_limiter=rate_limiter, **agent_kwargs))
+        return cls(agents, policy)
+
+    async def _attempt(self, agent, full_text, paper_id, chunk_chars):
+        if chunk_chars:
+            result = await extract_dataset_info_chunked(full_text, agent, chunk_chars, paper_id)
+            return json.loads(result), [], full_text
+        text = full_text[:MAX_PROMPT_CHARS]
+        data, missing = await extract_validated(text, agent, paper_id)
+        return data, missing, text
+
+    async def extract(self, full_text, paper_id=None, chunk_chars=None):
+        """Routed extraction of one cleaned paper; returns validated JSON like extract_dataset_info_from_text."""
+        full_text = full_text.strip()
+        if not full_text:
+            return None
+
+        text_key, last = None, None
+        for tier, agent in enumerate(self.agents):
+            stats = self.stats[agent.model]
+            stats["attempts"] += 1
+            started = time.perf_counter()
+            try:
+                data, missing, text = await self._attempt(agent, full_text, paper_id, chunk_chars)
+            except Exception as e:
+                stats["latencies"].append(time.perf_counter() - started)
+                stats["errors"] += 1
+                if tier == len(self.agents) - 1:
+                    if last is not None:
+                        return json.dumps(last)
+                    raise
+                logger.warning(f"{paper_id}: {agent.model} failed ({e}), escalating")
+                stats["escalated"] += 1
+                continue
+            stats["latencies"].append(time.perf_counter() - started)
+
+            if text_key is None:     # same text for every tier
+                text_key = name_key(text)
+            reasons = assess(data, missing, text_key, self.policy)
+            if not reasons or tier == len(self.agents) - 1:
+                stats["accepted"] += 1
+                return json.dumps(data)
+            self.reasons.update(reasons)
+            stats["escalated"] += 1
+            last = data
+            logger.info(f"{paper_id}: {agent.model} answer rejected ({', '.join(reasons)}), escalating")
+
+    def print_usage(self):
+        """Per-model papers, escalations, tokens, cost and latency, then each Agent's own report."""
+        print(f"{'Model':<14} {'Attempts':<9} {'Accepted':<9} {'Escalated':<10} {'Errors':<7} "
+              f"{'Input (M)':<10} {'Output (M)':<11} {'Cost ($)':<10} {'Mean s':<8} {'p95 s':<8}")
+        print("-" * 100)
+        total_cost = 0.0
+        for agent in self.agents:
+            stats = self.stats[agent.model]
+            input_tokens = sum(v["input"] for v in agent.usage.values())
+            output_tokens = sum(v["output"] for v in agent.usage.values())
+            cost = sum(sum(agent.token_cost(tokens)) for tokens in agent.usage.values())
+            total_cost += cost
+            latencies = sorted(stats["latencies"])
+            mean = sum(latencies) / len(latencies) if latencies else 0.0
+            p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] if latencies else 0.0
+            print(f"{agent.model:<14} {stats['attempts']:<9} {stats['accepted']:<9} {stats['escalated']:<10} "
+                  f"{stats['errors']:<7} {input_tokens / 1e6:<10.3f} {output_tokens / 1e6:<11.3f} "
+                  f"{cost:<10.4f} {mean:<8.2f} {p95:<8.2f}")
+        print("-" * 100)
+        print(f"{'Total':<14} {'':<9} {'':<9} {'':<10} {'':<7} {'':<10} {'':<11} {total_cost:<10.4f}")
+        if self.reasons:
+            print("Escalation reasons: " + ", ".join(f"{r} ×{n}" for r, n in self.reasons.most_common()))
+        for agent in self.agents:
+            print(f"\n[{agent.model}]")
+            agent.print_usage()
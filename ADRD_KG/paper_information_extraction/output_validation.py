@@ -0,0 +1,130 @@
+"""
+output_validation.py  ▸  Local repair and schema checks for LLM JSON output.
+
+repair_json turns what the model actually sent back (code fences, chatter
+around the object, a response cut off mid-string by max_tokens, trailing
+commas) into a dict without another request: it closes open strings and
+brackets, and if that is not enough it backs off to the last complete element.
+
+validate_fields checks the dataset schema (a fixed set of keys whose values
+are lists), coerces near-misses (a bare string → one-item list) and reports
+which keys are still missing so the caller can re-ask for just those.
+"""
+
+import re, json
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([\]}])")
+
+
+def _scan(text):
+    """
+    Walk a JSON prefix. Returns (stack, string_start, last_key, cuts) where stack
+    holds the closers still owed at the end, string_start is where an
+    unterminated string begins (None if the text does not end inside one),
+    last_key is where the last top-level member begins and cuts lists
+    (position, closers) pairs at which text[:position] + closers is a complete
+    document.
+    """
+    stack, cuts = [], []
+    in_string = escape = False
+    string_start = None
+    last_key = 0
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string, string_start = True, i
+        elif ch in "[{":
+            if not stack:
+                last_key = i + 1
+            stack.append("]" if ch == "[" else "}")
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch in "]}":
+            if stack:
+                stack.pop()
+            cuts.append((i + 1, "".join(reversed(stack))))
+        elif ch == "," and stack:
+            if len(stack) == 1:
+                last_key = i + 1
+            cuts.append((i, "".join(reversed(stack))))
+    return stack, string_start if in_string else None, last_key, cuts
+
+
+def _loads(candidate):
+    try:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", candidate))
+    except json.JSONDecodeError:
+        return None
+
+
+def repair_json(text):
+    """
+    Parse model output as a JSON object, repairing it locally when needed.
+
+    Args:
+        text (str): Raw completion.
+
+    Returns:
+        tuple[dict | None, bool]: The parsed object (None if unrecoverable) and
+        whether any repair was necessary.
+    """
+    if not text:
+        return None, False
+    try:
+        obj = json.loads(text)
+        return (obj, False) if isinstance(obj, dict) else (None, False)
+    except json.JSONDecodeError:
+        pass
+
+    text = _FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start < 0:
+        return None, True
+    text = text[start:]
+    end = text.rfind("}")
+    obj = _loads(text[:end + 1]) if end >= 0 else None     # chatter after a complete object
+    if isinstance(obj, dict):
+        return obj, True
+
+    # Truncated: close what is open, else back off to the last complete element. A
+    # partially written string is dropped rather than kept, and when the cut fell
+    # inside a value the last key is dropped too, so it is re-asked instead of
+    # silently coming back short.
+    stack, string_start, last_key, cuts = _scan(text)
+    in_value = len(stack) > 1 or (string_start is not None and text[:string_start].rstrip().endswith(":"))
+    candidates = [] if string_start is not None else [(len(text), text.rstrip().rstrip(",") + "".join(reversed(stack)))]
+    candidates.extend((pos, text[:pos] + closers) for pos, closers in reversed(cuts))
+    for pos, candidate in candidates:
+        obj = _loads(candidate)
+        if isinstance(obj, dict):
+            if in_value and pos > last_key and obj:
+                obj.popitem()        # the member being written when the output stopped
+            return obj, True
+    return None, True
+
+
+def validate_fields(obj, fields):
+    """
+    Check obj against a schema of list-valued keys.
+
+    Returns:
+        tuple[dict, list[str]]: The cleaned object (only schema keys, values as
+        lists without empty strings) and the keys that are absent.
+    """
+    cleaned, missing = {}, []
+    for field in fields:
+        if field not in obj or obj[field] is None:
+            missing.append(field)
+            continue
+        value = obj[field]
+        if not isinstance(value, list):
+            value = [value]
+        cleaned[field] = [v for v in value if not (isinstance(v, str) and not v.strip())]
+    return cleaned, missing
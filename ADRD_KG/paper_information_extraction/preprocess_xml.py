@@ -1,25 +1,147 @@
 from bs4 import BeautifulSoup
+from lxml import etree
 import os
 
+# Sections to skip (usually not useful for dataset extraction)
+SKIP_TITLES = {"references", "acknowledgements", "funding", "conflict of interest"}
+
+# Elements whose descendants must stay in memory until the element itself closes
+_CAPTURE_TAGS = {"p", "title"}
+
+
+def _localname(tag):
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _text(elem):
+    return " ".join(t.strip() for t in elem.itertext() if t.strip())
+
+
 def clean_pmc_xml(xml_path):
     """
     Extracts and cleans relevant text from a PMC full-text XML file.
-    
+
+    Streams the document with lxml.etree.iterparse and emits every paragraph
+    exactly once, under the path of its enclosing <sec> titles, outermost first
+    ("=== METHODS > RNA EXTRACTION > ROSMAP ==="; body-level paragraphs outside
+    any section go under BODY). Finished elements are removed from the tree as
+    parsing proceeds, so memory stays flat on very large articles.
+
     Args:
-        xml_path (str): Path to the XML file.
-    
+        xml_path (str | file-like): Path to the XML file, or an open binary stream.
+
     Returns:
         str: Cleaned, structured text suitable for LLM input.
     """
+    if isinstance(xml_path, (str, os.PathLike)) and not os.path.exists(xml_path):
+        raise FileNotFoundError(f"File not found: {xml_path}")
+
+    abstract_parts = []
+    blocks = []                 # [section path, [paragraphs]] in document order
+    sections = []               # stack of {"elem", "title", "skip"} for open <sec>s
+    stack = []                  # open elements, for parent lookups
+    state = {"abstracts": 0, "in_abstract": 0, "in_body": 0, "capture": 0}
+    body_section = {"elem": None, "title": "BODY", "skip": False}   # <p> directly under <body>
+    last_section = None
+
+    context = etree.iterparse(xml_path, events=("start", "end"), recover=True, huge_tree=True)
+    for event, elem in context:
+        tag = _localname(elem.tag)
+
+        if event == "start":
+            stack.append(elem)
+            if tag in _CAPTURE_TAGS:
+                state["capture"] += 1
+            if tag == "abstract":
+                state["abstracts"] += 1
+                state["in_abstract"] += 1
+            elif tag == "body":
+                state["in_body"] += 1
+            elif tag == "sec" and not state["in_abstract"]:
+                parent_skip = sections[-1]["skip"] if sections else False
+                sections.append({"elem": elem, "title": "SECTION", "skip": parent_skip})
+            continue
+
+        # -- end event: the element is complete ---------------------
+        stack.pop()
+        parent = stack[-1] if stack else None
+
+        if tag == "title" and sections and parent is sections[-1]["elem"]:
+            title = _text(elem) or "SECTION"
+            sections[-1]["title"] = title
+            sections[-1]["skip"] = sections[-1]["skip"] or title.lower() in SKIP_TITLES
+
+        elif tag == "p" and state["capture"] == 1:     # outermost <p> only
+            text = _text(elem)
+            if state["in_abstract"]:
+                if text and state["abstracts"] == 1:  # first abstract only, like before
+                    abstract_parts.append(text)
+            elif text and (sections or state["in_body"]):
+                section = sections[-1] if sections else body_section
+                if not section["skip"]:
+                    if section is not last_section:
+                        path = " > ".join(s["title"] for s in sections) if sections else section["title"]
+                        blocks.append([path, []])
+                        last_section = section
+                    blocks[-1][1].append(text)
+
+        if tag in _CAPTURE_TAGS:
+            state["capture"] -= 1
+        if tag == "abstract":
+            state["in_abstract"] -= 1
+        elif tag == "body":
+            state["in_body"] -= 1
+        elif tag == "sec" and sections and sections[-1]["elem"] is elem:
+            sections.pop()
+
+        # Drop the finished subtree unless an enclosing <p>/<title> still needs its text
+        if not state["capture"] and parent is not None:
+            parent.remove(elem)
+    del context
+
+    text_parts = []
+    if abstract_parts:
+        text_parts.append("=== ABSTRACT ===\n" + " ".join(abstract_parts))
+    for title, paragraphs in blocks:
+        text_parts.append(f"\n=== {title.upper()} ===\n" + "\n".join(paragraphs))
+    return "\n".join(text_parts)
+
+
+def split_cleaned_sections(text):
+    """
+    Split clean_pmc_xml output back into its blocks.
+
+    Returns:
+        list[tuple[str, str]]: (title, body) pairs in document order; text before
+        the first === TITLE === header (if any) gets the title "".
+    """
+    sections = []
+    title, body = "", []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("=== ") and stripped.endswith(" ===") and len(stripped) > 8:
+            if title or any(b.strip() for b in body):
+                sections.append((title, "\n".join(body).strip()))
+            title, body = stripped[4:-4].strip(), []
+        else:
+            body.append(line)
+    if title or any(b.strip() for b in body):
+        sections.append((title, "\n".join(body).strip()))
+    return sections
+
+
+def clean_pmc_xml_soup(xml_path):
+    """
+    Previous BeautifulSoup implementation, kept for benchmarking (see
+    benchmark_cleaner.py). Nested subsections are emitted once for themselves
+    and again inside every enclosing section.
+    """
     if not os.path.exists(xml_path):
         raise FileNotFoundError(f"File not found: {xml_path}")
 
     with open(xml_path, 'r', encoding='utf-8') as f:
         soup = BeautifulSoup(f.read(), "lxml-xml")
 
-    # Sections to skip (usually not useful for dataset extraction)
-    skip_titles = ["references", "acknowledgements", "funding", "conflict of interest"]
-
     # Collect text from abstract and sections
     text_parts = []
 
@@ -33,7 +155,7 @@ def clean_pmc_xml(xml_path):
     for sec in soup.find_all("sec"):
         title_tag = sec.find("title")
         title = title_tag.get_text(strip=True) if title_tag else "SECTION"
-        if title.lower() in skip_titles:
+        if title.lower() in SKIP_TITLES:
             continue
         body_text = sec.get_text(separator=" ", strip=True)
         text_parts.append(f"\n=== {title.upper()} ===\n{body_text}")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+prompt_packing.py  ▸  Abstract-only extraction with several papers per request.
+
+Abstracts (XMLProcessor.extract_paragraph) are a few hundred tokens each, so
+one request per paper is dominated by the fixed prompt, the round trip and the
+per-request rate limit. Packing groups abstracts into one prompt up to a token
+budget and asks for a JSON object keyed by paper ID:
+
+    ### PAPER PMC123 ──┐
+    ### PAPER PMC456 ──┼─▶ one request ─▶ {"PMC123": {...}, "PMC456": {...}, ...}
+    ### PAPER PMC789 ──┘
+
+The answer is repaired and validated per paper (output_validation.py); any ID
+that is missing, or comes back without all nine keys (typically the last one
+when the answer was cut off), falls back to a single-paper call.
+
+Usage
+-----
+$ python prompt_packing.py --xml_dir /path/to/pmc_xml --output_dir abstract_info --budget_tokens 6000
+Compare against one request per abstract (runs both):
+$ python prompt_packing.py --xml_dir /path/to/pmc_xml --base_url http://127.0.0.1:8000/v1 \
+        --api_key mock --compare
+"""
+
+import os, json, time, asyncio, argparse
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+
+from extract_info_from_paper import DATASET_FIELDS, extract_validated
+from output_validation import repair_json, validate_fields
+from token_counter import count_tokens
+
+PACKED_PROMPT = """
+You are an expert biomedical reader. Below are <<N>> article abstracts, each
+starting with a line "### PAPER <id>". For EACH paper, extract all the datasets
+and data types it uses. Return **valid JSON**: one object keyed by the paper ID
+(exactly as written after "### PAPER"), whose value is an object with keys:
+<<FIELDS>>
+
+<<ABSTRACTS>>
+"""
+PACK_BUDGET_TOKENS = 6000     # prompt tokens per packed request (abstracts + headers)
+MAX_PAPERS_PER_PACK = 16      # also bounds the answer: ~9 short lists per paper
+
+
+def paper_block(paper_id, abstract):
+    return f"### PAPER {paper_id}\n{' '.join(abstract.split())}"
+
+
+def packed_prompt(abstracts, paper_ids):
+    return (PACKED_PROMPT
+            .replace("<<N>>", str(len(paper_ids)))
+            .replace("<<FIELDS>>", "\n".join(f"- {field}" for field in DATASET_FIELDS))
+            .replace("<<ABSTRACTS>>", "\n\n".join(paper_block(pid, abstracts[pid]) for pid in paper_ids)))
+
+
+def pack_abstracts(abstracts, budget_tokens=PACK_BUDGET_TOKENS, max_papers=MAX_PAPERS_PER_PACK):
+    """
+    Greedily group paper IDs (input order) so each pack's blocks fit budget_tokens
+    and hold at most max_papers. An abstract over the budget gets a pack of its own.
+
+    Returns:
+        list[list[str]]: Paper IDs per pack.
+    """
+    packs, current, used = [], [], 0
+    for paper_id, abstract in abstracts.items():
+        tokens = count_tokens(paper_block(paper_id, abstract))
+        if current and (used + tokens > budget_tokens or len(current) >= max_papers):
+            packs.append(current)
+            current, used = [], 0
+        current.append(paper_id)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def split_packed_response(raw, paper_ids):
+    """
+    Per-paper results from one packed answer.
+
+    Keys are matched after stripping whitespace and case, so "pmc123 " still
+    finds PMC123. A paper counts as answered only if all nine keys are present.
+
+    Returns:
+        tuple[dict, list[str]]: {paper_id: validated fields} and the IDs to retry singly.
+    """
+    obj, repaired = repair_json(raw)
+    if repaired:
+        logger.info(f"Packed answer for {len(paper_ids)} papers repaired locally")
+    by_key = {str(key).strip().lower(): value for key, value in obj.items()} if isinstance(obj, dict) else {}
+
+    results, missing = {}, []
+    for paper_id in paper_ids:
+        value = by_key.get(paper_id.strip().lower())
+        data, absent = validate_fields(value, DATASET_FIELDS) if isinstance(value, dict) else ({}, DATASET_FIELDS)
+        if absent:
+            missing.append(paper_id)
+        else:
+            results[paper_id] = {field: data[field] for field in DATASET_FIELDS}
+    return results, missing
+
+
+async def _extract_single(abstract, agent, paper_id):
+    data, _ = await extract_validated(abstract, agent, paper_id)
+    return data
+
+
+async def extract_abstracts_single(abstracts, agent, concurrency=16):
+    """Baseline: one request per abstract. Returns ({paper_id: fields}, stats)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results, failed = {}, 0
+
+    async def one(paper_id):
+        nonlocal failed
+        async with semaphore:
+            try:
+                results[paper_id] = await _extract_single(abstracts[paper_id], agent, paper_id)
+            except Exception as e:
+                logger.warning(f"{paper_id}: extraction failed: {e}")
+                failed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(paper_id) for paper_id in abstracts))
+    elapsed = time.perf_counter() - started
+    return results, {"papers": len(abstracts), "requests": len(abstracts), "failed": failed,
+                     "elapsed_s": elapsed, "papers_per_s": len(abstracts) / max(elapsed, 1e-9)}
+
+
+async def extract_abstracts_packed(abstracts, agent, budget_tokens=PACK_BUDGET_TOKENS,
+                                   max_papers=MAX_PAPERS_PER_PACK, concurrency=16):
+    """
+    Packed extraction with single-paper fallback.
+
+    Args:
+        abstracts (dict[str, str]): paper_id → abstract text (empty ones are skipped).
+        agent (Agent): Shared agent; packed calls are recorded under step "packed".
+        budget_tokens (int): Prompt token budget per pack.
+        max_papers (int): Papers per pack at most.
+        concurrency (int): Requests in flight (packs and fallbacks together).
+
+    Returns:
+        tuple[dict, dict]: {paper_id: fields} and stats (requests, requests saved
+        against one request per paper, fallbacks, papers/s).
+    """
+    abstracts = {pid: text for pid, text in abstracts.items() if text and text.strip()}
+    packs = pack_abstracts(abstracts, budget_tokens, max_papers)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+    stats = {"papers": len(abstracts), "packs": len(packs), "fallbacks": 0, "failed": 0}
+
+    async def single(paper_id):
+        async with semaphore:
+            try:
+                results[paper_id] = await _extract_single(abstracts[paper_id], agent, paper_id)
+            except Exception as e:
+                logger.warning(f"{paper_id}: extraction failed: {e}")
+                stats["failed"] += 1
+
+    async def packed(paper_ids):
+        if len(paper_ids) == 1:     # nothing to share; use the ordinary prompt
+            await single(paper_ids[0])
+            return
+        async with semaphore:
+            try:
+                raw = await agent.process(packed_prompt(abstracts, paper_ids), step="packed",
+                                          response_format="JSON", paper_id=f"pack:{paper_ids[0]}+{len(paper_ids) - 1}")
+                answered, missing = split_packed_response(raw, paper_ids)
+            except Exception as e:
+                logger.warning(f"Pack starting at {paper_ids[0]} failed: {e}")
+                answered, missing = {}, list(paper_ids)
+        results.update(answered)
+        if missing:
+            logger.info(f"{len(missing)}/{len(paper_ids)} papers missing from packed answer, retrying singly")
+            stats["fallbacks"] += len(missing)
+            await asyncio.gather(*(single(paper_id) for paper_id in missing))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(packed(paper_ids) for paper_ids in packs))
+    elapsed = time.perf_counter() - started
+
+    multi = sum(1 for paper_ids in packs if len(paper_ids) > 1)
+    stats["requests"] = multi + sum(len(p) for p in packs if len(p) == 1) + stats["fallbacks"]
+    stats["requests_saved"] = stats["papers"] - stats["requests"]
+    stats["elapsed_s"] = elapsed
+    stats["papers_per_s"] = stats["papers"] / max(elapsed, 1e-9)
+    return results, stats
+
+
+# -------------------------------------------------------------------
+def _abstract_one(xml_path):
+    """Process-pool worker: (paper_id, abstract, None), or (paper_id, None, error) if parsing failed."""
+    from xml_processing import XMLProcessor
+    paper_id = os.path.splitext(os.path.basename(xml_path))[0]
+    try:
+        return paper_id, XMLProcessor().extract_paragraph(xml_path), None
+    except Exception as e:
+        return paper_id, None, str(e)
+
+
+def load_abstracts(xml_paths, workers=None):
+    """paper_id → abstract for each PMC XML, parsed on a process pool; unreadable files are skipped."""
+    abstracts, failed = {}, 0
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for paper_id, abstract, error in pool.map(_abstract_one, xml_paths, chunksize=32):
+            if error is not None:
+                logger.warning(f"Parsing failed for {paper_id}: {error}")
+                failed += 1
+                continue
+            abstracts[paper_id] = abstract
+    if failed:
+        logger.warning(f"Skipped {failed} unreadable XML files")
+    return abstracts
+
+
+def print_packing_report(packed, single=None):
+    print(f"Packed: {packed['papers']} papers in {packed['packs']} packs → {packed['requests']} requests "
+          f"({packed['requests_saved']} saved, {packed['fallbacks']} single-paper fallbacks, "
+          f"{packed['failed']} failed), {packed['elapsed_s']:.1f}s, {packed['papers_per_s']:.1f} papers/s")
+    if single is not None:
+        print(f"Single: {single['papers']} papers → {single['requests']} requests ({single['failed']} failed), "
+              f"{single['elapsed_s']:.1f}s, {single['papers_per_s']:.1f} papers/s")
+        print(f"Throughput gain: {packed['papers_per_s'] / max(single['papers_per_s'], 1e-9):.2f}x, "
+              f"requests {single['requests']} → {packed['requests']}")
+
+
+if __name__ == "__main__":
+    from agents import Agent
+
+    p = argparse.ArgumentParser()
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--xml_dir",   help="Directory of PMC .xml files")
+    src.add_argument("--xml_files", nargs="+", help="List of PMC .xml files")
+    p.add_argument("--output_dir",    default=None, help="Write <paper_id>.json per abstract here")
+    p.add_argument("--model",         default="gpt-4.1")
+    p.add_argument("--base_url",      default=None, help="OpenAI-compatible endpoint (e.g. local mock)")
+    p.add_argument("--api_key",       default=None, help="Overrides api_keys.json")
+    p.add_argument("--budget_tokens", type=int, default=PACK_BUDGET_TOKENS, help="Prompt tokens per pack")
+    p.add_argument("--max_papers",    type=int, default=MAX_PAPERS_PER_PACK, help="Papers per pack at most")
+    p.add_argument("--concurrency",   type=int, default=16, help="Max in-flight requests")
+    p.add_argument("--workers",       type=int, default=None, help="Processes for XML parsing")
+    p.add_argument("--compare",       action="store_true", help="Also run one request per abstract and compare")
+    args = p.parse_args()
+
+    from corpus_pipeline import collect_xml_files
+    abstracts = load_abstracts(collect_xml_files([args.xml_dir] if args.xml_dir else args.xml_files), args.workers)
+
+    agent = Agent(model=args.model, base_url=args.base_url, api_key=args.api_key)
+    results, packed_stats = asyncio.run(extract_abstracts_packed(
+        abstracts, agent, args.budget_tokens, args.max_papers, args.concurrency))
+    single_stats = None
+    if args.compare:
+        baseline = Agent(model=args.model, base_url=args.base_url, api_key=args.api_key)
+        _, single_stats = asyncio.run(extract_abstracts_single(
+            {pid: text for pid, text in abstracts.items() if text and text.strip()}, baseline, args.concurrency))
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for paper_id, data in results.items():
+            with open(os.path.join(args.output_dir, f"{paper_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+        print(f"✅ {len(results)} extractions saved to {args.output_dir}")
+    print_packing_report(packed_stats, single_stats)
+    agent.print_usage()
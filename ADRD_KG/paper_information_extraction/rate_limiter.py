@@ -0,0 +1,166 @@
+"""
+rate_limiter.py  ▸  Shared client-side rate limiting for Agent.
+
+Each model gets one AdaptiveRateLimiter per process, combining
+  - a requests-per-minute token bucket,
+  - a tokens-per-minute token bucket (charged with an estimate up front and
+    corrected with the real usage afterwards), and
+  - an AIMD concurrency window: +1 slot per window's worth of successes,
+    halved (and briefly paused) whenever the API answers 429.
+
+Budgets come from a JSON config keyed by model name, e.g.
+
+    {
+      "gpt-4.1":     {"rpm": 500,  "tpm": 30000,  "max_concurrency": 64},
+      "gpt-4o-mini": {"rpm": 5000, "tpm": 200000, "max_concurrency": 128}
+    }
+"""
+
+import json, time, asyncio
+
+DEFAULT_LIMITS = {"rpm": 500, "tpm": 200_000, "max_concurrency": 64}
+LIMIT_KEYS = {"rpm", "tpm", "max_concurrency", "min_concurrency", "initial_concurrency",
+              "decrease_factor", "cooldown_s"}
+
+
+class TokenBucket:
+    """Continuous-refill bucket holding at most one minute's budget."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` can be taken (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        """Refund (positive) or charge (negative) after the real usage is known."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveRateLimiter:
+    """RPM/TPM token buckets plus an AIMD-controlled concurrency window."""
+
+    def __init__(self, rpm, tpm, max_concurrency=64, min_concurrency=1,
+                 initial_concurrency=None, decrease_factor=0.5, cooldown_s=1.0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(initial_concurrency or max_concurrency)
+        self.decrease_factor = decrease_factor
+        self.cooldown_s = cooldown_s
+
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.stats = {"acquired": 0, "rate_limited": 0, "waited_s": 0.0}
+        self._cond = None   # created lazily inside the running event loop
+        self._loop = None   # loop _cond belongs to; a new asyncio.run gets a fresh one
+
+    @property
+    def concurrency(self):
+        return max(self.min_concurrency, int(self.limit))
+
+    async def acquire(self, est_tokens):
+        """Block until a concurrency slot and RPM/TPM budget are available."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # slots held under a previous (finished) loop can never be released there
+            self._cond, self._loop, self.in_flight = asyncio.Condition(), loop, 0
+        started = time.monotonic()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        try:
+            while True:
+                now = time.monotonic()
+                delay = max(self.paused_until - now,
+                            self.requests.wait_time(1),
+                            self.tokens.wait_time(est_tokens))
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+        except BaseException:
+            await self._release_slot()
+            raise
+        self.requests.take(1)
+        self.tokens.take(est_tokens)
+        self.stats["acquired"] += 1
+        self.stats["waited_s"] += time.monotonic() - started
+
+    async def release(self, est_tokens, used_tokens=None, rate_limited=False, failed=False, retry_after=None):
+        """Return the slot; correct the TPM charge and adapt the concurrency window."""
+        if used_tokens is not None:
+            self.tokens.give_back(est_tokens - used_tokens)
+        if rate_limited:
+            self.on_rate_limit(retry_after)
+        elif not failed:
+            # additive increase: roughly +1 slot per full window of successes
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+        await self._release_slot()
+
+    def on_rate_limit(self, retry_after=None):
+        """Multiplicative decrease (once per cooldown) and a global pause."""
+        now = time.monotonic()
+        self.stats["rate_limited"] += 1
+        if now - self.last_decrease >= self.cooldown_s:
+            self.limit = max(self.min_concurrency, self.limit * self.decrease_factor)
+            self.last_decrease = now
+        self.paused_until = max(self.paused_until, now + (retry_after if retry_after else self.cooldown_s))
+
+    async def _release_slot(self):
+        if self._loop is not asyncio.get_running_loop():
+            return          # acquired under a loop that has since been replaced
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+
+# -------------------------------------------------------------------
+_limiters = {}
+
+
+def load_rate_limits(config_path):
+    """Read per-model budgets from a JSON config file."""
+    try:
+        with open(config_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Rate-limit config '{config_path}' not found.")
+    except json.JSONDecodeError:
+        raise ValueError(f"Error decoding JSON from '{config_path}'. Ensure it is correctly formatted.")
+
+
+def rate_limits_for(model, config_path=None):
+    """AdaptiveRateLimiter keyword arguments for `model` (its entry, else "default", over DEFAULT_LIMITS)."""
+    config = load_rate_limits(config_path) if config_path else {}
+    limits = {**DEFAULT_LIMITS, **config.get(model, config.get("default", {}))}
+    unknown = set(limits) - LIMIT_KEYS
+    if unknown:
+        raise ValueError(f"Unknown rate-limit keys for '{model}': {', '.join(sorted(unknown))}")
+    return limits
+
+
+def get_rate_limiter(model, config_path=None, limits=None):
+    """Process-wide limiter for `model`; every Agent on that model shares it."""
+    if model not in _limiters:
+        if limits is None:
+            limits = rate_limits_for(model, config_path)
+        _limiters[model] = AdaptiveRateLimiter(**limits)
+    return _limiters[model]
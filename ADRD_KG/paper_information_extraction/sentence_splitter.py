@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+sentence_splitter.py  ▸  Batched sentence splitting for XMLProcessor.
+
+Two modes:
+  - "stanza": a process pool of warm stanza tokenize pipelines (one per worker,
+    built once by the pool initializer); each call hands a worker a whole batch
+    of documents, which stanza processes through Pipeline.bulk_process.
+  - "rule":   a fast regex splitter that knows common scientific abbreviations,
+    for cases where exact tokenization does not matter.
+
+Usage
+-----
+$ python sentence_splitter.py --xml_dir /path/to/pmc_xml --workers 4
+"""
+
+import os, re, time, argparse
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from unidecode import unidecode
+
+
+@lru_cache(maxsize=1)
+def get_pipeline():
+    """Process-wide stanza tokenize pipeline (built on first use, then reused)."""
+    import stanza
+    return stanza.Pipeline(lang='en', processors='tokenize', logging_level="ERROR")
+
+
+def split_documents_stanza(texts, nlp=None):
+    """Split many texts in one stanza bulk call; returns one sentence list per text."""
+    import stanza
+    nlp = nlp or get_pipeline()
+    docs = nlp.bulk_process([stanza.Document([], text=t.replace("\n", " ")) for t in texts])
+    return [[unidecode(sentence.text) for sentence in doc.sentences] for doc in docs]
+
+
+# -------------------------------------------------------------------
+ABBREVIATIONS = {
+    "e.g", "i.e", "et al", "etc", "vs", "cf", "fig", "figs", "eq", "eqs", "ref", "refs",
+    "no", "approx", "ca", "dr", "mr", "mrs", "ms", "prof", "st", "inc", "ltd", "co",
+    "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+    "suppl", "vol", "pp", "al", "resp", "min", "max", "sd", "s.d",
+}
+_BOUNDARY = re.compile(r"[.!?][\"'”’)\]]*\s+")
+_LAST_WORD = re.compile(r"([A-Za-z][A-Za-z.]*)$")
+
+
+def split_sentences_rule(text):
+    """Regex sentence splitter: breaks after .!? followed by whitespace and a capital,
+    digit or opening bracket, unless the period ends a known abbreviation or initial."""
+    text = " ".join(text.split())
+    sentences, start = [], 0
+    for m in _BOUNDARY.finditer(text):
+        end = m.end()
+        if end >= len(text) or not (text[end].isupper() or text[end].isdigit() or text[end] in "([\"“'"):
+            continue
+        if text[m.start()] == ".":
+            word = _LAST_WORD.search(text, start, m.start())
+            if word:
+                token = word.group(1).lower().rstrip(".")
+                if token in ABBREVIATIONS or len(token) == 1:
+                    continue
+        sentences.append(text[start:m.start() + len(m.group(0).rstrip())])
+        start = end
+    if start < len(text):
+        sentences.append(text[start:].strip())
+    return [unidecode(s) for s in sentences if s]
+
+
+# -------------------------------------------------------------------
+def _init_worker():
+    get_pipeline()     # warm the pipeline once per worker process
+
+
+def _split_batch(texts):
+    return split_documents_stanza(texts)
+
+
+class SentenceSplitService:
+    """Split many documents at once, on warm stanza workers or with the rule splitter."""
+
+    def __init__(self, mode="stanza", workers=None, batch_size=64):
+        if mode not in ("stanza", "rule"):
+            raise ValueError(f"Unknown sentence splitting mode '{mode}'")
+        self.mode = mode
+        self.batch_size = batch_size
+        self.pool = None
+        if mode == "stanza":
+            self.pool = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1,
+                                            initializer=_init_worker)
+
+    def split(self, texts):
+        """Return one list of sentences per input text, in input order."""
+        texts = list(texts)
+        if self.mode == "rule":
+            return [split_sentences_rule(t) for t in texts]
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = []
+        for batch_result in self.pool.map(_split_batch, batches):
+            results.extend(batch_result)
+        return results
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def measure_throughput(service, texts):
+    """Sentences per second for one service over texts (includes pool warm-up)."""
+    started = time.perf_counter()
+    n_sentences = sum(len(s) for s in service.split(texts))
+    elapsed = time.perf_counter() - started
+    return {"mode": service.mode, "documents": len(texts), "sentences": n_sentences,
+            "seconds": elapsed, "sentences_per_s": n_sentences / max(elapsed, 1e-9)}
+
+
+# Test block
+if __name__ == "__main__":
+    from xml_processing import XMLProcessor
+
+    p = argparse.ArgumentParser()
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument("--xml_dir",   help="Directory of PMC .xml files")
+    src.add_argument("--xml_files", nargs="+", help="List of PMC .xml files")
+    p.add_argument("--workers",    type=int, default=None, help="Stanza worker processes")
+    p.add_argument("--batch_size", type=int, default=64, help="Documents per stanza bulk call")
+    args = p.parse_args()
+
+    if args.xml_dir:
+        paths = sorted(os.path.join(args.xml_dir, f) for f in os.listdir(args.xml_dir) if f.endswith(".xml"))
+    else:
+        paths = args.xml_files
+    processor = XMLProcessor()     # cheap: the stanza pipeline is only built if used
+    abstracts = [processor.extract_paragraph(path) for path in paths]
+
+    print(f"{'Mode':<8} {'Docs':<8} {'Sentences':<10} {'Seconds':<10} {'Sent/s':<10}")
+    print("-" * 50)
+    for mode in ("stanza", "rule"):
+        with SentenceSplitService(mode, workers=args.workers, batch_size=args.batch_size) as service:
+            r = measure_throughput(service, abstracts)
+        print(f"{r['mode']:<8} {r['documents']:<8} {r['sentences']:<10} {r['seconds']:<10.2f} {r['sentences_per_s']:<10.1f}")
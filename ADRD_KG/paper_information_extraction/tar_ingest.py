@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+tar_ingest.py  ▸  Clean PMC Open Access bulk packages (.tar.gz of thousands of
+JATS XMLs) straight out of the archive, without unpacking it to disk.
+
+    archive ─▶ [tarfile stream mode: one member at a time, sequential gzip read]
+            ─▶ (≤ max_in_flight members / max_in_flight_mb bytes)
+            ─▶ [clean_pmc_xml on a process pool, fed the member bytes]
+            ─▶ [store.put(paper_id, cleaned_text)]
+
+The archive is read in tarfile's streaming mode ("r|*"), so it is never seeked
+and never indexed: memory is bounded by the members in flight, not by the size
+of the archive. The reader stops pulling members while the in-flight limits are
+reached, so a slow pool applies back-pressure to the decompressor.
+
+Cleaned texts go to an output store with put(paper_id, text) / close(); the
+default DirectoryStore writes <paper_id>.txt files that
+extract_info_from_paper.py --txt_file (and cost_estimator.py) read;
+--text_store writes a text_store.TextStore (compressed segments) instead.
+
+Usage
+-----
+$ python tar_ingest.py --tarballs oa_comm_xml.PMC000xxxxxx.baseline.tar.gz --output_dir cleaned_txt --workers 8
+$ python tar_ingest.py --tarballs oa_comm_xml.*.tar.gz --text_store cleaned_store
+"""
+
+import os, io, time, tarfile, argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from loguru import logger
+
+from preprocess_xml import clean_pmc_xml
+
+
+class DirectoryStore:
+    """One <paper_id>.txt per paper, written atomically."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def put(self, paper_id, text):
+        path = os.path.join(self.output_dir, f"{paper_id}.txt")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def close(self):
+        pass
+
+
+class _CountingReader(io.RawIOBase):
+    """Wraps the archive file to count compressed bytes read (for MB/s)."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def paper_id_for(member_name):
+    """PMC0012345/PMC12345.xml → PMC12345 (archives nest members in per-range directories)."""
+    return os.path.splitext(os.path.basename(member_name))[0]
+
+
+def _clean_member(args):
+    """Process-pool worker: clean one XML member from its bytes."""
+    paper_id, data = args
+    try:
+        return paper_id, clean_pmc_xml(io.BytesIO(data)), None
+    except Exception as e:
+        return paper_id, None, str(e)
+
+
+def iter_xml_members(tar_path, counter=None):
+    """Yield (paper_id, bytes) for every .xml member of a (compressed) tar, in archive order."""
+    raw = open(tar_path, "rb", buffering=0)
+    stream = io.BufferedReader(counter(raw) if counter else raw, buffer_size=1 << 20)
+    with tarfile.open(fileobj=stream, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith(".xml"):
+                continue
+            handle = archive.extractfile(member)
+            if handle is not None:
+                yield paper_id_for(member.name), handle.read()
+
+
+def ingest_tarballs(tar_paths, store, workers=None, max_in_flight=None, max_in_flight_mb=256, log_every=1000):
+    """
+    Stream every .xml member of tar_paths through clean_pmc_xml into store.
+
+    Args:
+        tar_paths (list[str]): .tar / .tar.gz / .tgz archives, read one after another.
+        store: Object with put(paper_id, text) (e.g. DirectoryStore).
+        workers (int | None): Cleaning processes.
+        max_in_flight (int | None): Members read but not yet stored (default 4 × workers).
+        max_in_flight_mb (float): Cap on the raw XML bytes of those members.
+
+    Returns:
+        dict: files, failed, empty, compressed / XML bytes, elapsed_s, files_per_s, MB/s.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 4 * workers
+    max_bytes = max_in_flight_mb * 1024 ** 2
+    stats = {"archives": 0, "files": 0, "failed": 0, "empty": 0, "compressed_bytes": 0, "xml_bytes": 0}
+    pending = {}            # future → member size
+    in_flight_bytes = 0
+    started = time.perf_counter()
+
+    def drain(block_until):
+        """Store finished results until the in-flight limits allow another member."""
+        nonlocal in_flight_bytes
+        while pending and block_until():
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight_bytes -= pending.pop(future)
+                paper_id, text, error = future.result()
+                stats["files"] += 1
+                if error is not None:
+                    stats["failed"] += 1
+                    logger.warning(f"Cleaning failed for {paper_id}: {error}")
+                elif not text.strip():
+                    stats["empty"] += 1
+                else:
+                    store.put(paper_id, text)
+                if stats["files"] % log_every == 0:
+                    elapsed = max(time.perf_counter() - started, 1e-9)
+                    logger.info(f"{stats['files']} files ({stats['files'] / elapsed:.0f} files/s, "
+                                f"{stats['xml_bytes'] / 1024 ** 2 / elapsed:.1f} MB/s XML)")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for tar_path in tar_paths:
+            counters = []
+
+            def counter(raw):
+                counters.append(_CountingReader(raw))
+                return counters[-1]
+
+            for paper_id, data in iter_xml_members(tar_path, counter):
+                drain(lambda: len(pending) >= max_in_flight or in_flight_bytes + len(data) > max_bytes)
+                pending[pool.submit(_clean_member, (paper_id, data))] = len(data)
+                in_flight_bytes += len(data)
+                stats["xml_bytes"] += len(data)
+            stats["archives"] += 1
+            stats["compressed_bytes"] += sum(c.bytes_read for c in counters)
+        drain(lambda: True)
+
+    elapsed = time.perf_counter() - started
+    stats["elapsed_s"] = elapsed
+    stats["files_per_s"] = stats["files"] / max(elapsed, 1e-9)
+    stats["compressed_mb_per_s"] = stats["compressed_bytes"] / 1024 ** 2 / max(elapsed, 1e-9)
+    stats["xml_mb_per_s"] = stats["xml_bytes"] / 1024 ** 2 / max(elapsed, 1e-9)
+    return stats
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    p.add_argument("--tarballs",   nargs="+", required=True, help="PMC OA bulk .tar.gz archives")
+    out = p.add_mutually_exclusive_group(required=True)
+    out.add_argument("--output_dir", help="Where cleaned <paper_id>.txt files go")
+    out.add_argument("--text_store", help="Write into a text_store.TextStore directory instead")
+    p.add_argument("--workers",    type=int, default=None, help="Cleaning processes")
+    p.add_argument("--max_in_flight",    type=int, default=None, help="Members buffered at most (default 4 × workers)")
+    p.add_argument("--max_in_flight_mb", type=float, default=256, help="Raw XML megabytes buffered at most")
+    args = p.parse_args()
+
+    if args.text_store:
+        from text_store import TextStore
+        store = TextStore(args.text_store)
+    else:
+        store = DirectoryStore(args.output_dir)
+    stats = ingest_tarballs(args.tarballs, store, args.workers, args.max_in_flight, args.max_in_flight_mb)
+    store.close()
+    print(f"✅ {stats['files']} XML files from {stats['archives']} archives in {stats['elapsed_s']:.1f}s "
+          f"({stats['failed']} failed, {stats['empty']} empty)")
+    print(f"   {stats['files_per_s']:.0f} files/s, {stats['compressed_mb_per_s']:.1f} MB/s compressed, "
+          f"{stats['xml_mb_per_s']:.1f} MB/s XML")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+telemetry.py  ▸  Per-request LLM telemetry for Agent.
+
+Every Agent.process call (and every Batch-API result) becomes one record
+
+    {"ts", "paper_id", "step", "model", "status", "cache", "latency_s",
+     "retries", "prompt_tokens", "completion_tokens", "cost_usd"}
+
+appended to a JSONL file. Running aggregates are kept in memory and written as
+a Prometheus text-format snapshot next to it, so a node-exporter textfile
+collector (or a plain `cat`) can watch a corpus run live.
+
+Usage
+-----
+$ python telemetry.py report --log telemetry.jsonl            # p50/p95, $/paper, top papers
+$ python telemetry.py prom   --log telemetry.jsonl --out telemetry.prom
+"""
+
+import os, json, time, argparse
+from collections import defaultdict
+
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+
+class PromMetrics:
+    """Running counters/histograms/gauges rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.counters = defaultdict(float)      # (metric, labels) → value
+        self.histograms = {}                    # labels → [bucket counts..., +Inf, sum]
+        self.gauges = {}                        # (metric, labels) → value, set by other components
+
+    def add(self, r):
+        labels = (("model", r.get("model", "")), ("step", str(r.get("step", ""))),
+                  ("cache", r.get("cache", "")), ("status", r.get("status", "")))
+        self.counters[("llm_requests_total", labels)] += 1
+        self.counters[("llm_retries_total", labels)] += r.get("retries") or 0
+        self.counters[("llm_prompt_tokens_total", labels)] += r.get("prompt_tokens") or 0
+        self.counters[("llm_completion_tokens_total", labels)] += r.get("completion_tokens") or 0
+        self.counters[("llm_cost_dollars_total", labels)] += r.get("cost_usd") or 0
+        latency = r.get("latency_s")
+        if latency is not None:
+            hist = self.histograms.setdefault(labels[:2], [0] * (len(LATENCY_BUCKETS) + 2))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    hist[i] += 1
+            hist[-2] += 1
+            hist[-1] += latency
+
+    def set_gauge(self, metric, value, **labels):
+        self.gauges[(metric, tuple(sorted(labels.items())))] = value
+
+    def text(self):
+        def fmt(labels):
+            return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+        lines = []
+        for metric in sorted({m for m, _ in self.counters}):
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f"{metric}{fmt(l)} {v}" for (m, l), v in sorted(self.counters.items()) if m == metric)
+        if self.histograms:
+            lines.append("# TYPE llm_latency_seconds histogram")
+            for labels, hist in sorted(self.histograms.items()):
+                for bound, count in zip(LATENCY_BUCKETS, hist):
+                    lines.append(f"llm_latency_seconds_bucket{fmt(labels + (('le', str(bound)),))} {count}")
+                lines.append(f"llm_latency_seconds_bucket{fmt(labels + (('le', '+Inf'),))} {hist[-2]}")
+                lines.append(f"llm_latency_seconds_count{fmt(labels)} {hist[-2]}")
+                lines.append(f"llm_latency_seconds_sum{fmt(labels)} {hist[-1]}")
+        for metric in sorted({m for m, _ in self.gauges}):
+            lines.append(f"# TYPE {metric} gauge")
+            lines.extend(f"{metric}{fmt(l)} {v}" for (m, l), v in sorted(self.gauges.items()) if m == metric)
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.text())
+        os.replace(tmp, path)   # atomic, so scrapers never see a half-written file
+
+
+class TelemetrySink:
+    """Append-only JSONL sink plus a periodically refreshed Prometheus snapshot."""
+
+    def __init__(self, path="telemetry.jsonl", prom_path=None, snapshot_every=100):
+        self.path = path
+        self.prom_path = prom_path or os.path.splitext(path)[0] + ".prom"
+        self.snapshot_every = snapshot_every
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+        self._records = 0
+        self.metrics = PromMetrics()
+
+    def record(self, **fields):
+        fields.setdefault("ts", time.time())
+        self._fh.write(json.dumps(fields) + "\n")
+        self._fh.flush()
+        self.metrics.add(fields)
+        self._records += 1
+        if self._records % self.snapshot_every == 0:
+            self.write_prometheus()
+
+    def set_gauge(self, metric, value, **labels):
+        self.metrics.set_gauge(metric, value, **labels)
+
+    def write_prometheus(self):
+        self.metrics.write(self.prom_path)
+
+    def close(self):
+        self.write_prometheus()
+        self._fh.close()
+
+
+# -------------------------------------------------------------------
+def load_records(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(records, top=10):
+    """Latency percentiles per (model, step) and per-paper tokens/dollars."""
+    groups = defaultdict(list)
+    for r in records:
+        groups[(r.get("model"), r.get("step"))].append(r)
+    per_step = []
+    for (model, step), rs in sorted(groups.items(), key=lambda kv: str(kv[0])):
+        latencies = [r["latency_s"] for r in rs if r.get("latency_s") is not None and r.get("cache") != "hit"]
+        per_step.append({
+            "model": model, "step": step, "requests": len(rs),
+            "p50_s": percentile(latencies, 0.5), "p95_s": percentile(latencies, 0.95),
+            "retries": sum(r.get("retries") or 0 for r in rs),
+            "cache_hits": sum(1 for r in rs if r.get("cache") == "hit"),
+            "cost_usd": sum(r.get("cost_usd") or 0 for r in rs),
+        })
+
+    papers = defaultdict(lambda: {"tokens": 0, "cost_usd": 0.0, "latency_s": 0.0, "requests": 0})
+    for r in records:
+        paper = papers[r.get("paper_id") or "<none>"]
+        paper["tokens"] += (r.get("prompt_tokens") or 0) + (r.get("completion_tokens") or 0)
+        paper["cost_usd"] += r.get("cost_usd") or 0
+        paper["latency_s"] += r.get("latency_s") or 0
+        paper["requests"] += 1
+    n = max(len(papers), 1)
+    return {
+        "per_step": per_step,
+        "papers": len(papers),
+        "tokens_per_paper": sum(p["tokens"] for p in papers.values()) / n,
+        "dollars_per_paper": sum(p["cost_usd"] for p in papers.values()) / n,
+        "top_cost": sorted(papers.items(), key=lambda kv: -kv[1]["cost_usd"])[:top],
+        "top_latency": sorted(papers.items(), key=lambda kv: -kv[1]["latency_s"])[:top],
+    }
+
+
+def print_report(summary):
+    print(f"{'Model':<14} {'Step':<10} {'Requests':<10} {'p50 (s)':<9} {'p95 (s)':<9} {'Retries':<9} {'Hits':<7} {'Cost ($)':<10}")
+    print("-" * 84)
+    for s in summary["per_step"]:
+        print(f"{str(s['model']):<14} {str(s['step']):<10} {s['requests']:<10} {s['p50_s']:<9.2f} {s['p95_s']:<9.2f} "
+              f"{s['retries']:<9} {s['cache_hits']:<7} {s['cost_usd']:<10.4f}")
+    print("-" * 84)
+    print(f"{summary['papers']} papers, {summary['tokens_per_paper']:.0f} tokens/paper, "
+          f"${summary['dollars_per_paper']:.4f}/paper")
+    for title, key in (("Most expensive papers", "top_cost"), ("Slowest papers", "top_latency")):
+        print(f"\n{title}:")
+        for paper_id, p in summary[key]:
+            print(f"  {paper_id:<24} ${p['cost_usd']:<10.4f} {p['latency_s']:<8.1f}s {p['tokens']:<8} tokens {p['requests']} req")
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("report", help="Latency percentiles and per-paper spend")
+    r.add_argument("--log", default="telemetry.jsonl")
+    r.add_argument("--top", type=int, default=10)
+    m = sub.add_parser("prom", help="Rebuild a Prometheus snapshot from a JSONL log")
+    m.add_argument("--log", default="telemetry.jsonl")
+    m.add_argument("--out", default="telemetry.prom")
+    args = p.parse_args()
+
+    records = load_records(args.log)
+    if args.command == "report":
+        print_report(summarize(records, args.top))
+    else:
+        metrics = PromMetrics()
+        for record in records:
+            metrics.add(record)
+        metrics.write(args.out)
+        print(f"✅ Prometheus snapshot written to {args.out}")
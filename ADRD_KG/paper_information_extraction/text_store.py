@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+"""
+text_store.py  ▸  Cleaned paper text in a few large compressed segment files
+instead of one loose .txt per paper.
+
+Storage (one directory):
+    seg-000000.dat …   append-only segments of compressed records (zstd, or
+                       zlib when the `zstandard` package is missing)
+    index.sqlite       blobs:  content hash → (segment, offset, length, raw length)
+                       papers: paper ID → content hash
+    meta.json          codec, level, segment size
+
+Each distinct text is stored once: put() hashes the text (SHA-256) and a paper
+whose text already exists (a re-ingested package, an identical version) only
+adds a row to `papers`. Reads look the paper up in an in-memory offset table
+and decompress a slice of a memory-mapped segment: one dict lookup, no file
+open per paper, a handful of inodes for the whole corpus.
+
+The store has the same put(paper_id, text) / close() interface as
+tar_ingest.DirectoryStore, and a read side (get, ids, items) that
+extract_info_from_paper.py --text_store and search_index.py build
+--text_store consume directly. One writer at a time; readers may run alongside
+and call refresh() to see new papers.
+
+Usage
+-----
+$ python text_store.py import --txt_dir cleaned_txt --store cleaned_store
+$ python text_store.py get    --store cleaned_store PMC8640037
+$ python text_store.py stats  --store cleaned_store
+$ python text_store.py bench  --txt_dir cleaned_txt --store /tmp/bench_store
+"""
+
+import os, json, mmap, time, random, sqlite3, hashlib, argparse, threading
+from loguru import logger
+
+SEGMENT_MB = 256
+ZSTD_LEVEL = 6
+COMMIT_EVERY = 500          # puts per index transaction
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash       TEXT PRIMARY KEY,
+    segment    INTEGER NOT NULL,
+    offset     INTEGER NOT NULL,
+    length     INTEGER NOT NULL,
+    raw_length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS papers (
+    paper_id TEXT PRIMARY KEY,
+    hash     TEXT NOT NULL REFERENCES blobs(hash),
+    updated  REAL NOT NULL
+);
+"""
+
+
+def _codec(name, level):
+    """(compress, decompress) callables for a codec name."""
+    if name == "zstd":
+        import zstandard
+        compressor = zstandard.ZstdCompressor(level=level)
+        local = threading.local()           # zstd contexts are not thread-safe
+
+        def decompress(data):
+            if not hasattr(local, "decompressor"):
+                local.decompressor = zstandard.ZstdDecompressor()
+            return local.decompressor.decompress(data)
+        return compressor.compress, decompress
+    if name == "zlib":
+        import zlib
+        return (lambda data: zlib.compress(data, min(level, 9))), zlib.decompress
+    raise ValueError(f"Unknown codec '{name}'")
+
+
+def default_codec():
+    try:
+        import zstandard  # noqa: F401
+        return "zstd"
+    except ImportError:
+        logger.warning("The 'zstandard' package is missing; compressing the text store with zlib")
+        return "zlib"
+
+
+class TextStore:
+    """Segment-file store of cleaned texts: put(paper_id, text) / get(paper_id)."""
+
+    def __init__(self, path, read_only=False, codec=None, level=ZSTD_LEVEL, segment_mb=SEGMENT_MB):
+        self.path = path
+        self.read_only = read_only
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                self.meta = json.load(f)
+        elif read_only:
+            raise FileNotFoundError(f"Text store '{path}' not found.")
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.meta = {"codec": codec or default_codec(), "level": level, "segment_bytes": int(segment_mb * 1024 ** 2)}
+            with open(meta_path, "w") as f:
+                json.dump(self.meta, f, indent=2)
+        self._compress, self._decompress = _codec(self.meta["codec"], self.meta["level"])
+
+        db_path = os.path.join(path, "index.sqlite")
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(_SCHEMA)
+        self._maps = {}             # segment → mmap
+        self._maps_lock = threading.Lock()   # get() may run on executor threads
+        self._segment_file = None   # writer's open segment
+        self._uncommitted = 0
+        self._load_index()
+
+    # -- index -------------------------------------------------------
+    def _load_index(self):
+        self.blobs = {h: (segment, offset, length, raw_length) for h, segment, offset, length, raw_length
+                      in self.conn.execute("SELECT hash, segment, offset, length, raw_length FROM blobs")}
+        self.papers = dict(self.conn.execute("SELECT paper_id, hash FROM papers"))
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self):
+        """Reload the offset table if a writer committed since we loaded it."""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._load_index()
+
+    def segment_path(self, segment):
+        return os.path.join(self.path, f"seg-{segment:06d}.dat")
+
+    # -- writing -----------------------------------------------------
+    def _open_segment(self, size):
+        """Append handle for the current segment, rolling over once it is full."""
+        if self._segment_file is None:
+            last = max((segment for segment, *_ in self.blobs.values()), default=0)
+            self._segment_file = open(self.segment_path(last), "ab")
+            self._segment = last
+        if self._segment_file.tell() and self._segment_file.tell() + size > self.meta["segment_bytes"]:
+            self._segment_file.close()
+            self._segment += 1
+            self._segment_file = open(self.segment_path(self._segment), "ab")
+        return self._segment_file
+
+    def put(self, paper_id, text):
+        """Store one paper's cleaned text (replacing any previous version); True if new bytes were written."""
+        if self.read_only:
+            raise RuntimeError("Text store opened read-only")
+        raw = text.encode("utf-8")
+        content_hash = hashlib.sha256(raw).hexdigest()
+        written = content_hash not in self.blobs
+        if written:
+            data = self._compress(raw)
+            f = self._open_segment(len(data))
+            offset = f.tell()
+            f.write(data)
+            entry = (self._segment, offset, len(data), len(raw))
+            self.blobs[content_hash] = entry
+            self.conn.execute("INSERT INTO blobs (hash, segment, offset, length, raw_length) VALUES (?, ?, ?, ?, ?)",
+                              (content_hash, *entry))
+        if self.papers.get(paper_id) != content_hash:
+            self.papers[paper_id] = content_hash
+            self.conn.execute("INSERT OR REPLACE INTO papers (paper_id, hash, updated) VALUES (?, ?, ?)",
+                              (paper_id, content_hash, time.time()))
+        self._uncommitted += 1
+        if self._uncommitted >= COMMIT_EVERY:
+            self.commit()
+        return written
+
+    def commit(self):
+        """Flush segment bytes, then commit the index rows that point at them."""
+        if self._segment_file is not None:
+            self._segment_file.flush()
+        self.conn.commit()
+        self._uncommitted = 0
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # -- reading -----------------------------------------------------
+    def _map(self, segment, end):
+        with self._maps_lock:
+            mapped = self._maps.get(segment)
+            if mapped is None or len(mapped) < end:      # new segment, or the writer appended since
+                # the old map is left to the GC: another thread may still be slicing it
+                with open(self.segment_path(segment), "rb") as f:
+                    mapped = self._maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return mapped
+
+    def get(self, paper_id, default=None):
+        """Cleaned text of paper_id, or default when it is not stored."""
+        content_hash = self.papers.get(paper_id)
+        if content_hash is None:
+            return default
+        segment, offset, length, _ = self.blobs[content_hash]
+        if self._segment_file is not None and segment == self._segment:
+            self._segment_file.flush()             # our own unflushed appends
+        return self._decompress(self._map(segment, offset + length)[offset:offset + length]).decode("utf-8")
+
+    def __contains__(self, paper_id):
+        return paper_id in self.papers
+
+    def __len__(self):
+        return len(self.papers)
+
+    def ids(self):
+        """Paper IDs in storage order (segment, offset), so a full scan reads segments sequentially."""
+        return sorted(self.papers, key=lambda paper_id: self.blobs[self.papers[paper_id]][:2])
+
+    def items(self):
+        """(paper_id, text) for every paper, in storage order."""
+        for paper_id in self.ids():
+            yield paper_id, self.get(paper_id)
+
+    def stats(self):
+        raw = sum(self.blobs[h][3] for h in self.papers.values())
+        stored = sum(entry[2] for entry in self.blobs.values())
+        live = {self.papers[paper_id] for paper_id in self.papers}
+        segments = sorted({entry[0] for entry in self.blobs.values()})
+        return {"papers": len(self.papers), "blobs": len(self.blobs), "duplicates": len(self.papers) - len(live),
+                "dead_blobs": len(self.blobs) - len(live), "raw_bytes": raw, "stored_bytes": stored,
+                "ratio": raw / max(stored, 1), "segments": len(segments), "codec": self.meta["codec"]}
+
+    def close(self):
+        if not self.read_only:
+            self.commit()
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps.clear()
+        self.conn.close()
+
+
+# -------------------------------------------------------------------
+def import_txt_dir(store, txt_dir):
+    """Add every <paper_id>.txt of txt_dir to store; returns (papers, new blobs)."""
+    papers = written = 0
+    for name in sorted(os.listdir(txt_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(txt_dir, name), "r", encoding="utf-8") as f:
+                written += store.put(name[:-4], f.read())
+            papers += 1
+    store.commit()
+    return papers, written
+
+
+def disk_usage(paths):
+    """(inodes, allocated bytes) of a list of files."""
+    blocks = 0
+    for path in paths:
+        blocks += os.stat(path).st_blocks
+    return len(paths), blocks * 512
+
+
+def benchmark(txt_dir, store_path, reads=2000, seed=0):
+    """Inodes, disk footprint and random-read throughput: loose .txt files vs a TextStore of the same texts."""
+    names = sorted(name for name in os.listdir(txt_dir) if name.endswith(".txt"))
+    store = TextStore(store_path)
+    started = time.perf_counter()
+    import_txt_dir(store, txt_dir)
+    import_s = time.perf_counter() - started
+    store.close()
+
+    store = TextStore(store_path, read_only=True)
+    rng = random.Random(seed)
+    sample = [rng.choice(names) for _ in range(reads)]
+    rows = {}
+
+    started, nbytes = time.perf_counter(), 0
+    for name in sample:
+        with open(os.path.join(txt_dir, name), "r", encoding="utf-8") as f:
+            nbytes += len(f.read())
+    elapsed = time.perf_counter() - started
+    inodes, footprint = disk_usage([os.path.join(txt_dir, name) for name in names])
+    rows["loose files"] = {"inodes": inodes, "disk_bytes": footprint, "reads_per_s": reads / elapsed,
+                           "mb_per_s": nbytes / 1024 ** 2 / elapsed}
+
+    started, nbytes = time.perf_counter(), 0
+    for name in sample:
+        nbytes += len(store.get(name[:-4]))
+    elapsed = time.perf_counter() - started
+    files = [os.path.join(store_path, name) for name in os.listdir(store_path)]
+    inodes, footprint = disk_usage(files)
+    rows["text store"] = {"inodes": inodes, "disk_bytes": footprint, "reads_per_s": reads / elapsed,
+                          "mb_per_s": nbytes / 1024 ** 2 / elapsed}
+    stats = store.stats()
+    store.close()
+    return rows, stats, import_s
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="command", required=True)
+    i = sub.add_parser("import", help="Add a directory of cleaned .txt files")
+    i.add_argument("--txt_dir", required=True)
+    i.add_argument("--store",   required=True)
+    g = sub.add_parser("get", help="Print one paper's cleaned text")
+    g.add_argument("paper_id")
+    g.add_argument("--store", required=True)
+    s = sub.add_parser("stats", help="Papers, duplicates and compression ratio")
+    s.add_argument("--store", required=True)
+    b = sub.add_parser("bench", help="Compare against the loose .txt files of txt_dir")
+    b.add_argument("--txt_dir", required=True)
+    b.add_argument("--store",   required=True, help="Scratch store directory (created)")
+    b.add_argument("--reads",   type=int, default=2000)
+    args = p.parse_args()
+
+    if args.command == "import":
+        store = TextStore(args.store)
+        started = time.perf_counter()
+        papers, written = import_txt_dir(store, args.txt_dir)
+        store.close()
+        print(f"✅ {papers} papers imported ({papers - written} deduplicated) in "
+              f"{time.perf_counter() - started:.1f}s → {args.store}")
+    elif args.command == "get":
+        store = TextStore(args.store, read_only=True)
+        text = store.get(args.paper_id)
+        store.close()
+        if text is None:
+            print(f"❌ {args.paper_id} not in {args.store}")
+            raise SystemExit(1)
+        print(text)
+    elif args.command == "stats":
+        store = TextStore(args.store, read_only=True)
+        s = store.stats()
+        store.close()
+        print(f"{s['papers']} papers, {s['blobs']} stored texts ({s['duplicates']} duplicates, "
+              f"{s['dead_blobs']} superseded) in {s['segments']} segments")
+        print(f"{s['raw_bytes'] / 1024 ** 2:.1f} MB text → {s['stored_bytes'] / 1024 ** 2:.1f} MB "
+              f"{s['codec']} (×{s['ratio']:.1f})")
+    else:
+        rows, s, import_s = benchmark(args.txt_dir, args.store, args.reads)
+        print(f"{'Layout':<12} {'Inodes':<8} {'Disk (MB)':<10} {'Reads/s':<10} {'MB/s':<8}")
+        print("-" * 50)
+        for name, r in rows.items():
+            print(f"{name:<12} {r['inodes']:<8} {r['disk_bytes'] / 1024 ** 2:<10.1f} "
+                  f"{r['reads_per_s']:<10.0f} {r['mb_per_s']:<8.1f}")
+        print(f"\n✅ {s['papers']} papers imported in {import_s:.1f}s ({s['duplicates']} duplicates, "
+              f"{s['codec']} ×{s['ratio']:.1f}); warm page cache, random reads")
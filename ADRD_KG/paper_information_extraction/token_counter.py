@@ -0,0 +1,55 @@
+"""
+token_counter.py  ▸  Local (offline) prompt token counting.
+
+All models in agents.price_map use the o200k_base encoding. tiktoken is only
+loaded from its local cache (TIKTOKEN_CACHE_DIR / DATA_GYM_CACHE_DIR, else the
+system temp dir): counting never downloads the BPE file unless
+ADRD_TIKTOKEN_DOWNLOAD=1 is set. Without tiktoken or a cached BPE file the
+count falls back to ~4 characters per token.
+
+Prime the cache once, on a machine with network access:
+
+$ ADRD_TIKTOKEN_DOWNLOAD=1 python token_counter.py
+"""
+
+import os, hashlib, tempfile
+
+from loguru import logger
+
+_BPE_URL = "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken"
+_UNLOADED = object()
+_ENCODING = _UNLOADED
+
+
+def _bpe_cached():
+    """True when tiktoken will find the o200k_base file in its cache (mirrors tiktoken.load)."""
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR") or os.environ.get("DATA_GYM_CACHE_DIR") \
+        or os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    return os.path.exists(os.path.join(cache_dir, hashlib.sha1(_BPE_URL.encode()).hexdigest()))
+
+
+def _load_encoding():
+    if not _bpe_cached() and os.environ.get("ADRD_TIKTOKEN_DOWNLOAD") != "1":
+        logger.warning("o200k_base BPE file not cached locally; counting ~4 characters per token "
+                       "(set ADRD_TIKTOKEN_DOWNLOAD=1 once to fetch it)")
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:   # tiktoken missing, or the download failed
+        logger.warning(f"tiktoken unavailable ({e}); counting ~4 characters per token")
+        return None
+
+
+def count_tokens(text):
+    global _ENCODING
+    if _ENCODING is _UNLOADED:
+        _ENCODING = _load_encoding()
+    if _ENCODING is None:
+        return len(text) // 4
+    return len(_ENCODING.encode(text, disallowed_special=()))
+
+
+if __name__ == "__main__":
+    count_tokens("")
+    print("✅ o200k_base loaded" if _ENCODING is not None else "❌ falling back to ~4 characters per token")
@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+"""
+vector_index.py  ▸  Offline "papers with a similar data setup" search over the
+extraction outputs (and, optionally, the cleaned full text).
+
+Embedding: each paper becomes one document made of typed entity tokens
+(dataset_adni, tool_freesurfer, data_type_dti…, repeated so they dominate),
+the raw field values, and the first part of its cleaned text. A TF-IDF
+vectorizer and a truncated SVD (scikit-learn, fitted locally on a sample)
+map it to a dense, L2-normalised float32 vector; no network, no model download.
+
+Storage (one directory):
+    model.pkl.gz   fitted vectorizer + SVD (frozen; new papers reuse it)
+    vectors.f32    row-major float32 matrix, memory-mapped for queries
+    lists.i32      IVF list (nearest centroid) of every row
+    ids.txt        paper ID of every row
+    centroids.npy  IVF centroids (spherical k-means)
+    meta.json      dimensions and build parameters
+
+Queries score only the rows in the nprobe IVF lists closest to the query (an
+inverted-file ANN index), so a top-k over 100k papers reads a few thousand
+rows. The files are append-only: add() embeds new or updated extractions with
+the frozen model, assigns them to their nearest centroid and appends; the last
+row for a paper ID wins. Rebuild (build) once the corpus has drifted far from
+the training sample.
+
+Usage
+-----
+$ python vector_index.py build --input_dir dataset_info --xml_dir /path/to/pmc_xml --index paper_vectors
+$ python vector_index.py add   --input_dir new_outputs --index paper_vectors
+$ python vector_index.py query --index paper_vectors --paper PMC8640037 -k 10
+$ python vector_index.py query --index paper_vectors --text "ADNI DTI FreeSurfer hippocampus"
+$ python vector_index.py bench --index paper_vectors --queries 200
+"""
+
+import os, gzip, json, math, time, pickle, argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from entity_normalizer import name_key
+from knowledge_graph import FIELD_TYPES, mention_text
+
+ENTITY_TOKEN_TYPES = {"dataset", "data_type", "tool", "brain_region", "source"}
+ENTITY_REPEAT = 3               # entity tokens outweigh free text describing the same thing
+MAX_TEXT_CHARS = 20_000         # cleaned text used per paper (abstract + methods come first)
+DEFAULT_DIM = 128
+DEFAULT_NPROBE = 16
+
+
+def record_text(extraction, cleaned_text=None, max_text_chars=MAX_TEXT_CHARS):
+    """The document embedded for one paper."""
+    parts = []
+    for field, node_type in FIELD_TYPES.items():
+        for value in extraction.get(field) or []:
+            text = mention_text(value)
+            key = name_key(text)
+            if not key:
+                continue
+            if node_type in ENTITY_TOKEN_TYPES:
+                parts.append(" ".join([f"{node_type}_{key.replace(' ', '_')}"] * ENTITY_REPEAT))
+            parts.append(text)
+    for value in extraction.get("Key_Findings") or []:
+        parts.append(mention_text(value))
+    if cleaned_text:
+        parts.append(cleaned_text[:max_text_chars])
+    return "\n".join(parts)
+
+
+class Embedder:
+    """TF-IDF → truncated SVD → L2 normalisation, fitted once and then frozen."""
+
+    def __init__(self, dim=DEFAULT_DIM, max_features=200_000, min_df=2, max_df=0.5, seed=0):
+        self.dim = dim
+        self.max_features = max_features
+        self.min_df = min_df
+        self.max_df = max_df
+        self.seed = seed
+        self.vectorizer = None
+        self.svd = None
+
+    def fit(self, texts):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.decomposition import TruncatedSVD
+
+        texts = list(texts)
+        self.vectorizer = TfidfVectorizer(
+            sublinear_tf=True, dtype=np.float32, max_features=self.max_features,
+            min_df=self.min_df if len(texts) >= 50 else 1, max_df=self.max_df if len(texts) >= 50 else 1.0,
+        )
+        matrix = self.vectorizer.fit_transform(texts)
+        self.dim = max(1, min(self.dim, matrix.shape[1] - 1, len(texts) - 1))
+        self.svd = TruncatedSVD(n_components=self.dim, algorithm="randomized", random_state=self.seed)
+        self.svd.fit(matrix)
+        return self
+
+    def transform(self, texts):
+        vectors = self.svd.transform(self.vectorizer.transform(list(texts))).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def spherical_kmeans(vectors, k, iters=20, seed=0, block=16384):
+    """Centroids (unit length) maximising cosine similarity; empty clusters are re-seeded."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest_centroid(vectors, centroids, block)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+
+def nearest_centroid(vectors, centroids, block=16384):
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        out[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+class VectorIndex:
+    """Append-only memory-mapped vectors + IVF lists (see module docstring)."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with gzip.open(self._file("model.pkl.gz"), "rb") as f:
+            self.embedder = pickle.load(f)
+        self.centroids = np.load(self._file("centroids.npy"))
+        self.dim = self.meta["dim"]
+        self.refresh()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    # -- building / appending ----------------------------------------
+    @classmethod
+    def build(cls, path, records, dim=DEFAULT_DIM, nlist=None, fit_sample=50_000, seed=0):
+        """
+        Fit the embedder and IVF centroids on (a sample of) records and write a new index.
+
+        Args:
+            records (dict[str, str]): paper_id → record_text().
+            nlist (int | None): IVF lists; default ≈ √N.
+            fit_sample (int): Documents used to fit TF-IDF/SVD and k-means.
+        """
+        ids = list(records)
+        if not ids:
+            raise ValueError("No records to index")
+        rng = np.random.default_rng(seed)
+        sample = ids if len(ids) <= fit_sample else [ids[i] for i in rng.choice(len(ids), fit_sample, replace=False)]
+
+        started = time.perf_counter()
+        embedder = Embedder(dim=dim, seed=seed).fit(records[pid] for pid in sample)
+        vectors = embedder.transform(records[pid] for pid in ids)
+        nlist = nlist or max(1, int(round(math.sqrt(len(ids)))))
+        train = vectors if len(vectors) <= fit_sample else vectors[rng.choice(len(vectors), fit_sample, replace=False)]
+        centroids = spherical_kmeans(train, nlist, seed=seed)
+
+        os.makedirs(path, exist_ok=True)
+        for name in ("vectors.f32", "lists.i32", "ids.txt"):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        with gzip.open(os.path.join(path, "model.pkl.gz"), "wb") as f:
+            pickle.dump(embedder, f, protocol=pickle.HIGHEST_PROTOCOL)
+        np.save(os.path.join(path, "centroids.npy"), centroids)
+        meta = {"dim": embedder.dim, "nlist": len(centroids), "trained_on": len(sample),
+                "built_at": time.time(), "build_s": round(time.perf_counter() - started, 2)}
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        index = cls(path)
+        index._append(ids, vectors)
+        return index
+
+    def add(self, records):
+        """Embed and append records (paper_id → record_text); re-added IDs replace their old row."""
+        ids = list(records)
+        if ids:
+            self._append(ids, self.embedder.transform(records[pid] for pid in ids))
+        return len(ids)
+
+    def _truncate_to_ids(self):
+        """Cut vectors/lists (and a half-written ID line) back to the rows ids.txt commits to."""
+        rows = 0
+        ids_path = self._file("ids.txt")
+        if os.path.exists(ids_path):
+            with open(ids_path, "rb+") as f:
+                data = f.read()
+                complete = data.rfind(b"\n") + 1
+                if complete != len(data):
+                    f.truncate(complete)
+                rows = data.count(b"\n", 0, complete)
+        for name, row_bytes in (("vectors.f32", 4 * self.dim), ("lists.i32", 4)):
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * row_bytes:
+                os.truncate(path, rows * row_bytes)
+
+    def _append(self, ids, vectors):
+        # vectors and lists first, ids last: ids.txt is the commit point. Rows a crash left without
+        # an ID are ignored by refresh() and cut off here, so new rows line up with their IDs again.
+        self._truncate_to_ids()
+        with open(self._file("vectors.f32"), "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(self._file("lists.i32"), "ab") as f:
+            f.write(nearest_centroid(vectors, self.centroids).tobytes())
+        with open(self._file("ids.txt"), "a", encoding="utf-8") as f:
+            f.write("".join(f"{pid}\n" for pid in ids))
+        self.refresh()
+
+    def refresh(self):
+        """(Re)map the files; call after another process appended."""
+        ids = []
+        if os.path.exists(self._file("ids.txt")):
+            with open(self._file("ids.txt"), "r", encoding="utf-8") as f:
+                ids = f.read().splitlines()
+        rows = len(ids)
+        if rows:
+            rows = min(rows, os.path.getsize(self._file("vectors.f32")) // (4 * self.dim),
+                       os.path.getsize(self._file("lists.i32")) // 4)
+        self.ids = ids[:rows]
+        self.vectors = (np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(rows, self.dim))
+                        if rows else np.zeros((0, self.dim), dtype=np.float32))
+        lists = np.fromfile(self._file("lists.i32"), dtype=np.int32, count=rows) if rows else np.zeros(0, np.int32)
+
+        self.row_of = {pid: row for row, pid in enumerate(self.ids)}     # last row per ID wins
+        live = np.fromiter(sorted(self.row_of.values()), dtype=np.int64, count=len(self.row_of))
+        order = np.argsort(lists[live], kind="stable")
+        self.list_rows = live[order]                                     # rows grouped by IVF list
+        counts = np.bincount(lists[live], minlength=len(self.centroids))
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def __len__(self):
+        return len(self.row_of)
+
+    # -- queries -----------------------------------------------------
+    def search(self, vector, k=10, nprobe=DEFAULT_NPROBE, exclude=None, exact=False):
+        """Top-k (paper_id, cosine) for a unit query vector; exact=True scans every row."""
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if exact:
+            rows = np.fromiter(sorted(self.row_of.values()), dtype=np.int64, count=len(self.row_of))
+        else:
+            probe = np.argsort(-(self.centroids @ vector))[:nprobe]
+            rows = np.sort(np.concatenate(
+                [self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe]))
+        if exclude is not None and exclude in self.row_of:
+            rows = rows[rows != self.row_of[exclude]]
+        if not len(rows):
+            return []
+        scores = self.vectors[rows] @ vector
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(self.ids[rows[i]], round(float(scores[i]), 4)) for i in top]
+
+    def similar(self, paper_id, k=10, nprobe=DEFAULT_NPROBE, exact=False):
+        """Papers whose data setup resembles paper_id's (itself excluded)."""
+        if paper_id not in self.row_of:
+            raise KeyError(f"Paper '{paper_id}' is not in the index")
+        return self.search(self.vectors[self.row_of[paper_id]], k, nprobe, exclude=paper_id, exact=exact)
+
+    def query(self, text, k=10, nprobe=DEFAULT_NPROBE, exact=False):
+        return self.search(self.embedder.transform([text])[0], k, nprobe, exact=exact)
+
+
+# -------------------------------------------------------------------
+def _load_record(args):
+    """Process-pool worker: record_text for one extraction JSON (+ cleaned XML if present)."""
+    json_path, xml_dir = args
+    paper_id = os.path.splitext(os.path.basename(json_path))[0]
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            extraction = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return paper_id, None
+    cleaned = None
+    if xml_dir:
+        xml_path = os.path.join(xml_dir, f"{paper_id}.xml")
+        if os.path.exists(xml_path):
+            from preprocess_xml import clean_pmc_xml
+            cleaned = clean_pmc_xml(xml_path)
+    return paper_id, record_text(extraction, cleaned)
+
+
+def load_records(input_dir, xml_dir=None, skip=(), workers=None):
+    """paper_id → record_text for every <paper_id>.json in input_dir not in skip."""
+    paths = [os.path.join(input_dir, name) for name in sorted(os.listdir(input_dir))
+             if name.endswith(".json") and name[:-5] not in skip]
+    records = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for paper_id, text in pool.map(_load_record, ((p, xml_dir) for p in paths), chunksize=64):
+            if text:
+                records[paper_id] = text
+    return records
+
+
+def benchmark(index, queries=200, k=10, nprobe=DEFAULT_NPROBE, seed=0):
+    """Mean / p99 query latency and recall@k of the IVF search against an exact scan."""
+    rng = np.random.default_rng(seed)
+    ids = list(index.row_of)
+    sample = [ids[i] for i in rng.choice(len(ids), min(queries, len(ids)), replace=False)]
+    latencies, recalls = [], []
+    for paper_id in sample:
+        started = time.perf_counter()
+        approx = index.similar(paper_id, k, nprobe)
+        latencies.append(time.perf_counter() - started)
+        exact = {pid for pid, _ in index.similar(paper_id, k, exact=True)}
+        recalls.append(len(exact & {pid for pid, _ in approx}) / max(len(exact), 1))
+    latencies.sort()
+    return {"queries": len(sample), "mean_ms": 1000 * sum(latencies) / len(latencies),
+            "p99_ms": 1000 * latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+            "recall": sum(recalls) / len(recalls)}
+
+
+if __name__ == "__main__":
+    p = argparse.ArgumentParser()
+    sub = p.add_subparsers(dest="command", required=True)
+
+    b = sub.add_parser("build", help="Fit the embedding + IVF and index every extraction")
+    a = sub.add_parser("add", help="Append new extractions with the existing model")
+    for s in (b, a):
+        s.add_argument("--input_dir", required=True, help="Directory of <paper_id>.json extraction outputs")
+        s.add_argument("--xml_dir",   default=None, help="PMC XML directory; adds each paper's cleaned text")
+        s.add_argument("--index",     required=True, help="Index directory")
+        s.add_argument("--workers",   type=int, default=None)
+    b.add_argument("--dim",        type=int, default=DEFAULT_DIM)
+    b.add_argument("--nlist",      type=int, default=None, help="IVF lists (default ≈ √N)")
+    b.add_argument("--fit_sample", type=int, default=50_000, help="Documents used to fit the model")
+    a.add_argument("--replace",    action="store_true", help="Re-embed papers already in the index")
+
+    q = sub.add_parser("query", help="Most similar papers to a paper ID or a free-text description")
+    src = q.add_mutually_exclusive_group(required=True)
+    src.add_argument("--paper", help="Paper ID already in the index")
+    src.add_argument("--text",  help="Free-text description of a data setup")
+    q.add_argument("--index",  required=True)
+    q.add_argument("-k",       type=int, default=10)
+    q.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE)
+    q.add_argument("--exact",  action="store_true", help="Scan every row instead of the IVF lists")
+
+    n = sub.add_parser("bench", help="Query latency and recall@k against exact search")
+    n.add_argument("--index",   required=True)
+    n.add_argument("--queries", type=int, default=200)
+    n.add_argument("-k",        type=int, default=10)
+    n.add_argument("--nprobe",  type=int, default=DEFAULT_NPROBE)
+    args = p.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        records = load_records(args.input_dir, args.xml_dir, workers=args.workers)
+        index = VectorIndex.build(args.index, records, dim=args.dim, nlist=args.nlist, fit_sample=args.fit_sample)
+        print(f"✅ Indexed {len(index)} papers ({index.dim} dims, {len(index.centroids)} IVF lists) "
+              f"in {time.perf_counter() - started:.1f}s → {args.index}")
+
+    elif args.command == "add":
+        index = VectorIndex(args.index)
+        skip = () if args.replace else set(index.row_of)
+        records = load_records(args.input_dir, args.xml_dir, skip=skip, workers=args.workers)
+        added = index.add(records)
+        print(f"✅ Appended {added} papers; index now holds {len(index)}")
+
+    elif args.command == "query":
+        index = VectorIndex(args.index)
+        started = time.perf_counter()
+        if args.paper:
+            hits = index.similar(args.paper, args.k, args.nprobe, exact=args.exact)
+        else:
+            hits = index.query(args.text, args.k, args.nprobe, exact=args.exact)
+        elapsed = (time.perf_counter() - started) * 1000
+        for paper_id, score in hits:
+            print(f"  {score:.4f}  {paper_id}")
+        print(f"{len(hits)} results in {elapsed:.1f} ms")
+
+    else:
+        index = VectorIndex(args.index)
+        r = benchmark(index, args.queries, args.k, args.nprobe)
+        print(f"✅ {r['queries']} queries over {len(index)} papers: mean {r['mean_ms']:.2f} ms, "
+              f"p99 {r['p99_ms']:.2f} ms, recall@{args.k} {r['recall']:.3f} (nprobe {args.nprobe})")
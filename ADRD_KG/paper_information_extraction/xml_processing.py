@@ -1,46 +1,126 @@
 from lxml import etree
 from xml.etree import ElementTree as ET
-import stanza
+from dataclasses import dataclass, asdict
+import json
 from unidecode import unidecode
+from sentence_splitter import get_pipeline, split_documents_stanza, split_sentences_rule
+
+
+@dataclass
+class Paragraph:
+    text: str
+    section_path: tuple   # enclosing section titles, outermost first
+    kind: str             # "abstract", "body", "back", "figure" or "table"
+    order: int            # position in document order
+
+
+class ParagraphIndex:
+    """Leaf paragraphs of one article, selectable by section and kind without re-parsing."""
+
+    def __init__(self, paragraphs):
+        self.paragraphs = paragraphs
+        self.sections = {}   # lower-cased section title → paragraph positions
+        for i, p in enumerate(paragraphs):
+            for title in set(t.lower() for t in p.section_path):
+                self.sections.setdefault(title, []).append(i)
+
+    def select(self, section=None, kind=None):
+        """Paragraphs under a section with this title (at any depth) and/or of this kind."""
+        if section is None:
+            candidates = self.paragraphs
+        else:
+            candidates = [self.paragraphs[i] for i in self.sections.get(section.lower(), [])]
+        return [p for p in candidates if kind is None or p.kind == kind]
+
+    def text(self, section=None, kind=None, sep="\n"):
+        return sep.join(p.text for p in self.select(section, kind))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for p in self.paragraphs:
+                f.write(json.dumps(asdict(p)) + "\n")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        return cls([Paragraph(r["text"], tuple(r["section_path"]), r["kind"], r["order"]) for r in rows])
+
+
+def _walk_paragraphs(root):
+    """
+    One post-order walk returning (leaf <p>, {"path", "kind"}) in document order.
+    A <p> is a leaf if no <p> occurs anywhere below it; kind is None outside
+    abstract/body/back.
+    """
+    out = []
+
+    def visit(elem, path, kind):
+        tag = elem.tag if isinstance(elem.tag, str) else ""
+        if tag == "abstract":
+            path, kind = ("Abstract",), "abstract"
+        elif tag == "body" and kind is None:
+            kind = "body"
+        elif tag == "back" and kind is None:
+            kind = "back"
+        elif tag == "fig":
+            kind = "figure"
+        elif tag == "table-wrap":
+            kind = "table"
+        elif tag == "sec":
+            title = elem.find("title")
+            title = " ".join("".join(title.itertext()).split()) if title is not None else ""
+            path = path + (title or "SECTION",)
+
+        has_p = False
+        for child in elem:
+            has_p = visit(child, path, kind) or has_p
+        if tag == "p" and not has_p:
+            out.append((elem, {"path": path, "kind": kind}))
+        return has_p or tag == "p"
+
+    visit(root, (), None)
+    return out
 
 class XMLProcessor:
-    def __init__(self):
-        self.nlp = stanza.Pipeline(lang='en', processors='tokenize', logging_level="ERROR")
+    def __init__(self, nlp=None):
+        # The stanza pipeline is shared process-wide and only built on first use
+        self._nlp = nlp
+
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            self._nlp = get_pipeline()
+        return self._nlp
 
     def find_deepest_p(self, element):
         """
-        Helper function, recursively find the deepest <p> tags under the given element.
-        """
-        # If the element is a <p> and has no child <p>, return it
-        if element.tag == "p" and not element.findall(".//p"):
-            return [element]
-        
-        # Otherwise, recurse into children
-        deepest_p_tags = []
-        for child in element:
-            deepest_p_tags.extend(self.find_deepest_p(child))
-        return deepest_p_tags 
-    
+        Helper function, find the deepest <p> tags (no <p> below them) under the given element.
+        Single post-order pass, so nested paragraphs are not re-scanned at every level.
+        """
+        return [p for p, _ in _walk_paragraphs(element)]
+
+    def build_paragraph_index(self, filename):
+        """
+        Parse the XML once and index every leaf paragraph of the abstract, body
+        sections, figure captions and table captions/footnotes by section path.
+        """
+        root = ET.parse(filename).getroot()
+        paragraphs = []
+        for p, context in _walk_paragraphs(root):
+            text = ET.tostring(p, encoding="unicode", method="text").strip()
+            if text and context["kind"] is not None:   # skip front-matter notes etc.
+                paragraphs.append(Paragraph(text, context["path"], context["kind"], len(paragraphs)))
+        return ParagraphIndex(paragraphs)
+
     def extract_paragraph(self, filename):
         """
         Extract abstract from the raw XML file.
         """
-        
-        tree = ET.parse(filename)
-        root = tree.getroot()
-
-        # Find all <abstract> tags
-        abstracts = root.findall(".//abstract")
+        index = filename if isinstance(filename, ParagraphIndex) else self.build_paragraph_index(filename)
 
-        # Extract all <p> elements from each <abstract> and join them into a single paragraph
-        all_text = []
-        for abstract in abstracts:
-            deepest_p_tags = self.find_deepest_p(abstract)
-            paragraphs = [ET.tostring(p, encoding="unicode", method="text").strip() for p in deepest_p_tags]
-            all_text.extend(paragraphs)
-
-        # Combine all text into a single paragraph
-        complete_paragraph = " ".join(all_text)
+        # Combine all abstract paragraphs into a single paragraph
+        complete_paragraph = " ".join(p.text for p in index.select(kind="abstract"))
 
         return complete_paragraph
 
@@ -60,3 +140,17 @@ class XMLProcessor:
         doc = self.nlp(cleaned_text)
         sentences = [unidecode(sentence.text) for sentence in doc.sentences] # transform Non ACSII chars
         return sentences, ' '.join(sentences)
+
+    def extract_sentences(self, abstracts, fast=False):
+        """
+        Batched extract_sentence: splits many abstracts in one stanza bulk call
+        (or with the rule-based splitter when fast=True).
+
+        Returns:
+            list: One (sentences, joined_text) tuple per abstract.
+        """
+        if fast:
+            split = [split_sentences_rule(a) for a in abstracts]
+        else:
+            split = split_documents_stanza(abstracts, self.nlp)
+        return [(sentences, ' '.join(sentences)) for sentences in split]
@@ -15,7 +15,11 @@ import seaborn as sns
 import io
 import base64
 import os
+import sys
 import json
+import time
+import hashlib
+import threading
 from pathlib import Path
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
@@ -39,25 +43,94 @@ app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 for folder in [UPLOAD_FOLDER, DATASETS_FOLDER]:
     os.makedirs(folder, exist_ok=True)
 
+# Full-text search over cleaned papers + metadata (built by
+# paper_information_extraction/search_index.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'paper_information_extraction'))
+app.config['SEARCH_INDEX'] = os.environ.get('ADRD_SEARCH_INDEX', 'search_index.sqlite')
+_search_index = None
+
+def get_search_index():
+    """Open the search index once per process (read-only; it reloads itself on rebuilds)."""
+    global _search_index
+    if _search_index is None:
+        from search_index import SearchIndex
+        _search_index = SearchIndex(app.config['SEARCH_INDEX'], read_only=True)
+    return _search_index
+
+DEFAULT_METADATA_FILE = 'templates/ADRD_Metadata_YuyangD.xlsx'
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            h.update(block)
+    return h.hexdigest()
+
+# Process-wide analyzers, one per workbook path. A request only stat()s the
+# workbook; it is re-read when its mtime/size changed *and* its content hash
+# differs, so a touched-but-identical file keeps its memoized analyses.
+_analyzers = {}   # abs path → (analyzer, (mtime_ns, size), content hash)
+_analyzers_lock = threading.Lock()
+
+def get_analyzer(excel_file_path=None):
+    """Loaded ADRDMetadataAnalyzer for the workbook (cached per process), or None if it cannot be loaded."""
+    path = os.path.abspath(excel_file_path or DEFAULT_METADATA_FILE)
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        print(f"Error loading data: {e}")
+        return None
+    signature = (st.st_mtime_ns, st.st_size)
+
+    with _analyzers_lock:
+        entry = _analyzers.get(path)
+        if entry is not None and entry[1] == signature:
+            return entry[0]
+        content_hash = file_hash(path)
+        if entry is not None and entry[2] == content_hash:
+            _analyzers[path] = (entry[0], signature, content_hash)
+            return entry[0]
+
+        analyzer = ADRDMetadataAnalyzer(path)
+        if not analyzer.load_data():
+            return None
+        _analyzers[path] = (analyzer, signature, content_hash)
+        return analyzer
+
+def memoized(method):
+    """Cache an analysis in self.analysis_results (reset by load_data)."""
+    def wrapper(self):
+        if method.__name__ not in self.analysis_results:
+            self.analysis_results[method.__name__] = method(self)
+        return self.analysis_results[method.__name__]
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
 class ADRDMetadataAnalyzer:
     """Analyzer for ADRD metadata dataset."""
     
     def __init__(self, excel_file_path=None):
-        self.excel_file_path = excel_file_path or 'templates/ADRD_Metadata_YuyangD.xlsx'
+        self.excel_file_path = excel_file_path or DEFAULT_METADATA_FILE
         self.df = None
         self.analysis_results = {}
+        self._details_by_name = None
         
     def load_data(self):
         """Load the ADRD metadata from Excel file."""
         try:
             print(f"Loading ADRD metadata from: {self.excel_file_path}")
             self.df = pd.read_excel(self.excel_file_path)
+            self.analysis_results = {}
+            self._details_by_name = None
             print(f"Data loaded successfully. Shape: {self.df.shape}")
             return True
         except Exception as e:
             print(f"Error loading data: {e}")
             return False
     
+    @memoized
     def analyze_dataset_overview(self):
         """Analyze overall dataset characteristics."""
         if self.df is None:
@@ -113,6 +186,7 @@ class ADRDMetadataAnalyzer:
         
         return overview
     
+    @memoized
     def analyze_disease_types(self):
         """Analyze disease type distribution."""
         if self.df is None:
@@ -143,6 +217,7 @@ class ADRDMetadataAnalyzer:
         
         return disease_analysis
     
+    @memoized
     def analyze_data_types(self):
         """Analyze available data types across datasets."""
         if self.df is None:
@@ -175,6 +250,7 @@ class ADRDMetadataAnalyzer:
         
         return data_type_analysis
     
+    @memoized
     def create_visualizations(self):
         """Create visualizations for the ADRD metadata."""
         if self.df is None:
@@ -298,9 +374,15 @@ class ADRDMetadataAnalyzer:
             return None
             
         if dataset_name:
-            dataset_info = self.df[self.df['Dataset Name (Text)'] == dataset_name]
-            if len(dataset_info) > 0:
-                return dataset_info.iloc[0].to_dict()
+            if self._details_by_name is None:
+                # first row per name, as the previous per-request filter returned
+                self._details_by_name = {}
+                if 'Dataset Name (Text)' in self.df.columns:
+                    for row in self.df.to_dict('records'):
+                        self._details_by_name.setdefault(row['Dataset Name (Text)'], row)
+            return self._details_by_name.get(dataset_name)
+        elif 'dataset_details' in self.analysis_results:
+            return self.analysis_results['dataset_details']
         else:
             # Return all datasets with key information
             key_columns = [
@@ -313,7 +395,8 @@ class ADRDMetadataAnalyzer:
             ]
             
             available_columns = [col for col in key_columns if col in self.df.columns]
-            return self.df[available_columns].to_dict('records')
+            self.analysis_results['dataset_details'] = self.df[available_columns].to_dict('records')
+            return self.analysis_results['dataset_details']
         
         return None
 
@@ -331,9 +414,9 @@ def index():
 def load_adrd_data():
     """Load and analyze the ADRD metadata dataset."""
     try:
-        analyzer = ADRDMetadataAnalyzer()
-        if analyzer.load_data():
-            # Perform comprehensive analysis
+        analyzer = get_analyzer()
+        if analyzer is not None:
+            # Perform comprehensive analysis (memoized until the workbook changes)
             overview = analyzer.analyze_dataset_overview()
             disease_analysis = analyzer.analyze_disease_types()
             data_type_analysis = analyzer.analyze_data_types()
@@ -360,8 +443,8 @@ def load_adrd_data():
 def get_dataset_info(dataset_name):
     """Get detailed information about a specific dataset."""
     try:
-        analyzer = ADRDMetadataAnalyzer()
-        if analyzer.load_data():
+        analyzer = get_analyzer()
+        if analyzer is not None:
             dataset_info = analyzer.get_dataset_details(dataset_name)
             if dataset_info:
                 return jsonify({'success': True, 'dataset_info': dataset_info})
@@ -403,6 +486,30 @@ def upload_file():
     else:
         return jsonify({'success': False, 'error': 'Invalid file type'})
 
+@app.route('/search')
+def search():
+    """BM25 search over indexed papers and metadata rows: /search?q=ADNI+DTI&k=20&kind=paper"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': False, 'error': 'Missing query parameter q'})
+    if not os.path.exists(app.config['SEARCH_INDEX']):
+        return jsonify({'success': False, 'error': 'Search index not built'})
+
+    try:
+        k = max(1, min(int(request.args.get('k', 20)), 100))
+        kind = request.args.get('kind') or None
+        index = get_search_index()
+        started = time.perf_counter()
+        results = index.search(query, k=k, kind=kind)
+        return jsonify({
+            'success': True,
+            'query': query,
+            'results': results,
+            'took_ms': round((time.perf_counter() - started) * 1000, 2)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @app.route('/health')
 def health_check():
     """Health check endpoint."""